@@ -1,11 +1,16 @@
 # agent.py
 import numpy as np
 
+from heuristics import heuristic_q_values
+from q_store import CompactQTable
+from value_iteration import value_iteration_q_values
+
 class QLearningAgent:
     """
     A simple Q-learning agent that learns an optimal route in a city traffic environment.
     """
-    def __init__(self, env, alpha=0.1, gamma=0.9, epsilon=0.3, epsilon_decay=0.995, min_epsilon=0.01):
+    def __init__(self, env, alpha=0.1, gamma=0.9, epsilon=0.3, epsilon_decay=0.995, min_epsilon=0.01,
+                 q_storage="dense", q_dtype=None, mask_actions=False, q_init="zeros"):
         """
         Initialize the Q-learning agent with given parameters.
 
@@ -16,6 +21,16 @@ class QLearningAgent:
             epsilon: Initial exploration rate.
             epsilon_decay: Factor by which epsilon decays after each episode.
             min_epsilon: Minimum exploration rate.
+            q_storage: "dense" for a num_states x max_degree array, or "compact" for a
+                CompactQTable holding only each node's valid actions (needs a compiled env).
+            q_dtype: Q-value dtype; defaults to float64 (dense) or float32 (compact).
+            mask_actions: Explore and exploit only over each state's valid actions (its
+                neighbors), using the environment's `action_degrees`. Compact storage is
+                always masked.
+            q_init: "zeros", or a heuristic warm start: "dijkstra" (discounted return along the
+                cheapest path from a reverse Dijkstra pass from the goal) or "euclidean"
+                (straight-line distance to the goal). An array of Q-values in this agent's
+                layout (e.g. from a PolicyCache) is copied in as a warm start.
         """
         self.env = env
         self.alpha = alpha
@@ -29,7 +44,82 @@ class QLearningAgent:
         self.num_actions = env.action_space.n
 
         # Initialize Q-table with zeros.
-        self.Q = np.zeros((self.num_states, self.num_actions))
+        self.q_storage = q_storage
+        if q_storage == "compact":
+            if getattr(env, "compiled_graph", None) is None:
+                raise ValueError("Compact Q storage requires an environment with a compiled graph")
+            self.Q = CompactQTable.from_compiled_graph(env.compiled_graph, dtype=q_dtype or np.float32)
+        elif q_storage == "dense":
+            self.Q = np.zeros((self.num_states, self.num_actions), dtype=q_dtype or np.float64)
+        else:
+            raise ValueError(f"Unknown Q storage: {q_storage}")
+
+        # Per-state number of valid actions; padded columns are excluded from argmax/max.
+        self.mask_actions = mask_actions or q_storage == "compact"
+        self.action_degrees = np.asarray(env.action_degrees) if self.mask_actions else None
+        if self.mask_actions and q_storage == "dense":
+            self._invalid_actions = np.arange(self.num_actions) >= self.action_degrees[:, None]
+
+        if not isinstance(q_init, str):
+            self._q_values_array()[:] = q_init
+        elif q_init != "zeros":
+            self._warm_start(q_init)
+
+    def _q_values_array(self):
+        """
+        Return the array holding the Q-values (2-D when dense, flat when compact).
+        """
+        return self.Q.values if self.q_storage == "compact" else self.Q
+
+    def use_q_values(self, values):
+        """
+        Replace the Q-values with an array in this agent's layout, without copying.
+
+        Used to answer queries from a cached (possibly read-only, memory-mapped) table.
+        """
+        if self.q_storage == "compact":
+            self.Q = CompactQTable(self.Q.offsets, dtype=values.dtype, values=values)
+        else:
+            self.Q = values
+
+    def _warm_start(self, mode):
+        """
+        Seed the Q-table with heuristic values computed from the graph.
+        """
+        self._fill_q_values(*heuristic_q_values(self.env, self.gamma, mode))
+
+    def solve_value_iteration(self, tolerance=1e-6, max_iterations=10000):
+        """
+        Fill the Q-table by value iteration over the known graph instead of sampling episodes.
+
+        The result stands in for a trained table, so `get_shortest_path` and the policy cache
+        use it unchanged. The step onto the goal also pays its edge cost (see
+        `value_iteration`), so with gamma=1 greedy routes are exact shortest paths.
+
+        Args:
+            tolerance: Stop once no state value changes by more than this in a sweep.
+            max_iterations: Maximum number of sweeps.
+
+        Returns:
+            The number of sweeps run.
+        """
+        q_flat, compiled, floor, iterations = value_iteration_q_values(
+            self.env, self.gamma, tolerance=tolerance, max_iterations=max_iterations)
+        self._fill_q_values(q_flat, compiled, floor)
+        return iterations
+
+    def _fill_q_values(self, q_flat, compiled, floor):
+        """
+        Copy Q-values aligned with a compiled graph's CSR neighbor slots into the Q-table.
+        """
+        if self.q_storage == "compact":
+            self.Q.values[:] = q_flat
+            return
+        # Padded actions get a pessimistic value so they never win the argmax.
+        self.Q[:] = floor
+        rows = np.repeat(np.arange(compiled.num_nodes), compiled.degrees)
+        columns = np.arange(len(q_flat)) - np.repeat(compiled.offsets[:-1], compiled.degrees)
+        self.Q[rows, columns] = q_flat
 
     def choose_action(self, state):
         """
@@ -37,9 +127,46 @@ class QLearningAgent:
         """
         # With probability epsilon choose random action, else choose best known action.
         if np.random.rand() < self.epsilon:
+            if self.mask_actions:
+                # Only sample the node's valid actions.
+                return np.random.randint(max(self.action_degrees[state], 1))
             return np.random.randint(self.num_actions)
         else:
-            return np.argmax(self.Q[state, :])
+            return self.greedy_action(state)
+
+    def greedy_action(self, state):
+        """
+        Return the action with the highest Q-value in a state.
+        """
+        if self.q_storage == "compact":
+            return self.Q.argmax(state)
+        if self.mask_actions:
+            return np.argmax(self.Q[state, :max(self.action_degrees[state], 1)])
+        return np.argmax(self.Q[state, :])
+
+    def greedy_actions(self, states):
+        """
+        Return the action with the highest Q-value for each state in an array.
+        """
+        if self.q_storage == "compact":
+            return self.Q.argmax_batch(states)
+        if self.mask_actions:
+            return np.argmax(self._masked_rows(states), axis=1)
+        return np.argmax(self.Q[states, :], axis=1)
+
+    def _masked_rows(self, states):
+        """
+        Return dense Q rows with invalid actions set to -inf.
+        """
+        return np.where(self._invalid_actions[states], -np.inf, self.Q[states, :])
+
+    def q_values(self, states, actions):
+        """
+        Return the Q-values of arrays of states and actions.
+        """
+        if self.q_storage == "compact":
+            return self.Q.get(states, actions)
+        return self.Q[states, actions]
 
     def update(self, state, action, reward, next_state, done):
         """
@@ -52,8 +179,13 @@ class QLearningAgent:
             next_state: Next state after action.
             done: Boolean indicating if the episode is finished.
         """
+        if self.q_storage == "compact":
+            td_target = reward + (0 if done else self.gamma * self.Q.max(next_state))
+            self.Q.add(state, action, self.alpha * (td_target - self.Q.get(state, action)))
+            return
+
         # Get best next action from Q-table for the next state.
-        best_next_action = np.argmax(self.Q[next_state, :])
+        best_next_action = self.greedy_action(next_state)
         # Compute TD target.
         td_target = reward + (0 if done else self.gamma * self.Q[next_state, best_next_action])
         # Compute TD error.
@@ -61,8 +193,67 @@ class QLearningAgent:
         # Update Q-value.
         self.Q[state, action] += self.alpha * td_error
 
-    def update_exploration(self):
+    def choose_actions(self, states):
+        """
+        Choose one action per state with an ε-greedy policy (batched version of choose_action).
+
+        Args:
+            states: Int array of states.
+
+        Returns:
+            Int array of actions.
+        """
+        states = np.asarray(states)
+        actions = self.greedy_actions(states)
+        explore = np.random.rand(len(states)) < self.epsilon
+        if explore.any():
+            if self.mask_actions:
+                degrees = self.action_degrees[states[explore]]
+                actions[explore] = (np.random.rand(explore.sum()) * degrees).astype(np.int64)
+            else:
+                actions[explore] = np.random.randint(self.num_actions, size=explore.sum())
+        return actions
+
+    def update_batch(self, states, actions, rewards, next_states, dones, weights=None):
+        """
+        Apply the temporal difference update to a batch of transitions.
+
+        Repeated (state, action) pairs in one batch each contribute their TD error.
+
+        Args:
+            states: Int array of current states.
+            actions: Int array of actions taken.
+            rewards: Float array of rewards received.
+            next_states: Int array of next states.
+            dones: Bool array indicating which episodes finished.
+            weights: Optional per-transition step-size weights (e.g. importance-sampling
+                weights of a prioritized replay minibatch).
+
+        Returns:
+            The TD error of each transition before the update.
+        """
+        # Compute TD targets from the best next action of each transition.
+        if self.q_storage == "compact":
+            best_next = self.Q.max_batch(next_states)
+        elif self.mask_actions:
+            best_next = np.max(self._masked_rows(next_states), axis=1)
+        else:
+            best_next = np.max(self.Q[next_states, :], axis=1)
+        td_target = rewards + np.where(dones, 0.0, self.gamma * best_next)
+        td_error = td_target - self.q_values(states, actions)
+        step = self.alpha * td_error if weights is None else self.alpha * weights * td_error
+        # Scatter-add so duplicate (state, action) pairs are not dropped.
+        if self.q_storage == "compact":
+            self.Q.add(states, actions, step)
+        else:
+            np.add.at(self.Q, (states, actions), step)
+        return td_error
+
+    def update_exploration(self, episodes=1):
         """
         Decay the exploration rate epsilon after each episode.
+
+        Args:
+            episodes: Number of finished episodes to decay for.
         """
-        self.epsilon = max(self.min_epsilon, self.epsilon * self.epsilon_decay)
+        self.epsilon = max(self.min_epsilon, self.epsilon * self.epsilon_decay ** episodes)
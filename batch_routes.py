@@ -0,0 +1,229 @@
+# batch_routes.py
+import random
+import uuid
+import networkx as nx
+import numpy as np
+
+from agent import QLearningAgent
+from contraction import contract_chains
+from environment import CityTrafficEnv, VecCityTrafficEnv
+from graph_core import CompiledGraph
+from multi_goal import MultiGoalAgent, train_multi_goal
+from training import ConvergenceMonitor, MultiRouteMonitor, train_agent_vectorized, training_pool
+from utils import get_shortest_path
+
+def group_by_goal(pairs):
+    """
+    Group (start, end) pairs by their end node.
+
+    Returns:
+        A dictionary mapping each goal to its distinct start nodes, both in first-seen order.
+    """
+    groups = {}
+    for start, end in pairs:
+        groups.setdefault(end, {})[start] = None
+    return {goal: list(starts) for goal, starts in groups.items()}
+
+def route_goal(graph, compiled, traffic, goal, starts, agent_params, solver="q_learning", episodes=3000,
+               num_envs=32, max_steps=300, contract=True, tolerance=1e-6):
+    """
+    Train one agent toward a goal and read off its route from every start.
+
+    Episodes start from a random one of the starts, and training stops once the greedy route
+    from each of them has converged. With value iteration the solved table serves every
+    start directly.
+
+    Args:
+        graph: The undirected city graph.
+        compiled: The CompiledGraph for graph and traffic.
+        traffic: The city's traffic costs.
+        goal: The goal node ID.
+        starts: Start node IDs.
+        agent_params: Keyword arguments for QLearningAgent.
+        solver: "q_learning" or "value_iteration".
+        episodes: Maximum number of training episodes.
+        num_envs: Episodes advanced together during training.
+        max_steps: Maximum number of steps per episode.
+        contract: Train on the graph with degree-2 chains contracted (keeping starts and goal).
+        tolerance: Convergence tolerance of value iteration.
+
+    Returns:
+        A tuple (routes, episodes_run) where routes maps each start to its path of node IDs.
+    """
+    starts = [start for start in starts if start != goal]
+    if not starts:
+        return {}, 0
+    contracted = None
+    if contract:
+        contracted = contract_chains(compiled, [compiled.node_index[node] for node in starts + [goal]])
+        compiled, traffic = contracted.compiled, contracted.traffic
+
+    env = CityTrafficEnv(graph, starts[0], goal, traffic, max_steps=max_steps, compiled_graph=compiled)
+    agent = QLearningAgent(env, **agent_params)
+    if solver == "value_iteration":
+        agent.solve_value_iteration(tolerance=tolerance)
+        episodes_run = 0
+    else:
+        monitor = MultiRouteMonitor(
+            ConvergenceMonitor(CityTrafficEnv(graph, start, goal, traffic, max_steps=max_steps,
+                                              compiled_graph=compiled))
+            for start in starts
+        )
+        vec_env = VecCityTrafficEnv(compiled, starts[0], goal, max(num_envs, 1), max_steps=max_steps,
+                                    start_nodes=starts)
+        episodes_run = train_agent_vectorized(vec_env, agent, episodes, monitor=monitor)
+
+    routes = {}
+    for start in starts:
+        env.start_node = start
+        path = get_shortest_path(agent, env)
+        routes[start] = contracted.expand_path(path) if contracted is not None else path
+    return routes, episodes_run
+
+def route_goals_jointly(graph, compiled, traffic, groups, agent_params, episodes=6000, num_envs=32, max_steps=300,
+                        contract=True, max_bytes=None):
+    """
+    Train MultiGoalAgents for the goals of a batch and read off each pair's route.
+
+    Episodes draw their start from the starts of an agent's goals and their goal from those
+    goals; every transition updates the Q-tables of all of them. Goals are split into as
+    few agents as fit in `max_bytes` each, trained one after the other. Each run has a fixed
+    budget for its goals together: checking the greedy route of every pair for convergence
+    costs more than the training itself once there are a few dozen pairs.
+
+    Args:
+        groups: A dictionary mapping each goal to its start nodes, as from `group_by_goal`.
+        episodes: Number of training episodes of each run, for its goals together.
+        max_bytes: Optional limit on the Q store of each run (at least one goal per run).
+        (Other arguments as for `route_goal`.)
+
+    Returns:
+        A list of (routes, episodes_run) tuples aligned with the groups, as from `route_goal`;
+        the episodes of each joint run are reported on its first goal.
+    """
+    goals = list(groups)
+    pairs = [(start, goal) for goal, starts in groups.items() for start in starts if start != goal]
+    if not pairs:
+        return [({}, 0) for _ in goals]
+    contracted = None
+    if contract:
+        protected = {compiled.node_index[node] for pair in pairs for node in pair}
+        contracted = contract_chains(compiled, sorted(protected))
+        compiled, traffic = contracted.compiled, contracted.traffic
+
+    params = {key: agent_params[key] for key in ("alpha", "gamma", "epsilon", "epsilon_decay", "min_epsilon", "q_dtype")
+              if key in agent_params}
+    trained = [goal for goal in goals if any(pair_goal == goal for _, pair_goal in pairs)]
+    chunk_size = len(trained)
+    if max_bytes is not None:
+        chunk_size = max(1, max_bytes // MultiGoalAgent.table_bytes(compiled, 1, params.get("q_dtype")))
+
+    routes = {goal: {} for goal in goals}
+    episodes_by_goal = {}
+    for first in range(0, len(trained), chunk_size):
+        chunk = trained[first:first + chunk_size]
+        chunk_pairs = [(start, goal) for start, goal in pairs if goal in set(chunk)]
+        starts = list(dict.fromkeys(start for start, _ in chunk_pairs))
+        agent = MultiGoalAgent(compiled, chunk, max_bytes=max_bytes, **params)
+        vec_env = VecCityTrafficEnv(compiled, starts[0], chunk[0], max(num_envs, 1), max_steps=max_steps,
+                                    start_nodes=starts, goal_nodes=chunk)
+        episodes_by_goal[chunk[0]] = train_multi_goal(vec_env, agent, episodes)
+
+        for start, goal in chunk_pairs:
+            env = CityTrafficEnv(graph, start, goal, traffic, max_steps=max_steps, compiled_graph=compiled)
+            path = get_shortest_path(agent.goal_agent(env), env)
+            routes[goal][start] = contracted.expand_path(path) if contracted is not None else path
+    return [(routes[goal], episodes_by_goal.get(goal, 0)) for goal in goals]
+
+# Per-process city of the most recent route_batch call, rebuilt when a task from another
+# batch arrives.
+_worker_state = {}
+
+def _worker_city(batch_id, graph_arrays, coordinates):
+    """
+    Return the worker's graph, compiled graph and traffic for a batch, building them on first use.
+
+    The graph only holds the nodes and their coordinates, which is all `route_goal` reads
+    from it once it has a compiled graph.
+    """
+    if _worker_state.get('batch_id') != batch_id:
+        compiled = CompiledGraph(*graph_arrays)
+        graph = nx.Graph()
+        graph.add_nodes_from((n, {'x': x, 'y': y}) for n, (x, y) in zip(compiled.nodes, coordinates.tolist()))
+        _worker_state.update(batch_id=batch_id, graph=graph, compiled=compiled, traffic=compiled.traffic_dict())
+    return _worker_state['graph'], _worker_state['compiled'], _worker_state['traffic']
+
+def _route_goal_task(batch, goal, starts, seed):
+    """
+    Run route_goal for one goal in a worker process.
+
+    Args:
+        batch: Tuple (batch_id, graph_arrays, coordinates, options).
+    """
+    *city_args, options = batch
+    graph, compiled, traffic = _worker_city(*city_args)
+    random.seed(seed)
+    np.random.seed(seed)
+    return route_goal(graph, compiled, traffic, goal, starts, **options)
+
+def route_batch(graph, compiled, traffic, pairs, num_workers=1, seed=None, multi_goal=False,
+                multi_goal_episodes=6000, multi_goal_max_bytes=None, **options):
+    """
+    Plan routes for many (start, end) pairs on one city and traffic snapshot.
+
+    Pairs are grouped by goal so one training run serves every start of that goal; distinct
+    goals are trained in parallel on the shared `training_pool` when num_workers > 1, or
+    together by one MultiGoalAgent with `multi_goal` (ignored by value iteration, which solves
+    each goal directly). Workers get the compiled graph's arrays and node coordinates, not
+    the NetworkX graph or traffic.
+
+    Args:
+        graph: The undirected city graph.
+        compiled: The CompiledGraph for graph and traffic.
+        traffic: The city's traffic costs.
+        pairs: Iterable of (start, end) node-ID pairs.
+        num_workers: Above 1, goals are trained on the shared process pool (created with this
+            many workers if it does not exist yet); 1 trains in the calling process.
+        seed: Optional seed; with workers, per-goal seeds are derived from it.
+        multi_goal: Train all goals in one run with shared transitions.
+        multi_goal_episodes: Episode budget of each multi-goal run, for its goals together.
+        multi_goal_max_bytes: Limit on each multi-goal run's Q store; goals beyond it are
+            trained in further runs.
+        **options: Passed on to `route_goal` (agent_params is required).
+
+    Returns:
+        A tuple (routes, episodes_run): routes maps each (start, end) pair to its path of node
+        IDs, and episodes_run is the total number of training episodes.
+    """
+    groups = group_by_goal(pairs)
+    goals = list(groups)
+    if multi_goal and options.get("solver", "q_learning") == "q_learning":
+        if seed is not None:
+            random.seed(seed)
+            np.random.seed(seed)
+        options.pop("solver", None)
+        options.pop("tolerance", None)
+        options["episodes"] = multi_goal_episodes
+        options["max_bytes"] = multi_goal_max_bytes
+        results = route_goals_jointly(graph, compiled, traffic, groups, **options)
+    elif num_workers > 1 and len(goals) > 1:
+        base_seed = seed if seed is not None else np.random.randint(2**31 - len(goals))
+        coordinates = np.array([(graph.nodes[n]['x'], graph.nodes[n]['y']) for n in compiled.nodes],
+                               dtype=np.float64).reshape(-1, 2)
+        batch = (uuid.uuid4().hex, (compiled.nodes, compiled.offsets, compiled.neighbors, compiled.costs),
+                 coordinates, options)
+        pool = training_pool(num_workers)
+        futures = [pool.submit(_route_goal_task, batch, goal, groups[goal], base_seed + i)
+                   for i, goal in enumerate(goals)]
+        results = [future.result() for future in futures]
+    else:
+        if seed is not None:
+            random.seed(seed)
+            np.random.seed(seed)
+        results = [route_goal(graph, compiled, traffic, goal, groups[goal], **options) for goal in goals]
+
+    routes = {}
+    for goal, (goal_routes, _) in zip(goals, results):
+        for start in groups[goal]:
+            routes[(start, goal)] = goal_routes.get(start, [start])
+    return routes, sum(episodes_run for _, episodes_run in results)
@@ -0,0 +1,642 @@
+# benchmark.py
+import argparse
+import json
+import platform
+import random
+import time
+import tracemalloc
+import numpy as np
+import networkx as nx
+
+from agent import QLearningAgent
+from environment import CityTrafficEnv, VecCityTrafficEnv
+from graph_cache import GraphCache, load_place_graph
+from graph_core import CompiledGraph
+from q_store import q_memory_report
+from batch_routes import route_batch
+from contraction import contract_chains
+from corridor import CORRIDOR_MODES, build_corridor
+from map_data import MapIndex
+from replanning import replan
+from replay import ReplayBuffer
+from synthetic_graphs import GRAPH_KINDS, make_grid_graph, make_synthetic_graph, subdivide_edges
+from training import ConvergenceMonitor, train_agent, train_agent_parallel, train_agent_vectorized
+from utils import generate_random_traffic, get_shortest_path, path_cost
+
+def bench_env_steps(graph, traffic, num_steps, compiled_graph=None, seed=0):
+    """
+    Measure raw environment throughput with uniformly random actions.
+
+    Returns:
+        Steps per second.
+    """
+    nodes = list(graph.nodes())
+    env = CityTrafficEnv(graph, nodes[0], nodes[-1], traffic, max_steps=300,
+                         compiled_graph=compiled_graph)
+    random.seed(seed)
+    rng = np.random.default_rng(seed)
+    actions = rng.integers(env.action_space.n, size=num_steps).tolist()
+
+    env.reset()
+    start = time.perf_counter()
+    for action in actions:
+        _, _, done, _, _ = env.step(action)
+        if done:
+            env.reset()
+    return num_steps / (time.perf_counter() - start)
+
+def cmd_env_steps(args):
+    """
+    Compare NetworkX-backed and CSR-backed environment stepping.
+    """
+    graph = make_grid_graph(args.rows, args.cols)
+    random.seed(args.seed)
+    traffic = generate_random_traffic(graph)
+    compiled = CompiledGraph.from_networkx(graph, traffic)
+
+    legacy = bench_env_steps(graph, traffic, args.steps, seed=args.seed)
+    fast = bench_env_steps(graph, traffic, args.steps, compiled_graph=compiled, seed=args.seed)
+    print(f"[env-steps] nodes={graph.number_of_nodes()} edges={graph.number_of_edges()}")
+    print(f"[env-steps] networkx: {legacy:,.0f} steps/s")
+    print(f"[env-steps] compiled: {fast:,.0f} steps/s ({fast / legacy:.1f}x)")
+
+def cmd_parallel(args):
+    """
+    Compare the serial training loop with multi-process training.
+    """
+    graph = make_grid_graph(args.rows, args.cols)
+    random.seed(args.seed)
+    traffic = generate_random_traffic(graph)
+    compiled = CompiledGraph.from_networkx(graph, traffic)
+    nodes = list(graph.nodes())
+    start, goal = nodes[0], nodes[len(nodes) * 2 // 3]
+    optimum = nx.dijkstra_path_length(graph, start, goal, weight=lambda u, v, d: traffic[(u, v)])
+
+    # The worker pool is started once per process; start it before timing.
+    begin = time.perf_counter()
+    env = CityTrafficEnv(graph, start, goal, traffic, max_steps=300, compiled_graph=compiled)
+    train_agent_parallel(env, QLearningAgent(env), args.workers, num_workers=args.workers, sync_every=1)
+    print(f"[parallel] pool start-up: {time.perf_counter() - begin:.2f}s")
+
+    results = {}
+    for mode in ("serial", "parallel"):
+        random.seed(args.seed)
+        np.random.seed(args.seed)
+        env = CityTrafficEnv(graph, start, goal, traffic, max_steps=300, compiled_graph=compiled)
+        agent = QLearningAgent(env, alpha=0.1, gamma=0.9, epsilon=0.5, epsilon_decay=0.995, min_epsilon=0.05)
+        begin = time.perf_counter()
+        if mode == "serial":
+            train_agent(env, agent, args.episodes)
+        else:
+            train_agent_parallel(env, agent, args.episodes, num_workers=args.workers,
+                                 sync_every=args.sync_every, seed=args.seed)
+        elapsed = time.perf_counter() - begin
+        path = get_shortest_path(agent, env)
+        results[mode] = elapsed
+        print(f"[parallel] {mode}: {elapsed:.2f}s, reached goal={path[-1] == goal}, "
+              f"route cost={path_cost(path, traffic):.0f} (optimum {optimum:.0f})")
+    print(f"[parallel] speedup with {args.workers} workers: {results['serial'] / results['parallel']:.2f}x")
+
+def cmd_q_memory(args):
+    """
+    Report dense vs compact Q-table memory for an OSM place or synthetic grids.
+    """
+    if args.place:
+        graphs = {args.place: load_place_graph(args.place, cache=GraphCache())}
+    else:
+        graphs = {f"grid {n}x{n}": make_grid_graph(n, n) for n in (10, 100, 300)}
+
+    for name, graph in graphs.items():
+        compiled = CompiledGraph.from_networkx(graph, generate_random_traffic(graph))
+        report = q_memory_report(compiled)
+        print(f"[q-memory] {name}: states={report['num_states']} max_degree={report['max_degree']} "
+              f"valid_actions={report['valid_actions']}")
+        print(f"[q-memory]   dense float64: {report['dense_float64_bytes']:,} bytes")
+        for dtype in ("float64", "float32", "float16"):
+            print(f"[q-memory]   compact {dtype}: {report[f'compact_{dtype}_bytes']:,} bytes "
+                  f"(saves {report[f'compact_{dtype}_saving']:.0%})")
+
+def compare_agent_variants(args, variants, tag):
+    """
+    Train each agent variant on the same random OD pairs and report convergence and route quality.
+
+    Args:
+        args: Parsed arguments with place/rows/cols/runs/episodes/seed.
+        variants: Dictionary mapping a label to extra QLearningAgent keyword arguments.
+        tag: Prefix for printed lines.
+
+    Returns:
+        A dictionary mapping each label to its mean episodes until the monitor stopped training.
+    """
+    if args.place:
+        graph = load_place_graph(args.place, cache=GraphCache())
+        graph = graph.subgraph(max(nx.connected_components(graph), key=len)).copy()
+    else:
+        graph = make_grid_graph(args.rows, args.cols)
+    random.seed(args.seed)
+    traffic = generate_random_traffic(graph)
+    compiled = CompiledGraph.from_networkx(graph, traffic)
+    nodes = list(graph.nodes())
+    rng = random.Random(args.seed)
+    pairs = [tuple(rng.sample(nodes, 2)) for _ in range(args.runs)]
+
+    summary = {}
+    for label, agent_kwargs in variants.items():
+        episodes, near_optimal, ratios, reached = [], [], [], 0
+        for run, (start, goal) in enumerate(pairs):
+            random.seed(args.seed + run)
+            np.random.seed(args.seed + run)
+            optimum = nx.dijkstra_path_length(graph, start, goal, weight=lambda u, v, d: traffic[(u, v)])
+            env = CityTrafficEnv(graph, start, goal, traffic, max_steps=300, compiled_graph=compiled)
+            agent = QLearningAgent(env, alpha=0.1, gamma=0.9, epsilon=0.5, epsilon_decay=0.995,
+                                   min_epsilon=0.05, **agent_kwargs)
+            monitor = ConvergenceMonitor(env)
+            path = get_shortest_path(agent, env)
+            initial_ok = path[-1] == goal and path_cost(path, traffic) <= 1.05 * optimum
+            episodes.append(train_agent(env, agent, args.episodes, monitor=monitor))
+            # Episodes until the greedy route is first within 5% of the optimum.
+            good = [h["episode"] for h in monitor.history if h["reached_goal"] and h["cost"] <= 1.05 * optimum]
+            near_optimal.append(0 if initial_ok else (good[0] if good else episodes[-1]))
+            path = get_shortest_path(agent, env)
+            if path[-1] == goal:
+                reached += 1
+                ratios.append(path_cost(path, traffic) / optimum)
+        summary[label] = float(np.mean(episodes))
+        mean_ratio = f"{np.mean(ratios):.3f}" if ratios else "n/a"
+        print(f"[{tag}] {label}: mean episodes={summary[label]:.0f}, "
+              f"episodes to route within 5% of optimum={np.mean(near_optimal):.0f}, "
+              f"reached goal {reached}/{len(pairs)}, mean cost/optimum={mean_ratio}")
+    return summary
+
+def cmd_masking(args):
+    """
+    Compare episodes-to-convergence and route cost with and without valid-action masking.
+    """
+    compare_agent_variants(args, {"unmasked": {}, "masked": {"mask_actions": True}}, "masking")
+
+def cmd_warm_start(args):
+    """
+    Compare zero-initialized Q-tables with heuristic warm starts.
+    """
+    summary = compare_agent_variants(args, {
+        "zeros": {"mask_actions": True},
+        "dijkstra": {"mask_actions": True, "q_init": "dijkstra"},
+        "euclidean": {"mask_actions": True, "q_init": "euclidean"},
+    }, "warm-start")
+    for label in ("dijkstra", "euclidean"):
+        print(f"[warm-start] {label} saves {1 - summary[label] / summary['zeros']:.0%} of episodes vs zeros")
+
+def cmd_replan(args):
+    """
+    Compare repairing a trained Q-table after a traffic change with retraining from scratch.
+    """
+    graph = make_grid_graph(args.rows, args.cols)
+    random.seed(args.seed)
+    np.random.seed(args.seed)
+    traffic = generate_random_traffic(graph)
+    compiled = CompiledGraph.from_networkx(graph, traffic)
+    rng = random.Random(args.seed)
+    start, goal = rng.sample(list(graph.nodes()), 2)
+    env = CityTrafficEnv(graph, start, goal, traffic, max_steps=300, compiled_graph=compiled)
+    agent = QLearningAgent(env, alpha=0.1, gamma=0.9, epsilon=0.5, epsilon_decay=0.995, min_epsilon=0.05,
+                           mask_actions=True)
+    episodes = train_agent(env, agent, args.episodes, monitor=ConvergenceMonitor(env))
+    path = get_shortest_path(agent, env)
+    print(f"[replan] trained {episodes} episodes, route cost={path_cost(path, traffic):.0f}")
+
+    # Jam the learned route and change a few random edges elsewhere.
+    changes = {edge: args.jam_cost for edge in rng.sample(list(zip(path, path[1:])), min(args.jams, len(path) - 1))}
+    for u, v in rng.sample(list(graph.edges()), args.changes):
+        changes[(u, v)] = rng.randint(1, 10)
+
+    begin = time.perf_counter()
+    episodes = replan(agent, changes, episodes=args.replan_episodes)
+    elapsed = time.perf_counter() - begin
+    env, traffic = agent.env, agent.env.traffic_dict
+    optimum = nx.dijkstra_path_length(graph, start, goal, weight=lambda u, v, d: traffic[(u, v)])
+    print(f"[replan] {len(changes)} changed edges: old route now costs {path_cost(path, traffic):.0f} "
+          f"(optimum {optimum:.0f})")
+    path = get_shortest_path(agent, env)
+    print(f"[replan] repaired in {episodes} episodes, {elapsed * 1000:.0f} ms, "
+          f"reached goal={path[-1] == goal}, route cost={path_cost(path, traffic):.0f}")
+
+    random.seed(args.seed)
+    np.random.seed(args.seed)
+    env = CityTrafficEnv(graph, start, goal, traffic, max_steps=300, compiled_graph=env.compiled_graph)
+    agent = QLearningAgent(env, alpha=0.1, gamma=0.9, epsilon=0.5, epsilon_decay=0.995, min_epsilon=0.05,
+                           mask_actions=True)
+    begin = time.perf_counter()
+    episodes = train_agent(env, agent, args.episodes, monitor=ConvergenceMonitor(env))
+    elapsed = time.perf_counter() - begin
+    path = get_shortest_path(agent, env)
+    print(f"[replan] retrained from scratch in {episodes} episodes, {elapsed * 1000:.0f} ms, "
+          f"reached goal={path[-1] == goal}, route cost={path_cost(path, traffic):.0f}")
+
+def cmd_solver(args):
+    """
+    Compare value iteration with the sampling (Q-learning) loop on training time and route cost.
+    """
+    for size in args.sizes:
+        graph = make_grid_graph(size, size)
+        random.seed(args.seed)
+        traffic = generate_random_traffic(graph)
+        compiled = CompiledGraph.from_networkx(graph, traffic)
+        start, goal, _ = pick_od_pair(graph, args.max_hops, args.seed)
+        optimum = nx.dijkstra_path_length(graph, start, goal, weight=lambda u, v, d: traffic[(u, v)])
+
+        for solver in ("q_learning", "value_iteration"):
+            random.seed(args.seed)
+            np.random.seed(args.seed)
+            env = CityTrafficEnv(graph, start, goal, traffic, max_steps=300, compiled_graph=compiled)
+            gamma = args.gamma if solver == "q_learning" else args.vi_gamma
+            agent = QLearningAgent(env, alpha=0.1, gamma=gamma, epsilon=0.5, epsilon_decay=0.995,
+                                   min_epsilon=0.05, mask_actions=True)
+            begin = time.perf_counter()
+            if solver == "q_learning":
+                work = f"{train_agent(env, agent, args.episodes, monitor=ConvergenceMonitor(env))} episodes"
+            else:
+                work = f"{agent.solve_value_iteration(tolerance=args.tolerance)} sweeps"
+            elapsed = time.perf_counter() - begin
+            path = get_shortest_path(agent, env)
+            print(f"[solver] grid {size}x{size} {solver}: {elapsed:.3f}s ({work}), reached goal={path[-1] == goal}, "
+                  f"route cost={path_cost(path, traffic):.0f} (optimum {optimum:.0f})")
+
+def cmd_corridor(args):
+    """
+    Compare training on a start-goal corridor with training on the whole graph.
+    """
+    for size in args.sizes:
+        graph = make_grid_graph(size, size)
+        random.seed(args.seed)
+        traffic = generate_random_traffic(graph)
+        compiled = CompiledGraph.from_networkx(graph, traffic)
+        index = MapIndex(graph, compiled)
+        start, goal, _ = pick_od_pair(graph, args.max_hops, args.seed)
+        optimum = nx.dijkstra_path_length(graph, start, goal, weight=lambda u, v, d: traffic[(u, v)])
+
+        for mode in args.modes:
+            begin = time.perf_counter()
+            corridor = build_corridor(mode, compiled, compiled.node_index[start], compiled.node_index[goal],
+                                      lats=index.lats, lons=index.lons, k=args.k, buffer_hops=args.buffer_hops)
+            corridor_seconds = time.perf_counter() - begin
+            sub = compiled if corridor is None else corridor.compiled
+
+            random.seed(args.seed)
+            np.random.seed(args.seed)
+            env = CityTrafficEnv(graph, start, goal, traffic, max_steps=300, compiled_graph=sub)
+            agent = QLearningAgent(env, alpha=0.1, gamma=0.9, epsilon=0.5, epsilon_decay=0.995, min_epsilon=0.05,
+                                   mask_actions=True)
+            begin = time.perf_counter()
+            episodes = train_agent(env, agent, args.episodes, monitor=ConvergenceMonitor(env))
+            elapsed = time.perf_counter() - begin
+            path = get_shortest_path(agent, env)
+            print(f"[corridor] grid {size}x{size} {mode}: {sub.num_nodes} nodes, Q {agent.Q.nbytes / 1024:.0f} KiB, "
+                  f"corridor {corridor_seconds * 1000:.1f} ms, trained {episodes} episodes in {elapsed:.2f}s, "
+                  f"reached goal={path[-1] == goal}, route cost={path_cost(path, traffic):.0f} (optimum {optimum:.0f})")
+
+def cmd_contraction(args):
+    """
+    Compare training on a graph with degree-2 chains contracted against the full graph.
+    """
+    for segments in args.segments:
+        graph = subdivide_edges(make_grid_graph(args.rows, args.cols), segments)
+        random.seed(args.seed)
+        traffic = generate_random_traffic(graph)
+        compiled = CompiledGraph.from_networkx(graph, traffic)
+        start, goal, hops = pick_od_pair(graph, args.max_hops * segments, args.seed)
+        optimum = nx.dijkstra_path_length(graph, start, goal, weight=lambda u, v, d: traffic[(u, v)])
+
+        for contract in (False, True):
+            begin = time.perf_counter()
+            contracted = contract_chains(compiled, [compiled.node_index[start], compiled.node_index[goal]]) if contract else None
+            contract_seconds = time.perf_counter() - begin
+            sub, sub_traffic = (contracted.compiled, contracted.traffic) if contract else (compiled, traffic)
+
+            random.seed(args.seed)
+            np.random.seed(args.seed)
+            env = CityTrafficEnv(graph, start, goal, sub_traffic, max_steps=args.max_steps, compiled_graph=sub)
+            agent = QLearningAgent(env, alpha=0.1, gamma=0.9, epsilon=0.5, epsilon_decay=0.995, min_epsilon=0.05,
+                                   mask_actions=True)
+            begin = time.perf_counter()
+            episodes = train_agent(env, agent, args.episodes, monitor=ConvergenceMonitor(env))
+            elapsed = time.perf_counter() - begin
+            path = get_shortest_path(agent, env)
+            if contract:
+                path = contracted.expand_path(path)
+            print(f"[contraction] {segments} segments/edge, {hops} hops, contracted={contract}: {sub.num_nodes} states "
+                  f"({contract_seconds * 1000:.0f} ms), trained {episodes} episodes in {elapsed:.2f}s, "
+                  f"reached goal={path[-1] == goal}, route cost={path_cost(path, traffic):.0f} (optimum {optimum:.0f})")
+
+def cmd_batch(args):
+    """
+    Compare planning many origin-destination pairs with one run per pair, one per goal, and
+    one multi-goal run for all goals.
+    """
+    graph = make_grid_graph(args.rows, args.cols)
+    random.seed(args.seed)
+    traffic = generate_random_traffic(graph)
+    compiled = CompiledGraph.from_networkx(graph, traffic)
+    rng = random.Random(args.seed)
+    nodes = list(graph.nodes())
+    goals = rng.sample(nodes, args.goals)
+    pairs = [(start, rng.choice(goals)) for start in rng.sample(nodes, args.pairs)]
+    params = dict(alpha=0.1, gamma=0.9, epsilon=0.5, epsilon_decay=0.995, min_epsilon=0.05, mask_actions=True)
+
+    runs = (("per pair", [[pair] for pair in pairs], False), ("grouped by goal", [pairs], False),
+            ("multi-goal", [pairs], True))
+    for label, batches, multi_goal in runs:
+        begin = time.perf_counter()
+        routes, episodes = {}, 0
+        for batch in batches:
+            batch_routes, batch_episodes = route_batch(graph, compiled, traffic, batch, num_workers=args.workers,
+                                                       seed=args.seed, multi_goal=multi_goal,
+                                                       multi_goal_episodes=args.multi_goal_episodes,
+                                                       agent_params=params, episodes=args.episodes,
+                                                       num_envs=args.num_envs)
+            routes.update(batch_routes)
+            episodes += batch_episodes
+        elapsed = time.perf_counter() - begin
+        ratios = [path_cost(path, traffic) / nx.dijkstra_path_length(graph, start, end,
+                                                                     weight=lambda u, v, d: traffic[(u, v)])
+                  for (start, end), path in routes.items() if start != end and path[-1] == end]
+        reached = sum(path[-1] == end for (_, end), path in routes.items())
+        print(f"[batch] {len(pairs)} pairs, {args.goals} goals, {label}: {episodes} episodes in {elapsed:.2f}s, "
+              f"reached goal {reached}/{len(routes)}, mean cost/optimum={np.mean(ratios):.3f}")
+
+def cmd_replay(args):
+    """
+    Compare the sample efficiency of the online TD rule with uniform and prioritized replay.
+
+    Each rule trains for the same numbers of episodes (so the same environment steps); the
+    route quality reached at each budget shows how much every sampled transition is worth.
+    """
+    graph = make_grid_graph(args.rows, args.cols)
+    random.seed(args.seed)
+    traffic = generate_random_traffic(graph)
+    compiled = CompiledGraph.from_networkx(graph, traffic)
+    start, goal, hops = pick_od_pair(graph, args.max_hops, args.seed)
+    optimum = nx.dijkstra_path_length(graph, start, goal, weight=lambda u, v, d: traffic[(u, v)])
+
+    runs = (("online", None), ("uniform replay", False), ("prioritized replay", True))
+    for episodes in args.episodes:
+        for label, prioritized in runs:
+            ratios, steps, elapsed = [], 0, 0.0
+            for trial in range(args.trials):
+                seed = args.seed + trial
+                np.random.seed(seed)
+                env = CityTrafficEnv(graph, start, goal, traffic, max_steps=args.max_steps, compiled_graph=compiled)
+                agent = QLearningAgent(env, alpha=0.1, gamma=0.9, epsilon=0.5, epsilon_decay=0.995,
+                                       min_epsilon=0.05, mask_actions=True)
+                vec_env = VecCityTrafficEnv(compiled, start, goal, args.num_envs, max_steps=args.max_steps, seed=seed)
+                replay = None
+                if prioritized is not None:
+                    replay = ReplayBuffer(args.capacity, prioritized=prioritized, seed=seed)
+                begin = time.perf_counter()
+                train_agent_vectorized(vec_env, agent, episodes, replay=replay, replay_ratio=args.replay_ratio,
+                                       replay_batch_size=args.batch_size)
+                elapsed += time.perf_counter() - begin
+                steps += vec_env.total_steps
+                path = get_shortest_path(agent, env)
+                if path[-1] == goal:
+                    ratios.append(path_cost(path, traffic) / optimum)
+            quality = f"mean cost/optimum={np.mean(ratios):.3f}" if ratios else "no route"
+            print(f"[replay] {hops} hops, {episodes} episodes, {label}: reached goal {len(ratios)}/{args.trials}, "
+                  f"{quality}, {steps // args.trials} env steps, {elapsed / args.trials:.2f}s per run")
+
+def pick_od_pair(graph, max_hops, seed):
+    """
+    Pick a random start node and a goal as far from it as possible within max_hops.
+
+    Bounding the hop distance keeps episodes on very large graphs within the step limit.
+    """
+    rng = random.Random(seed)
+    start = rng.choice(list(graph.nodes()))
+    hops = nx.single_source_shortest_path_length(graph, start, cutoff=max_hops)
+    farthest = max(hops.values())
+    goal = rng.choice(sorted(node for node, h in hops.items() if h == farthest))
+    return start, goal, farthest
+
+def run_suite_case(kind, num_nodes, args):
+    """
+    Build one synthetic graph, train a route on it and collect throughput and quality metrics.
+
+    Peak memory is traced (tracemalloc) over graph construction, compilation and agent
+    setup; timings are taken separately because tracing slows Python down.
+
+    Returns:
+        A JSON-serializable dictionary of results.
+    """
+    tracemalloc.start()
+    begin = time.perf_counter()
+    graph = make_synthetic_graph(kind, num_nodes, seed=args.seed)
+    random.seed(args.seed)
+    traffic = generate_random_traffic(graph)
+    compiled = CompiledGraph.from_networkx(graph, traffic)
+    start, goal, hops = pick_od_pair(graph, args.max_hops, args.seed)
+    env = CityTrafficEnv(graph, start, goal, traffic, max_steps=args.max_steps, compiled_graph=compiled)
+    agent = QLearningAgent(env, alpha=0.1, gamma=0.9, epsilon=0.5, epsilon_decay=0.995, min_epsilon=0.05,
+                           q_storage=args.q_storage, mask_actions=True)
+    setup_seconds = time.perf_counter() - begin
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    steps_per_second = bench_env_steps(graph, traffic, args.steps, compiled_graph=compiled, seed=args.seed)
+
+    random.seed(args.seed)
+    np.random.seed(args.seed)
+    begin = time.perf_counter()
+    episodes = train_agent(env, agent, args.episodes, monitor=ConvergenceMonitor(env))
+    training_seconds = time.perf_counter() - begin
+
+    path = get_shortest_path(agent, env)
+    optimum = nx.dijkstra_path_length(graph, start, goal, weight=lambda u, v, d: traffic[(u, v)])
+    reached = path[-1] == goal
+    cost = path_cost(path, traffic)
+    return {
+        "kind": kind,
+        "requested_nodes": num_nodes,
+        "nodes": graph.number_of_nodes(),
+        "edges": graph.number_of_edges(),
+        "start": start,
+        "goal": goal,
+        "hops": hops,
+        "setup_seconds": round(setup_seconds, 3),
+        "peak_memory_bytes": peak_bytes,
+        "env_steps_per_second": round(steps_per_second, 1),
+        "episodes_to_convergence": episodes,
+        "converged": episodes < args.episodes,
+        "training_seconds": round(training_seconds, 3),
+        "reached_goal": reached,
+        "route_cost": cost,
+        "optimal_cost": optimum,
+        "cost_ratio": round(cost / optimum, 4) if reached and optimum else None,
+    }
+
+def cmd_suite(args):
+    """
+    Run the synthetic benchmark suite and write the results as JSON.
+    """
+    results = []
+    for kind in args.kinds:
+        for num_nodes in args.sizes:
+            result = run_suite_case(kind, num_nodes, args)
+            results.append(result)
+            ratio = result["cost_ratio"] if result["cost_ratio"] is not None else "n/a"
+            print(f"[suite] {kind} n={result['nodes']}: {result['env_steps_per_second']:,.0f} steps/s, "
+                  f"{result['episodes_to_convergence']} episodes in {result['training_seconds']:.1f}s, "
+                  f"peak {result['peak_memory_bytes'] / 2**20:.1f} MiB, cost/optimum={ratio}")
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "networkx": nx.__version__,
+        "settings": {key: value for key, value in vars(args).items() if key not in ("func", "command")},
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"[suite] Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = {(r["kind"], r["requested_nodes"]): r for r in json.load(f)["results"]}
+        for result in results:
+            previous = baseline.get((result["kind"], result["requested_nodes"]))
+            if previous is None:
+                continue
+            print(f"[suite] {result['kind']} n={result['requested_nodes']} vs baseline: "
+                  f"steps/s {result['env_steps_per_second'] / previous['env_steps_per_second']:.2f}x, "
+                  f"episodes {previous['episodes_to_convergence']} -> {result['episodes_to_convergence']}, "
+                  f"peak memory {result['peak_memory_bytes'] / previous['peak_memory_bytes']:.2f}x")
+
+def add_comparison_arguments(subparser):
+    """
+    Add the graph and run arguments shared by agent comparison benchmarks.
+    """
+    subparser.add_argument("--place", help="OSM place to use instead of a synthetic grid.")
+    subparser.add_argument("--rows", type=int, default=20)
+    subparser.add_argument("--cols", type=int, default=20)
+    subparser.add_argument("--runs", type=int, default=10)
+    subparser.add_argument("--episodes", type=int, default=3000)
+    subparser.add_argument("--seed", type=int, default=0)
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for TrafficNavigator-RL.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    env_steps = subparsers.add_parser("env-steps", help="Environment steps/sec, NetworkX vs CSR.")
+    env_steps.add_argument("--rows", type=int, default=60)
+    env_steps.add_argument("--cols", type=int, default=60)
+    env_steps.add_argument("--steps", type=int, default=200000)
+    env_steps.add_argument("--seed", type=int, default=0)
+    env_steps.set_defaults(func=cmd_env_steps)
+
+    parallel = subparsers.add_parser("parallel", help="Serial vs multi-process training wall time.")
+    parallel.add_argument("--rows", type=int, default=30)
+    parallel.add_argument("--cols", type=int, default=30)
+    parallel.add_argument("--episodes", type=int, default=3000)
+    parallel.add_argument("--workers", type=int, default=4)
+    parallel.add_argument("--sync-every", type=int, default=100)
+    parallel.add_argument("--seed", type=int, default=0)
+    parallel.set_defaults(func=cmd_parallel)
+
+    q_memory = subparsers.add_parser("q-memory", help="Dense vs compact Q-table memory.")
+    q_memory.add_argument("--place", help='OSM place, e.g. "Los Alamitos, California, USA".')
+    q_memory.set_defaults(func=cmd_q_memory)
+
+    masking = subparsers.add_parser("masking", help="Episodes to convergence with/without action masking.")
+    add_comparison_arguments(masking)
+    masking.set_defaults(func=cmd_masking)
+
+    warm_start = subparsers.add_parser("warm-start", help="Episodes to convergence with heuristic Q init.")
+    add_comparison_arguments(warm_start)
+    warm_start.set_defaults(func=cmd_warm_start)
+
+    replan_parser = subparsers.add_parser("replan", help="Incremental re-planning vs retraining after traffic changes.")
+    replan_parser.add_argument("--rows", type=int, default=20)
+    replan_parser.add_argument("--cols", type=int, default=20)
+    replan_parser.add_argument("--episodes", type=int, default=3000)
+    replan_parser.add_argument("--jams", type=int, default=2, help="Edges of the learned route to jam.")
+    replan_parser.add_argument("--jam-cost", type=int, default=10)
+    replan_parser.add_argument("--changes", type=int, default=10, help="Random edges given a new cost.")
+    replan_parser.add_argument("--replan-episodes", type=int, default=300)
+    replan_parser.add_argument("--seed", type=int, default=0)
+    replan_parser.set_defaults(func=cmd_replan)
+
+    solver = subparsers.add_parser("solver", help="Value iteration vs Q-learning training time.")
+    solver.add_argument("--sizes", nargs="+", type=int, default=[10, 30, 100, 300])
+    solver.add_argument("--episodes", type=int, default=3000)
+    solver.add_argument("--gamma", type=float, default=0.9, help="Discount factor of Q-learning.")
+    solver.add_argument("--vi-gamma", type=float, default=1.0, help="Discount factor of value iteration.")
+    solver.add_argument("--tolerance", type=float, default=1e-6)
+    solver.add_argument("--max-hops", type=int, default=20, help="Upper bound on start-goal hop distance.")
+    solver.add_argument("--seed", type=int, default=0)
+    solver.set_defaults(func=cmd_solver)
+
+    corridor = subparsers.add_parser("corridor", help="Training on a start-goal corridor vs the whole graph.")
+    corridor.add_argument("--sizes", nargs="+", type=int, default=[30, 100, 300])
+    corridor.add_argument("--modes", nargs="+", choices=CORRIDOR_MODES, default=list(CORRIDOR_MODES))
+    corridor.add_argument("--episodes", type=int, default=3000)
+    corridor.add_argument("--k", type=int, default=3, help="Paths for the k_paths corridor.")
+    corridor.add_argument("--buffer-hops", type=int, default=2)
+    corridor.add_argument("--max-hops", type=int, default=20, help="Upper bound on start-goal hop distance.")
+    corridor.add_argument("--seed", type=int, default=0)
+    corridor.set_defaults(func=cmd_corridor)
+
+    contraction = subparsers.add_parser("contraction", help="Training with degree-2 chains contracted vs not.")
+    contraction.add_argument("--rows", type=int, default=20)
+    contraction.add_argument("--cols", type=int, default=20)
+    contraction.add_argument("--segments", nargs="+", type=int, default=[1, 2, 4],
+                             help="Pieces each grid edge is split into, like OSM shape points.")
+    contraction.add_argument("--episodes", type=int, default=3000)
+    contraction.add_argument("--max-steps", type=int, default=300)
+    contraction.add_argument("--max-hops", type=int, default=10, help="Upper bound on start-goal intersection hops.")
+    contraction.add_argument("--seed", type=int, default=0)
+    contraction.set_defaults(func=cmd_contraction)
+
+    batch = subparsers.add_parser("batch", help="Many OD pairs: one training run per pair, per goal, or multi-goal.")
+    batch.add_argument("--rows", type=int, default=20)
+    batch.add_argument("--cols", type=int, default=20)
+    batch.add_argument("--pairs", type=int, default=50)
+    batch.add_argument("--goals", type=int, default=5)
+    batch.add_argument("--episodes", type=int, default=3000)
+    batch.add_argument("--num-envs", type=int, default=32)
+    batch.add_argument("--workers", type=int, default=1)
+    batch.add_argument("--multi-goal-episodes", type=int, default=6000)
+    batch.add_argument("--seed", type=int, default=0)
+    batch.set_defaults(func=cmd_batch)
+
+    replay = subparsers.add_parser("replay", help="Online TD updates vs uniform and prioritized experience replay.")
+    replay.add_argument("--rows", type=int, default=20)
+    replay.add_argument("--cols", type=int, default=20)
+    replay.add_argument("--episodes", nargs="+", type=int, default=[100, 200, 400, 800],
+                        help="Training budgets to compare at.")
+    replay.add_argument("--trials", type=int, default=5, help="Seeds per budget and rule.")
+    replay.add_argument("--replay-ratio", type=float, default=4.0, help="Replayed transitions per env transition.")
+    replay.add_argument("--batch-size", type=int, default=64)
+    replay.add_argument("--capacity", type=int, default=50000)
+    replay.add_argument("--num-envs", type=int, default=32)
+    replay.add_argument("--max-steps", type=int, default=300)
+    replay.add_argument("--max-hops", type=int, default=40, help="Upper bound on start-goal hop distance.")
+    replay.add_argument("--seed", type=int, default=0)
+    replay.set_defaults(func=cmd_replay)
+
+    suite = subparsers.add_parser("suite", help="Synthetic graphs from 100 to 100k nodes, written to JSON.")
+    suite.add_argument("--kinds", nargs="+", choices=GRAPH_KINDS, default=list(GRAPH_KINDS))
+    suite.add_argument("--sizes", nargs="+", type=int, default=[100, 1000, 10000, 100000])
+    suite.add_argument("--episodes", type=int, default=3000)
+    suite.add_argument("--steps", type=int, default=100000, help="Random steps for the steps/sec measurement.")
+    suite.add_argument("--max-steps", type=int, default=300)
+    suite.add_argument("--max-hops", type=int, default=20, help="Upper bound on start-goal hop distance.")
+    suite.add_argument("--q-storage", choices=("dense", "compact"), default="dense")
+    suite.add_argument("--seed", type=int, default=0)
+    suite.add_argument("--output", default="benchmark_results.json")
+    suite.add_argument("--baseline", help="Earlier results file to compare against.")
+    suite.set_defaults(func=cmd_suite)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+# contraction.py
+import numpy as np
+
+from graph_core import CompiledGraph
+
+class ContractedGraph:
+    """
+    A routing graph with chains of degree-2 nodes collapsed into single weighted edges.
+
+    OSM splits curved roads into many degree-2 nodes; each one is a Q-state and costs an
+    environment step to cross, although there is nothing to decide there. Contraction keeps
+    only intersections, dead ends and protected nodes (such as the goal of a query) and
+    joins them with super-edges whose cost is the sum of the chain's traffic costs.
+
+    Kept nodes keep their IDs. `expand_path` puts the chains' interior nodes back into a
+    route, so it can be drawn with its full geometry and costed against the original traffic,
+    and `chain_exits` leads an unprotected start inside a chain onto the contracted graph.
+    """
+    def __init__(self, source, kept, offsets, neighbors, costs, interiors):
+        """
+        Initialize from the arrays built by `contract_chains`.
+
+        Args:
+            source: The CompiledGraph that was contracted.
+            kept: Sorted source node indices of the kept nodes.
+            offsets, neighbors, costs: CSR arrays of the contracted graph, with neighbors as
+                indices into `kept`.
+            interiors: For every CSR slot, the tuple of source node indices crossed by the
+                super-edge (empty for an edge of the source graph).
+        """
+        self.source = source
+        self.kept = kept
+        self.compiled = CompiledGraph([source.nodes[i] for i in kept.tolist()], offsets, neighbors, costs)
+
+        nodes = self.compiled.nodes
+        sources = np.repeat(np.arange(self.compiled.num_nodes), self.compiled.degrees).tolist()
+        self.traffic = {}
+        self.chains = {}
+        # Source node index -> (u, v) contracted indices of the super-edge it lies on.
+        self._chain_of = {}
+        for u, v, cost, interior in zip(sources, self.compiled.neighbors.tolist(), self.compiled.costs.tolist(),
+                                        interiors):
+            self.traffic[(nodes[u], nodes[v])] = cost
+            if interior:
+                self.chains[(nodes[u], nodes[v])] = [source.nodes[i] for i in interior]
+                if u < v:
+                    for i in interior:
+                        self._chain_of[i] = (u, v)
+
+    @property
+    def num_nodes(self):
+        """
+        Number of nodes in the contracted graph.
+        """
+        return self.compiled.num_nodes
+
+    def expand_path(self, path):
+        """
+        Return a path of node IDs with the interior nodes of every super-edge put back.
+        """
+        expanded = path[:1]
+        for u, v in zip(path, path[1:]):
+            expanded.extend(self.chains.get((u, v), ()))
+            expanded.append(v)
+        return expanded
+
+    def chain_exits(self, node):
+        """
+        Return the ways from a node of the source graph onto the contracted graph.
+
+        A kept node is its own exit; a node inside a chain has one exit toward each end of its
+        super-edge. A node on a dropped ring has none, since no kept node is reachable from it.
+
+        Returns:
+            A list of (exit_node, lead_in) tuples, where lead_in is the path of node IDs from
+            `node` to the kept node `exit_node`.
+        """
+        index = self.source.node_index[node]
+        if index not in self._chain_of:
+            position = np.searchsorted(self.kept, index)
+            if position == len(self.kept) or self.kept[position] != index:
+                return []
+            return [(node, [node])]
+        u, v = (self.compiled.nodes[i] for i in self._chain_of[index])
+        chain = self.chains[(u, v)]
+        position = chain.index(node)
+        return [(u, chain[position::-1] + [u]), (v, chain[position:] + [v])]
+
+    def local_edges(self, source_edges):
+        """
+        Translate (u_index, v_index) pairs of the source graph into the contracted edges that
+        contain them, dropping edges on chains that were removed.
+        """
+        local = {source: i for i, source in enumerate(self.kept.tolist())}
+        edges = []
+        for u, v in source_edges:
+            if u in local and v in local:
+                edges.append((local[u], local[v]))
+            elif u in self._chain_of or v in self._chain_of:
+                edges.append(self._chain_of.get(u) or self._chain_of[v])
+        return edges
+
+def contract_chains(compiled_graph, protected=()):
+    """
+    Collapse every chain of unprotected degree-2 nodes into a single edge.
+
+    Chains that would duplicate an existing edge between the same endpoints, or loop back to
+    where they started, keep their middle node so the contracted graph stays simple (one edge
+    per node pair, as CompiledGraph lookups assume). The result depends only on the topology
+    and the protected nodes, so a cached Q-table for it stays valid under new traffic.
+
+    Components made only of degree-2 nodes (isolated rings) are dropped unless protected.
+
+    Args:
+        compiled_graph: A CompiledGraph.
+        protected: Node indices that must stay in the graph, e.g. the start and goal.
+
+    Returns:
+        A ContractedGraph.
+    """
+    keep = compiled_graph.degrees != 2
+    keep[list(protected)] = True
+    while True:
+        kept = np.flatnonzero(keep).tolist()
+        rows = [_walk_chains(compiled_graph, keep, a) for a in kept]
+        split = _conflicting_interiors(kept, rows)
+        if not split:
+            break
+        keep[split] = True
+
+    kept = np.flatnonzero(keep)
+    local_index = np.full(compiled_graph.num_nodes, -1, dtype=np.int64)
+    local_index[kept] = np.arange(len(kept))
+    offsets = np.zeros(len(kept) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(row) for row in rows])
+    ends = [end for row in rows for end, _, _ in row]
+    return ContractedGraph(
+        compiled_graph, kept, offsets,
+        local_index[np.array(ends, dtype=np.int64)],
+        [cost for row in rows for _, cost, _ in row],
+        [interior for row in rows for _, _, interior in row],
+    )
+
+def _walk_chains(compiled_graph, keep, a):
+    """
+    Follow every edge of kept node `a` through unkept nodes to the next kept node.
+
+    Returns:
+        A list of (end, cost, interior) tuples in `a`'s neighbor order.
+    """
+    row = []
+    for v, cost in zip(compiled_graph.neighbor_indices(a), compiled_graph.edge_costs(a)):
+        previous, interior = a, []
+        while not keep[v]:
+            interior.append(v)
+            # An unkept node has exactly two neighbors: continue through the other one.
+            first, second = compiled_graph.neighbor_indices(v)
+            step = 1 if first == previous else 0
+            cost += compiled_graph.edge_costs(v)[step]
+            previous, v = v, (first, second)[step]
+        row.append((v, cost, tuple(interior)))
+    return row
+
+def _conflicting_interiors(kept, rows):
+    """
+    Return the middle node of every chain that loops or duplicates another edge of its row.
+
+    Per row and endpoint, the edge with the fewest interior nodes stays; loops are all split.
+    """
+    split = []
+    for a, row in zip(kept, rows):
+        by_end = {}
+        for end, _, interior in row:
+            by_end.setdefault(end, []).append(interior)
+        for end, interiors in by_end.items():
+            if len(interiors) == 1 and end != a:
+                continue
+            interiors = sorted(interiors, key=len)
+            for interior in (interiors if end == a else interiors[1:]):
+                if interior:
+                    split.append(interior[(len(interior) - 1) // 2])
+    return split
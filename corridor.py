@@ -0,0 +1,168 @@
+# corridor.py
+import heapq
+import math
+import numpy as np
+
+from heuristics import _haversine
+
+CORRIDOR_MODES = ("none", "ellipse", "k_paths")
+
+class Corridor:
+    """
+    The part of a city graph between a start and a goal, compiled as its own CompiledGraph.
+
+    Training on `compiled` sizes the environment and Q-table to the corridor instead of the
+    whole city. The subgraph keeps the city's node IDs, so routes read off an agent trained on
+    it are already in original node IDs; `city_indices` and `local_edges` translate between
+    the two graphs' integer indices.
+    """
+    def __init__(self, city_graph, city_indices):
+        """
+        Compile the subgraph of a city graph induced by some of its nodes.
+
+        Args:
+            city_graph: The city's CompiledGraph.
+            city_indices: Node indices of the city graph to keep.
+        """
+        self.city_indices = np.unique(np.asarray(city_indices, dtype=np.int64))
+        self.compiled = city_graph.subgraph(self.city_indices)
+        self.local_index = {city: local for local, city in enumerate(self.city_indices.tolist())}
+
+    @property
+    def num_nodes(self):
+        """
+        Number of nodes in the corridor.
+        """
+        return self.compiled.num_nodes
+
+    def local_edges(self, city_edges):
+        """
+        Translate (u_index, v_index) pairs of the city graph into corridor indices, dropping
+        edges with an endpoint outside the corridor.
+        """
+        local = self.local_index
+        return [(local[u], local[v]) for u, v in city_edges if u in local and v in local]
+
+def ellipse_corridor(city_graph, lats, lons, start_index, goal_index, slack=1.4, margin_meters=250.0,
+                     max_attempts=3):
+    """
+    Keep the nodes inside an ellipse with the start and goal as foci.
+
+    A node p is kept when d(start, p) + d(p, goal) <= slack * d(start, goal) + 2 * margin, with
+    great-circle distances. Only the part connected to the start is kept; if the goal is not
+    in it, the ellipse is widened (slack * 1.5, margin * 2) up to max_attempts times.
+
+    Args:
+        city_graph: The city's CompiledGraph.
+        lats, lons: Node latitudes and longitudes in degrees, aligned with the node indices.
+        start_index, goal_index: Node indices of the start and goal.
+        slack: Ratio of the ellipse's major axis to the start-goal distance.
+        margin_meters: Extra width, so short trips still get room for detours.
+        max_attempts: Number of ellipses tried before giving up.
+
+    Returns:
+        A Corridor, or None if no ellipse connects start and goal.
+    """
+    lat, lon = np.radians(lats), np.radians(lons)
+    to_start = _haversine(lat, lon, lat[start_index], lon[start_index])
+    to_goal = _haversine(lat, lon, lat[goal_index], lon[goal_index])
+    for _ in range(max_attempts):
+        inside = to_start + to_goal <= slack * to_start[goal_index] + 2 * margin_meters
+        reachable = _reachable_within(city_graph, start_index, inside)
+        if goal_index in reachable:
+            return Corridor(city_graph, sorted(reachable))
+        slack, margin_meters = slack * 1.5, margin_meters * 2
+    return None
+
+def k_paths_corridor(city_graph, start_index, goal_index, k=3, penalty=1.5, buffer_hops=2):
+    """
+    Keep the nodes on k cheap start-goal paths plus a buffer of hops around them.
+
+    Alternative paths come from the penalty method: after each Dijkstra search the costs of
+    the edges it used are multiplied by `penalty`, so the next search prefers other streets.
+    Searches stop at the goal, so they only explore about as far as the trip is long.
+
+    Args:
+        city_graph: The city's CompiledGraph.
+        start_index, goal_index: Node indices of the start and goal.
+        k: Number of paths.
+        penalty: Cost multiplier for edges already used by a path.
+        buffer_hops: Hops around the paths added to the corridor.
+
+    Returns:
+        A Corridor, or None if the goal is unreachable from the start.
+    """
+    scale = {}
+    region = set()
+    for _ in range(k):
+        path = _dijkstra_path(city_graph, start_index, goal_index, scale)
+        if path is None:
+            return None
+        region.update(path)
+        for u, v in zip(path, path[1:]):
+            scale[(u, v)] = scale[(v, u)] = scale.get((u, v), 1.0) * penalty
+
+    frontier = set(region)
+    for _ in range(buffer_hops):
+        frontier = {n for index in frontier for n in city_graph.neighbor_indices(index)} - region
+        region |= frontier
+    return Corridor(city_graph, sorted(region))
+
+def build_corridor(mode, city_graph, start_index, goal_index, lats=None, lons=None, slack=1.4,
+                   margin_meters=250.0, k=3, buffer_hops=2):
+    """
+    Build a corridor with one of CORRIDOR_MODES.
+
+    Returns:
+        A Corridor, or None for "none" or when no corridor connects start and goal, in which
+        case the whole city graph should be used.
+    """
+    if mode == "none":
+        return None
+    if mode == "ellipse":
+        return ellipse_corridor(city_graph, lats, lons, start_index, goal_index, slack=slack,
+                                margin_meters=margin_meters)
+    if mode == "k_paths":
+        return k_paths_corridor(city_graph, start_index, goal_index, k=k, buffer_hops=buffer_hops)
+    raise ValueError(f"Unknown corridor mode: {mode}")
+
+def _reachable_within(compiled_graph, start_index, allowed):
+    """
+    Return the set of node indices reachable from the start through allowed nodes.
+    """
+    seen = {start_index}
+    stack = [start_index]
+    while stack:
+        u = stack.pop()
+        for v in compiled_graph.neighbor_indices(u):
+            if allowed[v] and v not in seen:
+                seen.add(v)
+                stack.append(v)
+    return seen
+
+def _dijkstra_path(compiled_graph, start_index, goal_index, scale):
+    """
+    Return the cheapest path from start to goal as node indices, with edge costs multiplied by
+    `scale[(u, v)]` where present, or None if the goal is unreachable.
+    """
+    dist = {start_index: 0.0}
+    previous = {}
+    settled = set()
+    heap = [(0.0, start_index)]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if u in settled:
+            continue
+        if u == goal_index:
+            path = [u]
+            while path[-1] != start_index:
+                path.append(previous[path[-1]])
+            return path[::-1]
+        settled.add(u)
+        for v, cost in zip(compiled_graph.neighbor_indices(u), compiled_graph.edge_costs(u)):
+            nd = d + cost * scale.get((u, v), 1.0)
+            if nd < dist.get(v, math.inf):
+                dist[v] = nd
+                previous[v] = u
+                heapq.heappush(heap, (nd, v))
+    return None
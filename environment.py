@@ -9,7 +9,7 @@ class CityTrafficEnv(gym.Env):
     """
     A Gym-compliant environment for simulating traffic in a city graph.
     """
-    def __init__(self, graph, start_node, goal_node, traffic_dict, max_steps=200):
+    def __init__(self, graph, start_node, goal_node, traffic_dict, max_steps=200, compiled_graph=None):
         """
         Initialize the environment.
 
@@ -19,36 +19,60 @@ class CityTrafficEnv(gym.Env):
             goal_node: The target node ID.
             traffic_dict: A dictionary with traffic costs for edges.
             max_steps: Maximum number of steps per episode.
+            compiled_graph: Optional CompiledGraph built from `graph` and `traffic_dict`.
+                When given, the environment steps on integer node indices instead of
+                querying the NetworkX graph and traffic dictionary.
         """
         super().__init__()
         self.graph = graph
-        self.nodes = list(graph.nodes())
+        self.compiled_graph = compiled_graph
+        self.nodes = compiled_graph.nodes if compiled_graph is not None else list(graph.nodes())
         self.num_nodes = len(self.nodes)
         self.start_node = start_node
         self.goal_node = goal_node
         self.traffic_dict = traffic_dict
         
         # Define the observation space and action space.
-        max_degree = max(dict(graph.degree()).values())
+        if compiled_graph is not None:
+            max_degree = compiled_graph.max_degree
+            self.start_index = compiled_graph.node_index[start_node]
+            self.goal_index = compiled_graph.node_index[goal_node]
+            self.action_degrees = compiled_graph.degrees
+        else:
+            max_degree = max(dict(graph.degree()).values())
+            self.action_degrees = np.array([len(graph[n]) for n in self.nodes], dtype=np.int64)
         self.observation_space = spaces.Discrete(self.num_nodes)
         self.action_space = spaces.Discrete(max_degree)
         
         self.max_steps = max_steps
         self.current_step = 0
+        # Steps taken over all episodes, for throughput metrics.
+        self.total_steps = 0
         self.current_node = None
+        self.current_index = None
         self.visited_nodes = []
+        self.visited_indices = []
         self.loop_prevention_window = 5  # Number of recent nodes to track to prevent loops.
 
     def reset(self, seed=None, options=None):
         """
         Reset the environment to the starting state.
 
+        Args:
+            seed: Optional seed passed to gym.
+            options: Optional dictionary; "start_node" starts this episode at another node
+                (e.g. to retrain around changed edges) without changing `start_node`.
+
         Returns:
             A tuple containing the initial observation and an empty info dictionary.
         """
         super().reset(seed=seed)
         self.current_step = 0
-        self.current_node = self.start_node
+        self.current_node = (options or {}).get("start_node", self.start_node)
+        if self.compiled_graph is not None:
+            self.current_index = self.compiled_graph.node_index[self.current_node]
+            self.visited_indices = [self.current_index]
+            return self.current_index, {}
         self.visited_nodes = [self.current_node]
         return self._get_observation(), {}
 
@@ -62,7 +86,11 @@ class CityTrafficEnv(gym.Env):
         Returns:
             A tuple of (observation, reward, done, truncated, info).
         """
+        if self.compiled_graph is not None:
+            return self._step_compiled(action)
+
         self.current_step += 1
+        self.total_steps += 1
         # Get list of neighboring nodes.
         neighbors = list(self.graph.neighbors(self.current_node))
         
@@ -101,10 +129,56 @@ class CityTrafficEnv(gym.Env):
             
         return self._get_observation(), reward, done, False, {}
 
+    def _step_compiled(self, action):
+        """
+        Execute an action using the compiled CSR graph.
+
+        Mirrors `step` exactly (same random draws, rewards and loop prevention), but works
+        on integer node indices and precomputed edge costs.
+        """
+        self.current_step += 1
+        self.total_steps += 1
+        graph = self.compiled_graph
+        neighbors = graph.neighbor_indices(self.current_index)
+
+        # If action index is out-of-range, select a random neighbor.
+        if action >= len(neighbors):
+            next_index = random.choice(neighbors)
+        else:
+            next_index = neighbors[action]
+
+        # Prevent loops by checking recently visited nodes.
+        recent_indices = self._get_recent_indices()
+        next_index = self._prevent_loops(next_index, neighbors, recent_indices)
+
+        # Edge costs are aligned with the neighbor list.
+        traffic_cost = graph.edge_costs(self.current_index)[neighbors.index(next_index)]
+
+        # Apply penalty for revisiting recent nodes.
+        revisit_penalty = -2 if next_index in recent_indices else 0
+        reward = -traffic_cost + revisit_penalty
+
+        # Update the current node and visited history.
+        self.current_index = next_index
+        self.current_node = self.nodes[next_index]
+        self.visited_indices.append(next_index)
+
+        # Check if the goal has been reached or if maximum steps exceeded.
+        done = False
+        if next_index == self.goal_index:
+            reward = 100.0  # High reward for reaching the goal.
+            done = True
+        elif self.current_step >= self.max_steps:
+            done = True
+
+        return next_index, reward, done, False, {}
+
     def _get_observation(self):
         """
         Convert the current node to its corresponding observation index.
         """
+        if self.compiled_graph is not None:
+            return self.current_index
         return self.nodes.index(self.current_node)
 
     def _get_recent_nodes(self):
@@ -118,6 +192,17 @@ class CityTrafficEnv(gym.Env):
             return self.visited_nodes[-self.loop_prevention_window:-1]
         return self.visited_nodes[:-1] if len(self.visited_nodes) > 0 else []
 
+    def _get_recent_indices(self):
+        """
+        Retrieve recently visited node indices for loop prevention (compiled mode).
+
+        Returns:
+            A list of node indices.
+        """
+        if len(self.visited_indices) >= self.loop_prevention_window:
+            return self.visited_indices[-self.loop_prevention_window:-1]
+        return self.visited_indices[:-1]
+
     def _prevent_loops(self, proposed_node, neighbors, recent_nodes):
         """
         Modify the proposed next node to avoid loops if possible.
@@ -141,3 +226,164 @@ class CityTrafficEnv(gym.Env):
         Render method for compatibility. (Not implemented)
         """
         pass
+
+class VecCityTrafficEnv:
+    """
+    A batched version of CityTrafficEnv that advances many independent episodes at once.
+
+    All episodes run on a CompiledGraph toward the same goal, or toward one drawn at random
+    from `goal_nodes` per episode (see `goals`). They start from the same node, or from one
+    drawn at random from `start_nodes` to train a route to the goal from every one of them.
+    State is kept in NumPy arrays (current node indices, step counters and a window of
+    recently visited nodes), and finished episodes are reset automatically.
+    """
+    def __init__(self, compiled_graph, start_node, goal_node, num_envs, max_steps=200, seed=None,
+                 start_nodes=None, goal_nodes=None):
+        """
+        Initialize the batched environment.
+
+        Args:
+            compiled_graph: A CompiledGraph of the city's road network with traffic costs.
+            start_node: The starting node ID.
+            goal_node: The target node ID.
+            num_envs: Number of episodes advanced per step.
+            max_steps: Maximum number of steps per episode.
+            seed: Optional seed for the environment's random number generator.
+            start_nodes: Optional node IDs each episode draws its start from, instead of
+                always starting at start_node.
+            goal_nodes: Optional node IDs each episode draws its goal from, instead of always
+                heading for goal_node.
+        """
+        self.compiled_graph = compiled_graph
+        self.nodes = compiled_graph.nodes
+        self.num_nodes = compiled_graph.num_nodes
+        self.num_envs = num_envs
+        self.start_node = start_node
+        self.goal_node = goal_node
+        self.start_index = compiled_graph.node_index[start_node]
+        self.goal_index = compiled_graph.node_index[goal_node]
+        self.start_indices = None
+        if start_nodes is not None:
+            self.start_indices = np.array([compiled_graph.node_index[n] for n in start_nodes], dtype=np.int64)
+        self.goal_indices = None
+        if goal_nodes is not None:
+            self.goal_indices = np.array([compiled_graph.node_index[n] for n in goal_nodes], dtype=np.int64)
+        self.max_steps = max_steps
+        self.loop_prevention_window = 5
+        self.rng = np.random.default_rng(seed)
+
+        self.observation_space = spaces.Discrete(self.num_nodes)
+        self.action_space = spaces.Discrete(compiled_graph.max_degree)
+        self.action_degrees = compiled_graph.degrees
+
+        # Padded neighbor matrix (-1 where a node has fewer than max_degree neighbors).
+        degrees = compiled_graph.degrees
+        self._neighbor_matrix = np.full((self.num_nodes, max(compiled_graph.max_degree, 1)), -1, dtype=np.int64)
+        columns = np.arange(len(compiled_graph.neighbors)) - np.repeat(compiled_graph.offsets[:-1], degrees)
+        self._neighbor_matrix[np.repeat(np.arange(self.num_nodes), degrees), columns] = compiled_graph.neighbors
+
+        self.current = np.full(num_envs, self.start_index, dtype=np.int64)
+        # Goal node index of each running episode.
+        self.goals = np.full(num_envs, self.goal_index, dtype=np.int64)
+        self.steps = np.zeros(num_envs, dtype=np.int64)
+        # Steps taken over all episodes, for throughput metrics.
+        self.total_steps = 0
+        # Previously visited nodes, oldest first; the current node is not included.
+        self.recent = np.full((num_envs, self.loop_prevention_window - 1), -1, dtype=np.int64)
+
+    def reset(self, seed=None):
+        """
+        Reset every episode to the starting state.
+
+        Returns:
+            A tuple of (observations, info) where observations is an int array of node indices.
+        """
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        self.current[:] = self._draw_starts(self.num_envs)
+        self.goals[:] = self._draw_goals(self.num_envs)
+        self.steps[:] = 0
+        self.recent[:] = -1
+        return self.current.copy(), {}
+
+    def _draw_starts(self, count):
+        """
+        Return the start node index of `count` new episodes.
+        """
+        if self.start_indices is None:
+            return self.start_index
+        return self.start_indices[self.rng.integers(len(self.start_indices), size=count)]
+
+    def _draw_goals(self, count):
+        """
+        Return the goal node index of `count` new episodes.
+        """
+        if self.goal_indices is None:
+            return self.goal_index
+        return self.goal_indices[self.rng.integers(len(self.goal_indices), size=count)]
+
+    def step(self, actions):
+        """
+        Advance every episode by one step.
+
+        Args:
+            actions: Int array of neighbor indices, one per episode.
+
+        Returns:
+            A tuple of (observations, rewards, dones, truncated, info). Observations of finished
+            episodes are the reset start state; the node they ended on is in
+            info["final_observation"], and info["step_rewards"] holds each step's reward
+            without the goal reward (the edge cost and revisit penalty), e.g. to relabel
+            transitions toward other goals.
+        """
+        graph = self.compiled_graph
+        actions = np.asarray(actions, dtype=np.int64).copy()
+        self.steps += 1
+        self.total_steps += self.num_envs
+        rows = np.arange(self.num_envs)
+        degrees = graph.degrees[self.current]
+
+        # If action index is out-of-range, select a random neighbor.
+        invalid = actions >= degrees
+        if invalid.any():
+            actions[invalid] = (self.rng.random(invalid.sum()) * degrees[invalid]).astype(np.int64)
+        next_nodes = self._neighbor_matrix[self.current, actions]
+
+        # Prevent loops: resample among neighbors that are not recently visited, if any.
+        in_recent = (self.recent == next_nodes[:, None]).any(axis=1)
+        if in_recent.any():
+            conflicted = rows[in_recent]
+            candidates = self._neighbor_matrix[self.current[conflicted]]
+            allowed = (candidates >= 0) & ~(candidates[:, :, None] == self.recent[conflicted][:, None, :]).any(axis=2)
+            has_alternative = allowed.any(axis=1)
+            scores = np.where(allowed, self.rng.random(allowed.shape), -1.0)
+            choice = scores.argmax(axis=1)
+            actions[conflicted[has_alternative]] = choice[has_alternative]
+            next_nodes[conflicted[has_alternative]] = candidates[has_alternative, choice[has_alternative]]
+            in_recent[conflicted[has_alternative]] = False
+
+        # Edge costs are aligned with the CSR neighbor slots.
+        traffic_cost = graph.costs[graph.offsets[self.current] + actions]
+        rewards = -traffic_cost - 2.0 * in_recent
+
+        # Update the current node and visited history.
+        self.recent[:, :-1] = self.recent[:, 1:]
+        self.recent[:, -1] = self.current
+        self.current = next_nodes
+
+        # Check if the goal has been reached or if maximum steps exceeded.
+        step_rewards = rewards.copy()
+        reached = next_nodes == self.goals
+        rewards[reached] = 100.0
+        dones = reached | (self.steps >= self.max_steps)
+
+        observations = next_nodes.copy()
+        info = {"final_observation": next_nodes.copy(), "step_rewards": step_rewards}
+        if dones.any():
+            num_done = int(np.count_nonzero(dones))
+            self.current[dones] = self._draw_starts(num_done)
+            self.goals[dones] = self._draw_goals(num_done)
+            self.steps[dones] = 0
+            self.recent[dones] = -1
+            observations[dones] = self.current[dones]
+        return observations, rewards, dones, np.zeros(self.num_envs, dtype=bool), info
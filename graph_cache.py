@@ -0,0 +1,211 @@
+# graph_cache.py
+import hashlib
+import os
+import re
+import tempfile
+import numpy as np
+import networkx as nx
+import osmnx as ox
+
+from traffic import TrafficStore
+
+def normalize_place(place):
+    """
+    Normalize a place string so equivalent spellings share a cache entry.
+
+    "Los Alamitos ,  CA, USA" and "los alamitos, ca, usa" both become "los alamitos,ca,usa".
+    """
+    parts = [re.sub(r"\s+", " ", part).strip() for part in place.lower().split(",")]
+    return ",".join(part for part in parts if part)
+
+def strip_graph(graph):
+    """
+    Build an undirected copy of a road graph that keeps only node coordinates.
+
+    Args:
+        graph: A NetworkX (multi)graph with `x`/`y` node attributes.
+
+    Returns:
+        An nx.Graph with the same node order and only `x`/`y` attributes.
+    """
+    stripped = nx.Graph()
+    stripped.add_nodes_from((n, {'x': data['x'], 'y': data['y']}) for n, data in graph.nodes(data=True))
+    stripped.add_edges_from(graph.edges())
+    return stripped
+
+class GraphCache:
+    """
+    On-disk cache of processed road graphs stored as NumPy .npz files.
+
+    Each entry holds the node IDs, their coordinates and the edge list as node-index pairs,
+    and optionally the place's current traffic costs in a sidecar file, so traffic updates
+    outlive the in-memory city. Entries are evicted least-recently-used first, together with
+    their traffic, once the directory exceeds `max_bytes`.
+    """
+    def __init__(self, cache_dir="graph_cache", max_bytes=256 * 1024 * 1024):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir: Directory where cache entries are stored.
+            max_bytes: Maximum total size of the cache directory.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, place, network_type):
+        """
+        Return the cache file path for a place and network type.
+        """
+        key = f"{normalize_place(place)}|{network_type}"
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.npz")
+
+    def _traffic_path(self, place, network_type):
+        """
+        Return the traffic sidecar path of a cache entry.
+        """
+        return self._path(place, network_type)[:-len(".npz")] + "-traffic.npz"
+
+    def load_traffic(self, place, graph, network_type="drive"):
+        """
+        Load the stored traffic costs of a place.
+
+        Args:
+            place: The place string.
+            graph: The place's graph, as returned by `load`.
+            network_type: The OSMnx network type of the graph.
+
+        Returns:
+            A TrafficStore, or None if no traffic is stored for the place.
+        """
+        try:
+            with np.load(self._traffic_path(place, network_type)) as data:
+                u, v, costs = data['u'].tolist(), data['v'].tolist(), data['costs']
+        except (FileNotFoundError, OSError, KeyError, ValueError):
+            return None
+        # Edges are matched by node IDs, since edge order can differ between loads.
+        return TrafficStore.from_dict(graph, dict(zip(zip(u, v), costs.tolist())))
+
+    def store_traffic(self, place, traffic, network_type="drive"):
+        """
+        Write a place's traffic costs next to its cached graph.
+
+        Args:
+            place: The place string.
+            traffic: A TrafficStore for the place's graph.
+            network_type: The OSMnx network type of the graph.
+        """
+        nodes = np.asarray(traffic.nodes, dtype=np.int64)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, u=nodes[traffic.edge_u], v=nodes[traffic.edge_v], costs=traffic.costs)
+        os.replace(tmp_path, self._traffic_path(place, network_type))
+
+    def load(self, place, network_type="drive"):
+        """
+        Load a cached graph.
+
+        Returns:
+            An nx.Graph, or None if the place is not cached.
+        """
+        path = self._path(place, network_type)
+        try:
+            with np.load(path) as data:
+                nodes = data['nodes']
+                xs = data['x'].tolist()
+                ys = data['y'].tolist()
+                edges = data['edges']
+        except (FileNotFoundError, OSError, KeyError, ValueError):
+            return None
+        # Mark the entry as recently used.
+        os.utime(path)
+
+        graph = nx.Graph()
+        graph.add_nodes_from((n, {'x': x, 'y': y}) for n, x, y in zip(nodes.tolist(), xs, ys))
+        graph.add_edges_from(zip(nodes[edges[:, 0]].tolist(), nodes[edges[:, 1]].tolist()))
+        return graph
+
+    def store(self, place, graph, network_type="drive"):
+        """
+        Write a graph to the cache and evict old entries if the cache is too large.
+
+        Args:
+            place: The place string the graph was loaded for.
+            graph: An nx.Graph with `x`/`y` node attributes.
+            network_type: The OSMnx network type of the graph.
+        """
+        nodes = list(graph.nodes())
+        node_index = {node: i for i, node in enumerate(nodes)}
+        edges = np.array([(node_index[u], node_index[v]) for u, v in graph.edges()],
+                         dtype=np.int32).reshape(-1, 2)
+
+        # Write to a temporary file first so readers never see a partial entry.
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.savez(
+                f,
+                nodes=np.asarray(nodes, dtype=np.int64),
+                x=np.array([graph.nodes[n]['x'] for n in nodes], dtype=np.float64),
+                y=np.array([graph.nodes[n]['y'] for n in nodes], dtype=np.float64),
+                edges=edges
+            )
+        os.replace(tmp_path, self._path(place, network_type))
+        self._evict()
+
+    def _evict(self):
+        """
+        Remove least-recently-used entries until the cache fits in max_bytes.
+
+        Traffic sidecars count toward the size of their graph's entry; a sidecar whose graph is
+        gone (e.g. written by another process after an eviction) is an entry of its own.
+        """
+        entries = []
+        names = set(os.listdir(self.cache_dir))
+        for name in names:
+            if not name.endswith(".npz"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith("-traffic.npz"):
+                if name[:-len("-traffic.npz")] + ".npz" in names:
+                    continue
+                entries.append((os.stat(path).st_mtime, os.path.getsize(path), [path]))
+                continue
+            traffic_path = path[:-len(".npz")] + "-traffic.npz"
+            paths = [path, traffic_path] if os.path.basename(traffic_path) in names else [path]
+            entries.append((os.stat(path).st_mtime, sum(os.path.getsize(entry) for entry in paths), paths))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, paths in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            for path in paths:
+                if os.path.exists(path):
+                    os.remove(path)
+            total -= size
+
+def load_place_graph(place, network_type="drive", cache=None):
+    """
+    Load the undirected road graph for a place, using the graph cache when possible.
+
+    Args:
+        place: Place string passed to OSMnx, e.g. "Los Alamitos, CA, USA".
+        network_type: OSMnx network type.
+        cache: Optional GraphCache. Without one, the graph is always downloaded.
+
+    Returns:
+        An nx.Graph with `x`/`y` node attributes.
+    """
+    if cache is not None:
+        graph = cache.load(place, network_type)
+        if graph is not None:
+            print(f"[load_place_graph] Cache hit for {place}")
+            return graph
+
+    G = ox.graph_from_place(place, network_type=network_type)
+    # Convert directed graph to undirected for bidirectional traffic modeling.
+    graph = strip_graph(nx.Graph(G))
+    if cache is not None:
+        cache.store(place, graph, network_type)
+    return graph
@@ -0,0 +1,187 @@
+# graph_core.py
+import hashlib
+import numpy as np
+from traffic import TrafficStore
+
+class CompiledGraph:
+    """
+    Array-backed (CSR) representation of an undirected road graph with traffic costs.
+
+    Node IDs are mapped to contiguous integer indices in `graph.nodes()` order, so an index
+    is identical to the observation used by `CityTrafficEnv`. The neighbors of node index `i`
+    are `neighbors[offsets[i]:offsets[i + 1]]`, in the same order as `graph.neighbors(node)`,
+    and `costs` holds the traffic cost of each of those edges.
+    """
+    def __init__(self, nodes, offsets, neighbors, costs):
+        """
+        Initialize from prebuilt arrays. Use `from_networkx` to compile a graph.
+
+        Args:
+            nodes: Sequence of node IDs; position is the node index.
+            offsets: int64 array of length num_nodes + 1 with CSR row offsets.
+            neighbors: int64 array of neighbor node indices.
+            costs: float64 array of edge costs aligned with `neighbors`.
+        """
+        self.nodes = list(nodes)
+        self.node_index = {node: i for i, node in enumerate(self.nodes)}
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.neighbors = np.asarray(neighbors, dtype=np.int64)
+        self.costs = np.asarray(costs, dtype=np.float64)
+        self.degrees = np.diff(self.offsets)
+        self.num_nodes = len(self.nodes)
+        self.max_degree = int(self.degrees.max()) if self.num_nodes else 0
+        self._topology_hash = None
+
+        # Plain Python lists for per-step access; indexing NumPy arrays one
+        # element at a time is slower than indexing lists.
+        self._neighbor_lists = [
+            self.neighbors[self.offsets[i]:self.offsets[i + 1]].tolist() for i in range(self.num_nodes)
+        ]
+        self._cost_lists = [
+            self.costs[self.offsets[i]:self.offsets[i + 1]].tolist() for i in range(self.num_nodes)
+        ]
+
+    @classmethod
+    def from_networkx(cls, graph, traffic_dict, default_cost=1.0):
+        """
+        Compile a NetworkX graph and its traffic costs into CSR arrays.
+
+        Args:
+            graph: A NetworkX graph.
+            traffic_dict: A TrafficStore or a dictionary mapping edge tuples to traffic cost.
+            default_cost: Cost used when an edge is missing from traffic_dict.
+
+        Returns:
+            A CompiledGraph instance.
+        """
+        if isinstance(traffic_dict, TrafficStore) and traffic_dict.nodes == list(graph.nodes()):
+            # The store already holds a CSR adjacency in the same order; just gather its costs.
+            return cls(traffic_dict.nodes, traffic_dict.offsets, traffic_dict.neighbors, traffic_dict.slot_costs())
+
+        nodes = list(graph.nodes())
+        node_index = {node: i for i, node in enumerate(nodes)}
+
+        offsets = np.zeros(len(nodes) + 1, dtype=np.int64)
+        neighbors = []
+        costs = []
+        for i, u in enumerate(nodes):
+            for v in graph.neighbors(u):
+                neighbors.append(node_index[v])
+                # Use bidirectional lookup, matching CityTrafficEnv.
+                costs.append(traffic_dict.get((u, v), traffic_dict.get((v, u), default_cost)))
+            offsets[i + 1] = len(neighbors)
+        return cls(nodes, offsets, neighbors, costs)
+
+    def with_updated_costs(self, changes):
+        """
+        Return a copy of the graph with some edge costs changed, sharing its topology arrays.
+
+        Args:
+            changes: A dictionary mapping (u, v) node-ID tuples to their new traffic cost; the
+                cost applies to both directions of the edge.
+
+        Returns:
+            A tuple (graph, changed): the new CompiledGraph and the changed edges as a list of
+            (u_index, v_index) pairs.
+
+        Raises:
+            KeyError: If a pair is not an edge of the graph.
+        """
+        costs = self.costs.copy()
+        cost_lists = list(self._cost_lists)
+        changed = []
+        for (u, v), cost in changes.items():
+            if u not in self.node_index or v not in self.node_index:
+                raise KeyError((u, v))
+            u_index, v_index = self.node_index[u], self.node_index[v]
+            for a, b in ((u_index, v_index), (v_index, u_index)):
+                row = self._neighbor_lists[a]
+                if b not in row:
+                    raise KeyError((u, v))
+                slot = row.index(b)
+                costs[self.offsets[a] + slot] = cost
+                # Copy only the rows that change; the rest are shared with this graph.
+                cost_lists[a] = list(cost_lists[a])
+                cost_lists[a][slot] = float(cost)
+            changed.append((u_index, v_index))
+
+        graph = CompiledGraph.__new__(CompiledGraph)
+        graph.__dict__.update(self.__dict__)
+        graph.costs = costs
+        graph._cost_lists = cost_lists
+        return graph, changed
+
+    def subgraph(self, indices):
+        """
+        Return the CompiledGraph induced by a set of node indices.
+
+        Only the rows of the kept nodes are read, so the cost scales with the subgraph. Nodes
+        keep their IDs and their order, and each node's neighbors keep their order.
+
+        Args:
+            indices: Sorted int array of node indices to keep.
+
+        Returns:
+            A CompiledGraph whose node index `i` is node index `indices[i]` of this graph.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        local_index = np.full(self.num_nodes, -1, dtype=np.int64)
+        local_index[indices] = np.arange(len(indices))
+
+        # Gather the CSR slots of the kept rows, then drop edges leaving the subgraph.
+        degrees = self.degrees[indices]
+        row_starts = np.repeat(np.cumsum(degrees) - degrees, degrees)
+        slots = np.repeat(self.offsets[indices], degrees) + np.arange(degrees.sum()) - row_starts
+        sources = np.repeat(np.arange(len(indices)), degrees)
+        neighbors = local_index[self.neighbors[slots]]
+        inside = neighbors >= 0
+        offsets = np.zeros(len(indices) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(sources[inside], minlength=len(indices)))
+        return CompiledGraph([self.nodes[i] for i in indices], offsets, neighbors[inside], self.costs[slots][inside])
+
+    def traffic_dict(self):
+        """
+        Return a dictionary mapping (u, v) node-ID tuples, in both directions, to edge costs.
+        """
+        sources = np.repeat(np.arange(self.num_nodes), self.degrees).tolist()
+        return {(self.nodes[u], self.nodes[v]): cost
+                for u, v, cost in zip(sources, self.neighbors.tolist(), self.costs.tolist())}
+
+    def topology_hash(self):
+        """
+        Return a hex digest identifying the graph's nodes and adjacency (not its costs).
+        """
+        if self._topology_hash is None:
+            digest = hashlib.sha1()
+            digest.update(np.asarray(self.nodes).tobytes())
+            digest.update(self.offsets.tobytes())
+            digest.update(self.neighbors.tobytes())
+            self._topology_hash = digest.hexdigest()
+        return self._topology_hash
+
+    def cost_hash(self):
+        """
+        Return a hex digest identifying the edge costs (the traffic snapshot).
+        """
+        return hashlib.sha1(self.costs.tobytes()).hexdigest()
+
+    def neighbor_indices(self, index):
+        """
+        Return the neighbor indices of a node index as a list.
+        """
+        return self._neighbor_lists[index]
+
+    def edge_costs(self, index):
+        """
+        Return the edge costs from a node index, aligned with `neighbor_indices`.
+        """
+        return self._cost_lists[index]
+
+    def edge_cost(self, u_index, v_index, default=1.0):
+        """
+        Return the traffic cost of the edge between two node indices.
+        """
+        neighbors = self._neighbor_lists[u_index]
+        if v_index in neighbors:
+            return self._cost_lists[u_index][neighbors.index(v_index)]
+        return default
@@ -0,0 +1,131 @@
+# heuristics.py
+import heapq
+import math
+import numpy as np
+
+from graph_core import CompiledGraph
+
+GOAL_REWARD = 100.0
+
+def reverse_dijkstra(compiled_graph, goal_index):
+    """
+    Run Dijkstra from the goal over traffic costs on an undirected CompiledGraph.
+
+    Args:
+        compiled_graph: A CompiledGraph.
+        goal_index: Index of the goal node.
+
+    Returns:
+        A tuple (dist, next_hop, order): cost-to-goal per node (inf if unreachable), the
+        neighbor index one step closer to the goal (-1 for the goal/unreachable nodes), and
+        the node indices in the order they were settled.
+    """
+    dist = np.full(compiled_graph.num_nodes, np.inf)
+    next_hop = np.full(compiled_graph.num_nodes, -1, dtype=np.int64)
+    settled = np.zeros(compiled_graph.num_nodes, dtype=bool)
+    order = []
+    dist[goal_index] = 0.0
+    heap = [(0.0, goal_index)]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if settled[u]:
+            continue
+        settled[u] = True
+        order.append(u)
+        for v, cost in zip(compiled_graph.neighbor_indices(u), compiled_graph.edge_costs(u)):
+            nd = d + cost
+            if nd < dist[v]:
+                dist[v] = nd
+                next_hop[v] = u
+                heapq.heappush(heap, (nd, v))
+    return dist, next_hop, order
+
+def dijkstra_state_values(compiled_graph, goal_index, gamma):
+    """
+    Estimate each state's value by following the cheapest path to the goal.
+
+    The value of a node is the discounted return of walking its shortest path, with the
+    environment's rewards: -cost per step and GOAL_REWARD for the step onto the goal.
+
+    Returns:
+        A float array of state values (the goal itself has value 0, as a terminal state).
+    """
+    dist, next_hop, order = reverse_dijkstra(compiled_graph, goal_index)
+    values = np.full(compiled_graph.num_nodes, _value_floor(compiled_graph, gamma))
+    values[goal_index] = 0.0
+    # Settled order guarantees each node's next hop already has its value.
+    for u in order[1:]:
+        hop = next_hop[u]
+        reward = GOAL_REWARD if hop == goal_index else -compiled_graph.edge_cost(u, hop)
+        values[u] = reward + gamma * values[hop]
+    return values
+
+def euclidean_state_values(graph, compiled_graph, goal_index):
+    """
+    Estimate each state's value from its straight-line distance to the goal.
+
+    Distances are converted to traffic-cost units with the smallest cost per meter over all
+    edges, so the estimate never exceeds the true cost to reach the goal.
+
+    Returns:
+        A float array of state values (negated cost estimates).
+    """
+    nodes = compiled_graph.nodes
+    lat = np.radians([graph.nodes[n]['y'] for n in nodes])
+    lon = np.radians([graph.nodes[n]['x'] for n in nodes])
+    meters = _haversine(lat, lon, lat[goal_index], lon[goal_index])
+
+    # Smallest traffic cost per meter over all edges.
+    sources = np.repeat(np.arange(compiled_graph.num_nodes), compiled_graph.degrees)
+    lengths = _haversine(lat[sources], lon[sources], lat[compiled_graph.neighbors], lon[compiled_graph.neighbors])
+    with np.errstate(divide="ignore"):
+        cost_per_meter = np.min(np.where(lengths > 0, compiled_graph.costs / lengths, np.inf))
+    if not math.isfinite(cost_per_meter):
+        cost_per_meter = 0.0
+    return -meters * cost_per_meter
+
+def heuristic_q_values(env, gamma, mode="dijkstra"):
+    """
+    Compute heuristic initial Q-values for every valid (state, action) pair of an environment.
+
+    Q(s, a) = r(s, n_a) + gamma * V(n_a), where n_a is the a-th neighbor of s and V is a
+    state-value estimate from `dijkstra_state_values` or `euclidean_state_values`.
+
+    Args:
+        env: A CityTrafficEnv.
+        gamma: Discount factor of the agent.
+        mode: "dijkstra" (reverse Dijkstra over traffic costs) or "euclidean" (straight-line distance).
+
+    Returns:
+        A tuple (q_flat, compiled_graph, floor): Q-values aligned with the compiled graph's CSR
+        neighbor slots, the graph used, and a lower bound suitable for padded actions.
+    """
+    compiled = env.compiled_graph
+    if compiled is None:
+        compiled = CompiledGraph.from_networkx(env.graph, env.traffic_dict)
+    goal_index = compiled.node_index[env.goal_node]
+
+    if mode == "dijkstra":
+        values = dijkstra_state_values(compiled, goal_index, gamma)
+    elif mode == "euclidean":
+        values = euclidean_state_values(env.graph, compiled, goal_index)
+    else:
+        raise ValueError(f"Unknown Q initialization: {mode}")
+
+    rewards = np.where(compiled.neighbors == goal_index, GOAL_REWARD, -compiled.costs)
+    q_flat = np.where(compiled.neighbors == goal_index, rewards, rewards + gamma * values[compiled.neighbors])
+    return q_flat, compiled, _value_floor(compiled, gamma)
+
+def _value_floor(compiled_graph, gamma):
+    """
+    Lower bound on any return: paying the largest edge cost forever.
+    """
+    max_cost = float(compiled_graph.costs.max()) if len(compiled_graph.costs) else 1.0
+    return -max_cost / (1 - gamma) if gamma < 1 else -max_cost * compiled_graph.num_nodes
+
+def _haversine(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance in meters between points given in radians.
+    """
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371000.0 * np.arcsin(np.sqrt(a))
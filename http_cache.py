@@ -0,0 +1,164 @@
+# http_cache.py
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; gzip is always available.
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = ("text/html", "text/plain", "application/json", "application/javascript", "text/css")
+MIN_COMPRESS_BYTES = 1024
+
+def make_etag(*parts):
+    """
+    Return an ETag value derived from the given parts (e.g. graph and traffic hashes).
+    """
+    return hashlib.sha1("\0".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+
+def choose_encoding(accept_encodings):
+    """
+    Pick the best supported content encoding the client accepts.
+
+    Args:
+        accept_encodings: The request's parsed Accept-Encoding header.
+
+    Returns:
+        "br", "gzip" or None for an uncompressed response.
+    """
+    if brotli is not None and accept_encodings["br"]:
+        return "br"
+    if accept_encodings["gzip"]:
+        return "gzip"
+    return None
+
+def compress(body, encoding):
+    """
+    Compress a body with "br" or "gzip".
+    """
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+def compress_response(response):
+    """
+    Compress a dynamic HTML/JSON response in place if the client accepts it.
+
+    Responses that are small, streamed, already encoded or not text are left untouched.
+    """
+    if (response.direct_passthrough or response.status_code < 200 or response.status_code >= 300
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    encoding = choose_encoding(request.accept_encodings)
+    body = response.get_data()
+    if encoding is None or len(body) < MIN_COMPRESS_BYTES:
+        return response
+    response.set_data(compress(body, encoding))
+    response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    return response
+
+class ResponseCache:
+    """
+    Content-addressed response bodies with conditional GET and precompressed variants.
+
+    Each body is identified by an ETag derived from the data it was rendered from (e.g. the
+    graph and traffic hashes plus the request parameters), so a client that already has it
+    gets a 304 without the body being rendered again. Rendered bodies and their gzip/brotli
+    encodings are kept in a size-bounded LRU so repeat requests skip rendering and compression.
+    """
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        """
+        Args:
+            max_bytes: Maximum total size of cached bodies (all encodings).
+        """
+        self.max_bytes = max_bytes
+        self._bodies = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def respond(self, etag, render, mimetype, on_result=None):
+        """
+        Build a cacheable response for the current request.
+
+        Args:
+            etag: ETag identifying the body.
+            render: Callable returning the uncompressed body as bytes; only called on a cache miss.
+            mimetype: Mimetype of the body.
+            on_result: Optional callable receiving "not_modified", "hit" or "miss".
+
+        Returns:
+            A Flask response: 304 if the client's If-None-Match matches, otherwise the body in
+            the best accepted encoding. The ETag is sent as a weak validator, since the
+            identity, gzip and brotli bodies share it but differ byte for byte.
+        """
+        if request.if_none_match.contains_weak(etag):
+            result = "not_modified"
+            response = Response(status=304)
+        else:
+            body, encoding, rendered = self._body(etag, choose_encoding(request.accept_encodings), render)
+            result = "miss" if rendered else "hit"
+            response = Response(body, mimetype=mimetype)
+            if encoding is not None:
+                response.headers["Content-Encoding"] = encoding
+        response.set_etag(etag, weak=True)
+        # Clients may keep the body but must revalidate, since traffic can change.
+        response.headers["Cache-Control"] = "no-cache"
+        response.vary.add("Accept-Encoding")
+        if on_result is not None:
+            on_result(result)
+        return response
+
+    def _body(self, etag, encoding, render):
+        """
+        Return a body in the requested encoding, rendering and compressing it only if not cached.
+
+        Returns:
+            A tuple (body, encoding, rendered) where encoding is None for an uncompressed body
+            (e.g. one too small to be worth compressing).
+        """
+        if encoding is not None:
+            body = self._get((etag, encoding))
+            if body is not None:
+                return body, encoding, False
+        identity = self._get((etag, None))
+        rendered = identity is None
+        if rendered:
+            identity = render()
+            self._put((etag, None), identity)
+        if encoding is None or len(identity) < MIN_COMPRESS_BYTES:
+            return identity, None, rendered
+        body = compress(identity, encoding)
+        self._put((etag, encoding), body)
+        return body, encoding, rendered
+
+    def _get(self, key):
+        """
+        Return a cached body and mark it as recently used, or None.
+        """
+        with self._lock:
+            body = self._bodies.get(key)
+            if body is not None:
+                self._bodies.move_to_end(key)
+            return body
+
+    def _put(self, key, body):
+        """
+        Cache a body and evict least-recently-used bodies beyond max_bytes.
+        """
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._bodies.pop(key, None)
+            if previous is not None:
+                self._total_bytes -= len(previous)
+            self._bodies[key] = body
+            self._total_bytes += len(body)
+            while self._total_bytes > self.max_bytes:
+                _, evicted = self._bodies.popitem(last=False)
+                self._total_bytes -= len(evicted)
@@ -0,0 +1,181 @@
+# jobs.py
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+class JobQueueFull(Exception):
+    """
+    Raised when a job is submitted while the queue is at capacity.
+    """
+
+class RouteNotFound(Exception):
+    """
+    Raised by a job when its trained greedy route does not reach the goal.
+    """
+
+class TrainingJob:
+    """
+    State and progress of one background route-training job.
+    """
+    def __init__(self, job_id, start, end, max_episodes):
+        """
+        Initialize a queued job.
+
+        Args:
+            job_id: Unique job identifier.
+            start: The starting node ID.
+            end: The target node ID.
+            max_episodes: Upper bound on training episodes.
+        """
+        self.id = job_id
+        self.start = start
+        self.end = end
+        self.max_episodes = max_episodes
+        self.status = "queued"
+        self.episodes_done = 0
+        self.best_cost = None
+        self.path = None
+        self.route = None
+        self.city_key = None
+        self.error = None
+        self.policy_cache = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def eta_seconds(self):
+        """
+        Estimate remaining training time from the episode rate so far.
+
+        Returns:
+            Seconds until max_episodes is reached (an upper bound if training stops early), or None.
+        """
+        if self.status != "running" or not self.episodes_done:
+            return None
+        elapsed = time.time() - self.started_at
+        return elapsed / self.episodes_done * (self.max_episodes - self.episodes_done)
+
+    def to_dict(self):
+        """
+        Return a JSON-serializable summary of the job.
+        """
+        eta = self.eta_seconds()
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "start": self.start,
+            "end": self.end,
+            "episodes_done": self.episodes_done,
+            "max_episodes": self.max_episodes,
+            "best_cost": self.best_cost,
+            "eta_seconds": None if eta is None else round(eta, 1),
+            "error": self.error,
+            "policy_cache": self.policy_cache,
+        }
+
+class JobProgress:
+    """
+    Training monitor that reports progress to a TrainingJob.
+
+    Wraps a ConvergenceMonitor so the job sees episode counts and the best route cost while
+    the wrapped monitor still decides when to stop.
+    """
+    def __init__(self, job, monitor):
+        """
+        Args:
+            job: The TrainingJob to update.
+            monitor: A ConvergenceMonitor.
+        """
+        self.job = job
+        self.monitor = monitor
+
+    def update(self, agent, episodes_done):
+        """
+        Record progress and delegate the stopping decision to the wrapped monitor.
+        """
+        self.job.episodes_done = episodes_done
+        stop = self.monitor.update(agent, episodes_done)
+        if self.monitor.best_cost is not None:
+            self.job.best_cost = self.monitor.best_cost
+        return stop
+
+class JobManager:
+    """
+    Runs training jobs on a bounded background worker pool.
+    """
+    def __init__(self, max_workers=2, max_queued=8, max_finished=100):
+        """
+        Initialize the manager.
+
+        Args:
+            max_workers: Maximum number of jobs trained concurrently.
+            max_queued: Maximum number of jobs waiting for a worker.
+            max_finished: Number of finished jobs kept before the oldest are forgotten.
+        """
+        self.max_queued = max_queued
+        self.max_finished = max_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="training-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn, start, end, max_episodes):
+        """
+        Queue a training job.
+
+        Args:
+            fn: Callable run as fn(job) on a worker thread. It should fill in job.path, or
+                raise (e.g. RouteNotFound) to mark the job as failed.
+            start: The starting node ID.
+            end: The target node ID.
+            max_episodes: Upper bound on training episodes, used for progress and ETA.
+
+        Returns:
+            The queued TrainingJob.
+
+        Raises:
+            JobQueueFull: If max_queued jobs are already waiting.
+        """
+        with self._lock:
+            queued = sum(1 for job in self._jobs.values() if job.status == "queued")
+            if queued >= self.max_queued:
+                raise JobQueueFull(f"{queued} jobs already queued")
+            job = TrainingJob(uuid.uuid4().hex, start, end, max_episodes)
+            self._jobs[job.id] = job
+            self._prune()
+        self._executor.submit(self._run, fn, job)
+        return job
+
+    def get(self, job_id):
+        """
+        Return the job with the given ID, or None.
+        """
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, fn, job):
+        """
+        Run a job on a worker thread and record its outcome.
+        """
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            fn(job)
+            job.status = "done"
+        except Exception as e:
+            print(f"[JobManager] Job {job.id} failed: {e}")
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+
+    def _prune(self):
+        """
+        Forget the oldest finished jobs beyond max_finished.
+        """
+        finished = sorted(
+            (job for job in self._jobs.values() if job.status in ("done", "failed")),
+            key=lambda job: job.finished_at
+        )
+        for job in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job.id]
@@ -1,19 +1,33 @@
 # main.py
 import argparse
+import cProfile
+import hashlib
 import json
-import random
 import numpy as np
-import networkx as nx
-import osmnx as ox
 import os
-from flask import Flask, request, jsonify, render_template, redirect, url_for
+import threading
+import time
+from flask import Flask, request, jsonify, render_template, redirect, url_for, session, g, Response
 from flask_cors import CORS
 
-from environment import CityTrafficEnv
+from environment import CityTrafficEnv, VecCityTrafficEnv
+from graph_core import CompiledGraph
+from graph_cache import GraphCache, load_place_graph
 from agent import QLearningAgent
-from utils import generate_random_traffic, get_shortest_path
-from node_selector_folium import FoliumNodeSelector
-from visualization_folium import visualize_route_folium
+from utils import generate_place_traffic, get_shortest_path, path_cost
+from jobs import JobManager, JobProgress, JobQueueFull, RouteNotFound
+from state_store import CityData, CityStore
+from policy_cache import PolicyCache
+from metrics import SIZE_BUCKETS, MetricsRegistry, dump_profile, profiled
+from training import (ConvergenceMonitor, configure_training_pool, train_agent, train_agent_parallel,
+                      train_agent_vectorized)
+from map_data import MapIndex
+from replanning import retrain_near_changes
+from batch_routes import route_batch
+from corridor import build_corridor
+from contraction import contract_chains
+from replay import ReplayBuffer
+from http_cache import ResponseCache, compress_response, make_etag
 
 # Create Flask application instance.
 app = Flask(__name__)
@@ -23,22 +37,241 @@ CORS(app)
 app.config['TEMPLATES_AUTO_RELOAD'] = True
 app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 0
 
-# Global variables to store application state.
-selected_nodes = {}
-traffic_data = {}
-G_undirected = None
-current_env = None
-agent = None
+# Number of episodes advanced together during training (1 runs the serial loop).
+app.config['TRAINING_NUM_ENVS'] = int(os.environ.get('TRAINING_NUM_ENVS', 32))
+# Worker processes for parallel training (1, the default, trains in the job thread) and
+# the number of episodes each worker runs between Q-table merges. Only worth enabling with
+# idle cores, large cities and a large TRAINING_SYNC_EVERY (see benchmark.py parallel).
+app.config['TRAINING_WORKERS'] = int(os.environ.get('TRAINING_WORKERS', 1))
+app.config['TRAINING_SYNC_EVERY'] = int(os.environ.get('TRAINING_SYNC_EVERY', 100))
+# Q-table layout: "dense" (num_states x max_degree) or "compact" (valid actions only),
+# and an optional dtype override such as "float32" or "float16".
+app.config['TRAINING_Q_STORAGE'] = os.environ.get('TRAINING_Q_STORAGE', 'dense')
+app.config['TRAINING_Q_DTYPE'] = os.environ.get('TRAINING_Q_DTYPE') or None
+# Restrict exploration and greedy choices to each node's real neighbors.
+app.config['TRAINING_MASK_ACTIONS'] = os.environ.get('TRAINING_MASK_ACTIONS', '1') == '1'
+# Initial Q-values: "zeros", or a heuristic warm start ("dijkstra" or "euclidean").
+app.config['TRAINING_Q_INIT'] = os.environ.get('TRAINING_Q_INIT', 'zeros')
+# "q_learning" samples episodes; "value_iteration" solves the known graph directly with
+# vectorized Bellman sweeps until no state value moves by more than
+# VALUE_ITERATION_TOLERANCE.
+app.config['TRAINING_SOLVER'] = os.environ.get('TRAINING_SOLVER', 'q_learning')
+app.config['VALUE_ITERATION_TOLERANCE'] = float(os.environ.get('VALUE_ITERATION_TOLERANCE', 1e-6))
+# Discount factor of Q-learning.
+app.config['TRAINING_GAMMA'] = float(os.environ.get('TRAINING_GAMMA', 0.9))
+# Discount factor of value iteration. Route costs are undiscounted and the goal is absorbing,
+# so 1.0 gives exact shortest paths; below ~0.99 long cheap routes lose to short costly ones.
+app.config['VALUE_ITERATION_GAMMA'] = float(os.environ.get('VALUE_ITERATION_GAMMA', 1.0))
+# Training stops once the greedy route is stable (patience checks within tolerance),
+# or after TRAINING_MAX_EPISODES episodes at the latest.
+app.config['TRAINING_MAX_EPISODES'] = int(os.environ.get('TRAINING_MAX_EPISODES', 3000))
+app.config['TRAINING_EARLY_STOP'] = os.environ.get('TRAINING_EARLY_STOP', '1') == '1'
+app.config['TRAINING_PATIENCE'] = int(os.environ.get('TRAINING_PATIENCE', 4))
+app.config['TRAINING_TOLERANCE'] = float(os.environ.get('TRAINING_TOLERANCE', 0.5))
+# Experience replay for vectorized Q-learning: TRAINING_REPLAY_RATIO stored transitions are
+# replayed per new one (0 keeps the plain online update) in minibatches from a ring buffer of
+# TRAINING_REPLAY_CAPACITY, sampled by TD error with TRAINING_REPLAY_PRIORITIZED.
+app.config['TRAINING_REPLAY_RATIO'] = float(os.environ.get('TRAINING_REPLAY_RATIO', 0))
+app.config['TRAINING_REPLAY_CAPACITY'] = int(os.environ.get('TRAINING_REPLAY_CAPACITY', 50000))
+app.config['TRAINING_REPLAY_BATCH_SIZE'] = int(os.environ.get('TRAINING_REPLAY_BATCH_SIZE', 64))
+app.config['TRAINING_REPLAY_PRIORITIZED'] = os.environ.get('TRAINING_REPLAY_PRIORITIZED', '0') == '1'
+# After a traffic update, a Q-table cached for the same goal under earlier traffic is
+# repaired with at most REPLAN_EPISODES short episodes starting on its route or within
+# REPLAN_RADIUS hops of a changed edge, instead of training from scratch.
+app.config['REPLAN_EPISODES'] = int(os.environ.get('REPLAN_EPISODES', 300))
+app.config['REPLAN_RADIUS'] = int(os.environ.get('REPLAN_RADIUS', 3))
+# Train each route on a corridor of the city instead of the whole graph: "ellipse" keeps
+# nodes within CORRIDOR_SLACK times the start-goal distance plus CORRIDOR_MARGIN_METERS,
+# "k_paths" keeps CORRIDOR_K cheap paths plus CORRIDOR_BUFFER_HOPS hops around them.
+app.config['CORRIDOR_MODE'] = os.environ.get('CORRIDOR_MODE', 'none')
+app.config['CORRIDOR_SLACK'] = float(os.environ.get('CORRIDOR_SLACK', 1.4))
+app.config['CORRIDOR_MARGIN_METERS'] = float(os.environ.get('CORRIDOR_MARGIN_METERS', 250))
+app.config['CORRIDOR_K'] = int(os.environ.get('CORRIDOR_K', 3))
+app.config['CORRIDOR_BUFFER_HOPS'] = int(os.environ.get('CORRIDOR_BUFFER_HOPS', 2))
+# Collapse chains of degree-2 nodes (curved roads) into single edges before training, so
+# only intersections, dead ends and the route's endpoints are Q-states.
+app.config['GRAPH_CONTRACTION'] = os.environ.get('GRAPH_CONTRACTION', '1') == '1'
+# /routes/batch answers up to BATCH_MAX_PAIRS origin-destination pairs per request, training
+# one agent per distinct goal on the training process pool when BATCH_WORKERS > 1 (1 trains
+# in the request). At most BATCH_MAX_CONCURRENT batches run at once (503 beyond that).
+app.config['BATCH_MAX_PAIRS'] = int(os.environ.get('BATCH_MAX_PAIRS', 1000))
+app.config['BATCH_WORKERS'] = int(os.environ.get('BATCH_WORKERS', 1))
+app.config['BATCH_MAX_CONCURRENT'] = int(os.environ.get('BATCH_MAX_CONCURRENT', 2))
+# Train all goals of a batch in one multi-goal run of BATCH_MULTI_GOAL_EPISODES episodes
+# instead of one run per goal. Its Q store grows with the number of goals, so goals are split
+# into further runs once it would exceed BATCH_MULTI_GOAL_MAX_BYTES.
+app.config['BATCH_MULTI_GOAL'] = os.environ.get('BATCH_MULTI_GOAL', '0') == '1'
+app.config['BATCH_MULTI_GOAL_EPISODES'] = int(os.environ.get('BATCH_MULTI_GOAL_EPISODES', 6000))
+app.config['BATCH_MULTI_GOAL_MAX_BYTES'] = int(os.environ.get('BATCH_MULTI_GOAL_MAX_BYTES', 256 * 1024 * 1024))
+
+# Per-phase durations and sizes, exposed in the Prometheus text format on /metrics.
+# Setting PROFILE_DIR writes a cProfile dump for every request and training job.
+app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR') or None
+metrics = MetricsRegistry()
+phase_seconds = metrics.histogram('phase_duration_seconds', 'Wall-clock time spent in each phase.')
+request_seconds = metrics.histogram('http_request_duration_seconds', 'Request latency by endpoint.')
+graph_nodes = metrics.histogram('graph_nodes', 'Nodes of loaded city graphs.', buckets=SIZE_BUCKETS)
+graph_edges = metrics.histogram('graph_edges', 'Edges of loaded city graphs.', buckets=SIZE_BUCKETS)
+map_data_bytes = metrics.histogram('map_data_bytes', 'Size of map-data API responses.', buckets=SIZE_BUCKETS)
+training_episodes = metrics.counter('training_episodes_total', 'Training episodes run.')
+env_steps = metrics.counter('env_steps_total', 'Environment steps taken during training.')
+training_jobs = metrics.counter('training_jobs_total', 'Completed training jobs by policy cache result.')
+http_cache_results = metrics.counter('http_cache_total', 'Cacheable responses by result (hit, miss, not_modified).')
+
+# Map pages and map data are served with ETags derived from the city's graph and traffic
+# hashes; rendered and gzip/brotli-compressed bodies are kept in a bounded server-side cache.
+response_cache = ResponseCache(max_bytes=int(os.environ.get('HTTP_CACHE_MAX_BYTES', 64 * 1024 * 1024)))
+
+# Processed graphs are cached on disk so repeat cities skip OSM parsing.
+graph_cache = GraphCache(
+    cache_dir=os.environ.get('GRAPH_CACHE_DIR', 'graph_cache'),
+    max_bytes=int(os.environ.get('GRAPH_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+)
+
+# Trained Q-tables are cached per (graph, goal, traffic, hyperparameters); set
+# POLICY_CACHE_MAX_BYTES=0 to disable.
+policy_cache_max_bytes = int(os.environ.get('POLICY_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+policy_cache = PolicyCache(
+    cache_dir=os.environ.get('POLICY_CACHE_DIR', 'policy_cache'),
+    max_bytes=policy_cache_max_bytes
+) if policy_cache_max_bytes > 0 else None
+
+# Training runs as background jobs; requests beyond the queue limit are rejected. Jobs live
+# in this process, so /jobs/<id> must reach the process that queued them: serve the app with
+# a single worker process (threads are fine), or move jobs to a shared store.
+job_manager = JobManager(
+    max_workers=int(os.environ.get('JOB_MAX_CONCURRENT', 2)),
+    max_queued=int(os.environ.get('JOB_MAX_QUEUED', 8))
+)
+# Parallel training jobs and batches share one process pool, sized once for the larger of
+# TRAINING_WORKERS and BATCH_WORKERS.
+configure_training_pool(max(app.config['TRAINING_WORKERS'], app.config['BATCH_WORKERS']))
+# Batches train in the request thread or on the pool; this bounds how many do so at once.
+batch_slots = threading.BoundedSemaphore(app.config['BATCH_MAX_CONCURRENT'])
+
+# Loaded cities are shared by all sessions and kept in a bounded LRU; each
+# session only remembers which city it is on and its selected nodes.
+city_store = CityStore(
+    max_cities=int(os.environ.get('CITY_STORE_MAX_CITIES', 4)),
+    max_bytes=int(os.environ.get('CITY_STORE_MAX_BYTES', 1024 * 1024 * 1024))
+)
+# Session state is kept in Flask's signed cookie, so every worker process must sign with the
+# same SECRET_KEY. A random key is only usable with one process (WEB_CONCURRENCY, which
+# gunicorn reads for its worker count, unset or 1) and ends every session on restart.
+app.secret_key = os.environ.get('SECRET_KEY')
+if not app.secret_key:
+    if int(os.environ.get('WEB_CONCURRENCY', 1)) > 1:
+        raise RuntimeError("SECRET_KEY must be set when running more than one worker process")
+    print("[main] WARNING: SECRET_KEY is not set; sessions use a random key and end when the process restarts")
+    app.secret_key = os.urandom(24)
+# Map pages are static templates that load edges and nodes for the visible area from
+# /api/map-data; below MAP_FULL_DETAIL_ZOOM edges are simplified, and nodes are only
+# sent from MAP_NODE_MIN_ZOOM on.
+app.config['MAP_FULL_DETAIL_ZOOM'] = int(os.environ.get('MAP_FULL_DETAIL_ZOOM', 15))
+app.config['MAP_NODE_MIN_ZOOM'] = int(os.environ.get('MAP_NODE_MIN_ZOOM', 14))
+
+def template_version():
+    """
+    Return a hash of the template files, so cached pages change when templates do.
+    """
+    digest = hashlib.sha1()
+    template_dir = os.path.join(app.root_path, app.template_folder)
+    for name in sorted(os.listdir(template_dir)):
+        with open(os.path.join(template_dir, name), "rb") as f:
+            digest.update(name.encode("utf-8"))
+            digest.update(f.read())
+    return digest.hexdigest()
+
+TEMPLATE_VERSION = template_version()
+
+def current_session():
+    """
+    Return the requesting user's session: its city key, place and selected nodes.
+
+    The session is Flask's signed cookie, so any worker process can serve it; its city is
+    looked up in (or reloaded into) that process's city store.
+    """
+    for key, default in (("city_key", None), ("place", None), ("selected_nodes", {})):
+        session.setdefault(key, default)
+    return session
+
+def load_city(key, place):
+    """
+    Load a city's graph, generate its traffic data and index it for the map-data API.
+
+    Args:
+        key: Normalized place key.
+        place: Place string passed to OSMnx.
+
+    Returns:
+        A CityData instance.
+    """
+    # 1) Load the undirected road network graph (from the graph cache or osmnx).
+    with phase_seconds.time(phase="graph_load"):
+        graph = load_place_graph(place, network_type="drive", cache=graph_cache)
+    graph_nodes.observe(graph.number_of_nodes())
+    graph_edges.observe(graph.number_of_edges())
+
+    # 2) Restore the place's traffic, including earlier /traffic updates, or generate
+    # synthetic traffic seeded by the place so every worker process sees the same costs.
+    with phase_seconds.time(phase="traffic"):
+        traffic = graph_cache.load_traffic(place, graph)
+        if traffic is None:
+            traffic = generate_place_traffic(graph, key)
+    # Compile the graph into CSR arrays once so every environment can step on indices.
+    with phase_seconds.time(phase="compile_graph"):
+        compiled = CompiledGraph.from_networkx(graph, traffic)
+
+    # 3) Index edges and nodes for viewport queries from the map pages.
+    with phase_seconds.time(phase="map_index"):
+        map_index = MapIndex(graph, compiled,
+                             full_detail_zoom=app.config['MAP_FULL_DETAIL_ZOOM'],
+                             node_min_zoom=app.config['MAP_NODE_MIN_ZOOM'])
+    return CityData(key, place, graph, traffic, compiled, map_index=map_index)
+
+def session_city(user_state):
+    """
+    Return the city of a session, reloading it if it was evicted from the city store.
+    """
+    if user_state["city_key"] is None:
+        return None
+    city = city_store.get(user_state["city_key"])
+    if city is None:
+        city = city_store.get_or_load(user_state["place"], load_city)
+    return city
+
+@app.before_request
+def start_request_instrumentation():
+    """
+    Record the request start time and start profiling if PROFILE_DIR is set.
+    """
+    g.request_started = time.perf_counter()
+    if app.config['PROFILE_DIR']:
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+@app.teardown_request
+def finish_request_instrumentation(error=None):
+    """
+    Record the request latency and write the request's profile, if any.
+    """
+    endpoint = request.endpoint or "unknown"
+    if 'request_started' in g:
+        request_seconds.observe(time.perf_counter() - g.request_started, endpoint=endpoint)
+    if 'profiler' in g:
+        dump_profile(g.profiler, app.config['PROFILE_DIR'], f"request-{endpoint}")
 
 @app.after_request
-def add_no_cache_header(response):
+def finalize_response(response):
     """
-    Add headers to disable caching on responses.
+    Mark dynamic responses as uncacheable and compress HTML/JSON bodies.
+
+    Content-addressed responses (with an ETag from the response cache) set their own
+    Cache-Control and are revalidated with If-None-Match instead.
     """
-    response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
-    response.headers["Pragma"] = "no-cache"
-    response.headers["Expires"] = "0"
-    return response
+    if "Cache-Control" not in response.headers:
+        response.headers["Cache-Control"] = "no-store"
+    return compress_response(response)
 
 @app.route('/')
 def home_page():
@@ -52,14 +285,7 @@ def initialize_place():
     """
     Process form input, load city graph, generate traffic data, and create an interactive map.
     """
-    global G_undirected, traffic_data, selected_nodes, current_env, agent
-
-    # Reset globals for fresh session.
-    selected_nodes = {}
-    G_undirected = None
-    traffic_data = {}
-    current_env = None
-    agent = None
+    user_state = current_session()
 
     # Get city details from form.
     city = request.form.get('city')
@@ -69,103 +295,522 @@ def initialize_place():
 
     print(f"[initialize_place] User requested place: {place}")
 
-    # 1) Load the road network graph using osmnx.
-    G = ox.graph_from_place(place, network_type="drive")
-    # Convert directed graph to undirected for bidirectional traffic modeling.
-    G_undirected = nx.Graph(G)
-
-    # 2) Generate synthetic traffic data for each edge.
-    traffic_data = generate_random_traffic(G_undirected)
+    # Load the city, or reuse it if another session already loaded it.
+    city = city_store.get_or_load(place, load_city)
+    user_state["city_key"] = city.key
+    user_state["place"] = place
+    user_state["selected_nodes"] = {}
 
-    # 3) Create an interactive map for node selection using Folium.
-    selector = FoliumNodeSelector(G_undirected, traffic_data)
-    selector.create_selection_map(map_path="templates/node_selection_map.html")
-
-    # Clear Jinja’s template cache to load the updated map.
-    app.jinja_env.cache = {}
-
-    # 4) Redirect the user to the map page.
+    # Redirect the user to the map page.
     return redirect(url_for('serve_map'))
 
 @app.route('/map')
 def serve_map():
     """
-    Serve the node selection map.
+    Serve the node selection map of the session's city.
     """
-    # The random query parameter ensures the browser loads a fresh copy.
-    return render_template('node_selection_map.html', _=random.random())
+    city = session_city(current_session())
+    if city is None:
+        return redirect(url_for('home_page'))
+    return response_cache.respond(
+        make_etag("selection_map", city.version(), city.place, TEMPLATE_VERSION),
+        lambda: render_template('selection_map.html', place=city.place,
+                                bounds=city.map_index.bounds()).encode("utf-8"),
+        mimetype="text/html",
+        on_result=lambda result: http_cache_results.inc(result=result, endpoint="serve_map")
+    )
+
+def agent_params():
+    """
+    Return the Q-learning agent's keyword arguments (also used as the policy cache key).
+    """
+    value_iteration = app.config['TRAINING_SOLVER'] == 'value_iteration'
+    return {
+        "alpha": 0.1,
+        "gamma": app.config['VALUE_ITERATION_GAMMA' if value_iteration else 'TRAINING_GAMMA'],
+        "epsilon": 0.5,
+        "epsilon_decay": 0.995,
+        "min_epsilon": 0.05,
+        "q_storage": app.config['TRAINING_Q_STORAGE'],
+        "q_dtype": app.config['TRAINING_Q_DTYPE'],
+        "mask_actions": app.config['TRAINING_MASK_ACTIONS'],
+    }
+
+def train_route(graph, compiled, traffic, start, end, monitor=None, q_init=None):
+    """
+    Build an environment and agent for a start/end pair and train the agent, or solve its
+    Q-table by value iteration when TRAINING_SOLVER is "value_iteration".
+
+    Args:
+        graph: The undirected city graph.
+        compiled: The CompiledGraph for graph and traffic.
+        traffic: A dictionary mapping edge tuples to traffic cost.
+        start: The starting node ID.
+        end: The target node ID.
+        monitor: Optional training monitor (e.g. a ConvergenceMonitor).
+        q_init: Optional Q initialization overriding TRAINING_Q_INIT (e.g. a cached table).
+
+    Returns:
+        A tuple of (agent, env, episodes_run).
+    """
+    # Initialize the traffic environment.
+    env = CityTrafficEnv(
+        graph=graph,
+        start_node=start,
+        goal_node=end,
+        traffic_dict=traffic,
+        max_steps=300,
+        compiled_graph=compiled
+    )
+
+    # Solve the known graph directly instead of sampling episodes.
+    if app.config['TRAINING_SOLVER'] == 'value_iteration':
+        agent = QLearningAgent(env, **agent_params())
+        with phase_seconds.time(phase="value_iteration"):
+            sweeps = agent.solve_value_iteration(tolerance=app.config['VALUE_ITERATION_TOLERANCE'])
+        print(f"[train_route] Value iteration converged in {sweeps} sweeps.")
+        return agent, env, 0
+
+    # Initialize the Q-learning agent with specified parameters.
+    agent = QLearningAgent(
+        env,
+        q_init=app.config['TRAINING_Q_INIT'] if q_init is None else q_init,
+        **agent_params()
+    )
+
+    # Train the agent until the monitor stops it or the episode cap is reached.
+    episodes = app.config['TRAINING_MAX_EPISODES']
+    num_envs = app.config['TRAINING_NUM_ENVS']
+    replay = None
+    if app.config['TRAINING_REPLAY_RATIO'] > 0:
+        replay = ReplayBuffer(app.config['TRAINING_REPLAY_CAPACITY'],
+                              prioritized=app.config['TRAINING_REPLAY_PRIORITIZED'])
+    with phase_seconds.time(phase="training"):
+        if app.config['TRAINING_WORKERS'] > 1:
+            episodes_run = train_agent_parallel(env, agent, episodes,
+                                                num_workers=app.config['TRAINING_WORKERS'],
+                                                sync_every=app.config['TRAINING_SYNC_EVERY'],
+                                                num_envs=num_envs, monitor=monitor)
+            steps = env.total_steps
+        elif num_envs > 1 or replay is not None:
+            vec_env = VecCityTrafficEnv(compiled, start, end, num_envs, max_steps=300)
+            episodes_run = train_agent_vectorized(vec_env, agent, episodes, monitor=monitor, replay=replay,
+                                                  replay_ratio=app.config['TRAINING_REPLAY_RATIO'],
+                                                  replay_batch_size=app.config['TRAINING_REPLAY_BATCH_SIZE'])
+            steps = vec_env.total_steps
+        else:
+            episodes_run = train_agent(env, agent, episodes, monitor=monitor)
+            steps = env.total_steps
+    training_episodes.inc(episodes_run)
+    env_steps.inc(steps)
+    print(f"[train_route] Trained for {episodes_run} of at most {episodes} episodes.")
+    return agent, env, episodes_run
+
+def job_monitor(job, graph, compiled, traffic, start=None):
+    """
+    Return a monitor reporting a job's training progress and stopping it once converged.
+
+    Without early stopping the convergence monitor only tracks the best route cost. `start`
+    overrides the job's start node, as in `_run_training_job`.
+    """
+    monitor = ConvergenceMonitor(
+        CityTrafficEnv(graph, job.start if start is None else start, job.end, traffic, max_steps=300,
+                       compiled_graph=compiled),
+        patience=app.config['TRAINING_PATIENCE'] if app.config['TRAINING_EARLY_STOP'] else None,
+        tolerance=app.config['TRAINING_TOLERANCE']
+    )
+    return JobProgress(job, monitor)
+
+def run_training_job(job, city):
+    """
+    Train a route for a job on a background worker.
+
+    A Q-table cached for the same graph, goal, traffic and hyperparameters answers the job
+    without training if its greedy route from the job's start reaches the goal, and is
+    trained further otherwise; one cached before the city's latest traffic updates is
+    repaired for the changed edges; a cached table for the same goal under other traffic or
+    settings is used as a warm start. With a CORRIDOR_MODE, training runs on a start-goal corridor of the city,
+    and with GRAPH_CONTRACTION on a graph without degree-2 chains; the route is expanded back
+    to every node of the city graph.
+    """
+    job.city_key = city.key
+    with profiled(app.config['PROFILE_DIR'], f"job-{job.id}"):
+        compiled, traffic, traffic_updates = city.compiled_graph, city.traffic, city.traffic_updates()
+        corridor = job_corridor(job, city)
+        if corridor is not None:
+            compiled = corridor.compiled
+            traffic_updates = ((old_hash, corridor.local_edges(changed)) for old_hash, changed in traffic_updates)
+        contracted, start = None, job.start
+        if app.config['GRAPH_CONTRACTION']:
+            # Only the goal is protected, so the contracted graph, and with it the policy cache
+            # key, is the same for every start.
+            with phase_seconds.time(phase="contraction"):
+                contracted = contract_chains(compiled, [compiled.node_index[job.end]])
+            print(f"[run_training_job] Contracted {compiled.num_nodes} nodes to {contracted.num_nodes}.")
+            compiled, traffic = contracted.compiled, contracted.traffic
+            traffic_updates = ((old_hash, contracted.local_edges(changed)) for old_hash, changed in traffic_updates)
+            exits = contracted.chain_exits(job.start)
+            if not exits:
+                raise RouteNotFound(f"Node {job.start} is on a ring of roads with no way to node {job.end}")
+            start = training_exit(city, exits, job.end)
+        agent, env = _run_training_job(job, city.graph, compiled, traffic, traffic_updates,
+                                       traffic_hash=city.compiled_graph.cost_hash(), start=start)
+        if contracted is not None:
+            job.path, job.best_cost = exit_route(agent, env, contracted, exits, city.traffic)
+    job.route = city.map_index.route_coords(job.path)
+    training_jobs.inc(policy_cache=job.policy_cache)
+
+def training_exit(city, exits, goal):
+    """
+    Return the chain exit a job trains from: the one nearest the goal in a straight line that
+    is not the goal itself.
+    """
+    candidates = [node for node, _ in exits if node != goal] or [exits[0][0]]
+    if len(candidates) == 1:
+        return candidates[0]
+    index = city.compiled_graph.node_index
+    lats, lons = city.map_index.lats, city.map_index.lons
+    goal_lat, goal_lon = lats[index[goal]], lons[index[goal]]
+    return min(candidates, key=lambda node: (lats[index[node]] - goal_lat) ** 2
+               + ((lons[index[node]] - goal_lon) * np.cos(np.radians(goal_lat))) ** 2)
+
+def exit_route(agent, env, contracted, exits, traffic):
+    """
+    Return the cheapest route from a job's start through any of its chain exits that reaches
+    the goal, expanded to every node of the city graph, and its traffic cost.
+    """
+    best = None
+    for node, lead_in in exits:
+        if node == env.goal_node:
+            path = [node]
+        else:
+            env.start_node = node
+            path = get_shortest_path(agent, env)
+            if path[-1] != env.goal_node:
+                continue
+        route = lead_in[:-1] + contracted.expand_path(path)
+        cost = path_cost(route, traffic)
+        if best is None or cost < best[1]:
+            best = (route, cost)
+    return best
+
+def job_corridor(job, city):
+    """
+    Return the Corridor a job trains on, or None to train on the whole city graph.
+    """
+    if app.config['CORRIDOR_MODE'] == 'none':
+        return None
+    compiled = city.compiled_graph
+    with phase_seconds.time(phase="corridor"):
+        corridor = build_corridor(app.config['CORRIDOR_MODE'], compiled,
+                                  compiled.node_index[job.start], compiled.node_index[job.end],
+                                  lats=city.map_index.lats, lons=city.map_index.lons,
+                                  slack=app.config['CORRIDOR_SLACK'],
+                                  margin_meters=app.config['CORRIDOR_MARGIN_METERS'],
+                                  k=app.config['CORRIDOR_K'], buffer_hops=app.config['CORRIDOR_BUFFER_HOPS'])
+    if corridor is None:
+        print("[job_corridor] No corridor connects start and goal; training on the whole city.")
+    else:
+        print(f"[job_corridor] Training on {corridor.num_nodes} of {compiled.num_nodes} nodes.")
+    return corridor
+
+def _run_training_job(job, graph, compiled, traffic, traffic_updates=(), traffic_hash=None, start=None):
+    """
+    Body of run_training_job, separated so it can be profiled as a whole.
+
+    `compiled` may be a corridor of the city; `traffic_hash` then identifies the city's
+    traffic snapshot, which `traffic_updates` are relative to. `start` replaces the job's
+    start node when that is not in `compiled` (e.g. inside a contracted chain).
+
+    Returns:
+        A tuple of (agent, env) with the trained Q-table.
+    """
+    start = job.start if start is None else start
+    with phase_seconds.time(phase="policy_cache_lookup"):
+        graph_hash = compiled.topology_hash()
+        traffic_hash = traffic_hash or compiled.cost_hash()
+        params = dict(agent_params(), max_steps=300, solver=app.config['TRAINING_SOLVER'])
+        cached = policy_cache.get(graph_hash, job.end, traffic_hash, params) if policy_cache else None
+        # Solving by value iteration is as fast as repairing or warm-starting a table.
+        sampling = app.config['TRAINING_SOLVER'] == 'q_learning'
+        stale, changed_edges = None, None
+        if cached is None and policy_cache and sampling:
+            for old_hash, changed_edges in traffic_updates:
+                stale = policy_cache.get(graph_hash, job.end, old_hash, params)
+                if stale is not None:
+                    break
+
+    hit_path = None
+    if cached is not None:
+        env = CityTrafficEnv(graph, start, job.end, traffic, max_steps=300, compiled_graph=compiled)
+        agent = QLearningAgent(env, **agent_params())
+        agent.use_q_values(cached[0])
+        with phase_seconds.time(phase="shortest_path"):
+            hit_path = get_shortest_path(agent, env)
+        # The table may have been trained from another start, and its greedy walk from this
+        # one need not reach the goal; it is then only a warm start.
+        if hit_path[-1] != job.end:
+            print(f"[_run_training_job] Cached policy does not reach the goal from {start}; training from it.")
+            hit_path = None
+
+    if hit_path is not None:
+        job.policy_cache = "hit"
+    elif stale is not None:
+        job.policy_cache = "repaired"
+        env = CityTrafficEnv(graph, start, job.end, traffic, max_steps=300, compiled_graph=compiled)
+        agent = QLearningAgent(env, q_init=stale[0], **agent_params())
+        with phase_seconds.time(phase="replan"):
+            job.episodes_done = retrain_near_changes(agent, changed_edges,
+                                                     episodes=app.config['REPLAN_EPISODES'],
+                                                     radius=app.config['REPLAN_RADIUS'],
+                                                     monitor=job_monitor(job, graph, compiled, traffic, start))
+        training_episodes.inc(job.episodes_done)
+        env_steps.inc(env.total_steps)
+        print(f"[_run_training_job] Repaired a cached policy for {len(changed_edges)} changed edges "
+              f"in {job.episodes_done} episodes.")
+        policy_cache.put(graph_hash, job.end, traffic_hash, params, agent.Q)
+    else:
+        near = cached
+        if near is None and policy_cache and sampling:
+            near = policy_cache.find_near(graph_hash, job.end, params)
+        job.policy_cache = "warm_start" if near is not None else "miss"
+
+        agent, env, episodes_run = train_route(graph, compiled, traffic, start, job.end,
+                                               monitor=job_monitor(job, graph, compiled, traffic, start),
+                                               q_init=None if near is None else near[0])
+        job.episodes_done = episodes_run
+        if policy_cache:
+            policy_cache.put(graph_hash, job.end, traffic_hash, params, agent.Q)
+
+    # Retrieve the optimal path from the learned Q-values.
+    if hit_path is not None:
+        job.path = hit_path
+    else:
+        with phase_seconds.time(phase="shortest_path"):
+            job.path = get_shortest_path(agent, env)
+    # A walk that runs out of steps has no meaningful cost; report the job as failed.
+    if job.path[-1] != job.end:
+        job.best_cost = None
+        raise RouteNotFound(f"No route to node {job.end} found within {env.max_steps} steps")
+    job.best_cost = path_cost(job.path, traffic)
+    return agent, env
 
 @app.route('/selections', methods=['POST'])
 def handle_selections():
     """
-    Handle node selections from the user, initialize environment and agent, and train the Q-learning agent.
+    Handle node selections from the user and queue a background training job for the route.
     """
-    global selected_nodes, G_undirected, traffic_data, current_env, agent
+    user_state = current_session()
+    city = session_city(user_state)
 
     # Retrieve selected start and end nodes.
     data = request.get_json()
-    selected_nodes.update(data)
+    selected_nodes = dict(user_state["selected_nodes"])
+    selected_nodes.update({key: data[key] for key in ('start', 'end') if key in data})
+    user_state["selected_nodes"] = selected_nodes
 
     start = int(selected_nodes.get('start'))
     end = int(selected_nodes.get('end'))
 
     # Validate node selection.
-    if start not in G_undirected.nodes or end not in G_undirected.nodes:
+    if city is None:
+        return jsonify({"error": "No city loaded"}), 400
+    if start not in city.graph.nodes or end not in city.graph.nodes:
         return jsonify({"error": "Invalid node selection"}), 400
     if start == end:
         return jsonify({"error": "Start and end nodes must differ"}), 400
 
-    # Initialize the traffic environment.
-    current_env = CityTrafficEnv(
-        graph=G_undirected,
-        start_node=start,
-        goal_node=end,
-        traffic_dict=traffic_data,
-        max_steps=300
-    )
-    
-    # Initialize the Q-learning agent with specified parameters.
-    agent = QLearningAgent(
-        current_env,
-        alpha=0.1,
-        gamma=0.9,
-        epsilon=0.5,
-        epsilon_decay=0.995,
-        min_epsilon=0.05
+    # Queue training; the job keeps references to the city's shared read-only data.
+    try:
+        job = job_manager.submit(
+            lambda job: run_training_job(job, city),
+            start, end, app.config['TRAINING_MAX_EPISODES']
+        )
+    except JobQueueFull:
+        return jsonify({"error": "Too many route requests in progress, try again shortly"}), 503
+
+    return jsonify({
+        "job_id": job.id,
+        "status_url": url_for('job_status', job_id=job.id)
+    }), 202
+
+@app.route('/traffic', methods=['POST'])
+def update_traffic():
+    """
+    Change the traffic cost of some edges of the session's city.
+
+    Expects JSON {"changes": [{"u": node_id, "v": node_id, "cost": number}, ...]}. Routes
+    planned afterwards for goals solved before the update are repaired incrementally. The
+    new costs are stored with the cached graph, so the city keeps them when it is reloaded
+    after an eviction or by another worker process.
+    """
+    user_state = current_session()
+    if session_city(user_state) is None:
+        return jsonify({"error": "No city loaded"}), 400
+
+    try:
+        changes = {
+            (int(change["u"]), int(change["v"])): float(change["cost"])
+            for change in request.get_json()["changes"]
+        }
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"error": "Expected a list of changes with u, v and cost"}), 400
+    if any(cost <= 0 for cost in changes.values()):
+        return jsonify({"error": "Traffic costs must be positive"}), 400
+
+    def apply_changes(city):
+        city = city.with_traffic_changes(changes)
+        graph_cache.store_traffic(city.place, city.traffic)
+        return city
+
+    try:
+        city = city_store.update(user_state["city_key"], apply_changes)
+    except KeyError as e:
+        return jsonify({"error": f"Unknown edge: {e.args[0]}"}), 400
+    if city is None:
+        return jsonify({"error": "No city loaded"}), 400
+    return jsonify({"changed": len(changes), "version": city.version()})
+
+@app.route('/routes/batch', methods=['POST'])
+def batch_routes():
+    """
+    Plan routes for many origin-destination pairs on the session's city in one request.
+
+    Expects JSON {"pairs": [{"start": node_id, "end": node_id}, ...]} and returns every
+    path and its traffic cost, without rendering maps. Pairs sharing an end node are served
+    by one training run.
+    """
+    user_state = current_session()
+    city = session_city(user_state)
+    if city is None:
+        return jsonify({"error": "No city loaded"}), 400
+
+    try:
+        pairs = [(int(pair["start"]), int(pair["end"])) for pair in request.get_json()["pairs"]]
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"error": "Expected a list of pairs with start and end"}), 400
+    if len(pairs) > app.config['BATCH_MAX_PAIRS']:
+        return jsonify({"error": f"At most {app.config['BATCH_MAX_PAIRS']} pairs per request"}), 400
+    unknown = [node for pair in pairs for node in pair if node not in city.compiled_graph.node_index]
+    if unknown:
+        return jsonify({"error": f"Unknown node: {unknown[0]}"}), 400
+
+    if not batch_slots.acquire(blocking=False):
+        return jsonify({"error": "Too many batch requests in progress, try again shortly"}), 503
+    try:
+        with phase_seconds.time(phase="batch_routes"):
+            routes, episodes_run = route_batch(
+                city.graph, city.compiled_graph, city.traffic, pairs,
+                num_workers=app.config['BATCH_WORKERS'],
+                multi_goal=app.config['BATCH_MULTI_GOAL'],
+                multi_goal_episodes=app.config['BATCH_MULTI_GOAL_EPISODES'],
+                multi_goal_max_bytes=app.config['BATCH_MULTI_GOAL_MAX_BYTES'],
+                agent_params=dict(agent_params(), q_init=app.config['TRAINING_Q_INIT']),
+                solver=app.config['TRAINING_SOLVER'],
+                episodes=app.config['TRAINING_MAX_EPISODES'],
+                num_envs=app.config['TRAINING_NUM_ENVS'],
+                contract=app.config['GRAPH_CONTRACTION'],
+                tolerance=app.config['VALUE_ITERATION_TOLERANCE']
+            )
+    finally:
+        batch_slots.release()
+    training_episodes.inc(episodes_run)
+
+    results = []
+    for start, end in pairs:
+        path = routes[(start, end)]
+        results.append({
+            "start": start,
+            "end": end,
+            "path": path,
+            "cost": path_cost(path, city.traffic),
+            "reached_goal": path[-1] == end,
+        })
+    return jsonify({"routes": results, "goals": len({end for _, end in pairs}), "episodes": episodes_run})
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """
+    Report the progress of a training job.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    status = job.to_dict()
+    if job.status == "done":
+        status["redirect_url"] = url_for('serve_job_map', job_id=job.id)
+        status["path"] = job.path
+        status["route"] = job.route
+    return jsonify(status)
+
+@app.route('/jobs/<job_id>/map')
+def serve_job_map(job_id):
+    """
+    Serve the final route map of a finished training job.
+    """
+    job = job_manager.get(job_id)
+    if job is None or job.status != "done":
+        return jsonify({"error": "Route map not available"}), 404
+    lats = [lat for lat, _ in job.route] or [0.0]
+    lons = [lon for _, lon in job.route] or [0.0]
+    return response_cache.respond(
+        make_etag("route_map", job.id, TEMPLATE_VERSION),
+        lambda: render_template(
+            'route_map.html',
+            job_id=job.id,
+            data_url=url_for('map_data', city=job.city_key),
+            bounds=[[min(lats), min(lons)], [max(lats), max(lons)]]
+        ).encode("utf-8"),
+        mimetype="text/html",
+        on_result=lambda result: http_cache_results.inc(result=result, endpoint="serve_job_map")
     )
-    
-    # Train the agent over a number of episodes.
-    episodes = 3000
-    for ep in range(episodes):
-        state, _ = current_env.reset()
-        done = False
-        while not done:
-            # Agent chooses an action.
-            action = agent.choose_action(state)
-            # Environment returns next state and reward.
-            next_state, reward, done, _, _ = current_env.step(action)
-            # Update Q-table based on experience.
-            agent.update(state, action, reward, next_state, done)
-            state = next_state
-        # Decay exploration rate after each episode.
-        agent.update_exploration()
 
-    # Retrieve the optimal path from the learned Q-values.
-    optimal_path = get_shortest_path(agent, current_env)
+@app.route('/api/map-data')
+def map_data():
+    """
+    Return the traffic edges and nodes of a city inside a bounding box, as JSON.
 
-    # Generate a final route visualization map.
-    visualize_route_folium(G_undirected, traffic_data, optimal_path,
-                           output_map="templates/final_route_map.html")
+    Query parameters: bbox=south,west,north,east and zoom (the map's zoom level); city
+    optionally selects a loaded city by key instead of the session's city.
+    """
+    user_state = current_session()
+    key = request.args.get('city')
+    if key is None or key == user_state["city_key"]:
+        city = session_city(user_state)
+    else:
+        city = city_store.get(key)
+    if city is None:
+        return jsonify({"error": "No city loaded"}), 404
 
-    # Return the redirect URL for final route map.
-    return jsonify({"redirect_url": url_for('serve_final_map')})
+    try:
+        south, west, north, east = (float(value) for value in request.args['bbox'].split(','))
+        zoom = int(request.args.get('zoom', app.config['MAP_FULL_DETAIL_ZOOM']))
+    except (KeyError, ValueError):
+        return jsonify({"error": "Expected bbox=south,west,north,east and an integer zoom"}), 400
+
+    def render():
+        with phase_seconds.time(phase="map_data"):
+            payload = city.map_index.query(south, west, north, east, zoom)
+            body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        map_data_bytes.observe(len(body))
+        return body
+
+    # The body depends only on the city's graph and traffic and the query.
+    index = city.map_index
+    return response_cache.respond(
+        make_etag("map_data", city.version(), south, west, north, east, zoom,
+                  index.full_detail_zoom, index.node_min_zoom),
+        render,
+        mimetype="application/json",
+        on_result=lambda result: http_cache_results.inc(result=result, endpoint="map_data")
+    )
 
-@app.route('/final')
-def serve_final_map():
+@app.route('/metrics')
+def serve_metrics():
     """
-    Render the final route map.
+    Expose counters and histograms in the Prometheus text exposition format.
     """
-    return render_template('final_route_map.html')
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
     # Run the Flask app for local testing.
@@ -0,0 +1,134 @@
+# map_data.py
+import numpy as np
+
+# Coordinates are rounded to 6 decimals (about 0.1 m), which keeps responses small.
+COORD_PRECISION = 6
+
+class MapIndex:
+    """
+    Array-backed view of a city's edges and nodes that answers viewport queries for the map API.
+
+    Built once per loaded city. A query returns only the edges and nodes inside a bounding
+    box. Below `full_detail_zoom`, edge endpoints are snapped to a grid of a few screen pixels
+    and merged, so zoomed-out views stay small however large the city is. Nodes, which are
+    only needed for picking start and end, are returned from `node_min_zoom` on.
+    """
+    def __init__(self, graph, compiled_graph, full_detail_zoom=15, node_min_zoom=14, snap_pixels=3):
+        """
+        Initialize the index.
+
+        Args:
+            graph: The undirected NetworkX graph with `x`/`y` node attributes.
+            compiled_graph: The CompiledGraph of graph and its traffic.
+            full_detail_zoom: Zoom level from which edges are returned unsimplified.
+            node_min_zoom: Zoom level from which nodes are returned.
+            snap_pixels: Grid cell size, in screen pixels, used to simplify edges below full_detail_zoom.
+        """
+        self.full_detail_zoom = full_detail_zoom
+        self.node_min_zoom = node_min_zoom
+        self.snap_pixels = snap_pixels
+        self.nodes = compiled_graph.nodes
+        self.node_index = compiled_graph.node_index
+        self.lats = np.array([graph.nodes[n]['y'] for n in self.nodes], dtype=np.float64)
+        self.lons = np.array([graph.nodes[n]['x'] for n in self.nodes], dtype=np.float64)
+
+        # Each undirected edge once (u < v) with its traffic cost.
+        sources = np.repeat(np.arange(compiled_graph.num_nodes), compiled_graph.degrees)
+        once = sources < compiled_graph.neighbors
+        self.edge_u = sources[once]
+        self.edge_v = compiled_graph.neighbors[once]
+        self.edge_costs = compiled_graph.costs[once]
+
+    def with_costs(self, compiled_graph):
+        """
+        Return an index sharing this one's coordinates with the edge costs of another snapshot
+        of the same graph.
+        """
+        index = MapIndex.__new__(MapIndex)
+        index.__dict__.update(self.__dict__)
+        sources = np.repeat(np.arange(compiled_graph.num_nodes), compiled_graph.degrees)
+        index.edge_costs = compiled_graph.costs[sources < compiled_graph.neighbors]
+        return index
+
+    @property
+    def nbytes(self):
+        """
+        Memory used by the index arrays.
+        """
+        return sum(a.nbytes for a in (self.lats, self.lons, self.edge_u, self.edge_v, self.edge_costs))
+
+    def bounds(self):
+        """
+        Return the bounding box of all nodes as [[south, west], [north, east]].
+        """
+        return [[float(self.lats.min()), float(self.lons.min())], [float(self.lats.max()), float(self.lons.max())]]
+
+    def query(self, south, west, north, east, zoom):
+        """
+        Return the edges (and, when zoomed in, nodes) visible in a bounding box.
+
+        Args:
+            south, west, north, east: Bounding box in degrees.
+            zoom: Web map zoom level of the view.
+
+        Returns:
+            A JSON-serializable dictionary:
+            - "edges": list of {"cost", "segments"} groups, one per rounded traffic cost, where
+              segments is a flat [lat_u, lon_u, lat_v, lon_v, ...] list;
+            - "nodes": {"ids", "coords"} with coords a flat [lat, lon, ...] list, or None
+              below node_min_zoom;
+            - "simplified": whether edges were snapped and merged.
+        """
+        lat_u, lon_u = self.lats[self.edge_u], self.lons[self.edge_u]
+        lat_v, lon_v = self.lats[self.edge_v], self.lons[self.edge_v]
+        # Keep edges whose own bounding box overlaps the view.
+        visible = ((np.minimum(lat_u, lat_v) <= north) & (np.maximum(lat_u, lat_v) >= south)
+                   & (np.minimum(lon_u, lon_v) <= east) & (np.maximum(lon_u, lon_v) >= west))
+        segments = np.column_stack([lat_u[visible], lon_u[visible], lat_v[visible], lon_v[visible]])
+        costs = np.rint(self.edge_costs[visible]).astype(np.int64)
+
+        simplified = zoom < self.full_detail_zoom
+        if simplified and len(segments):
+            segments, costs = self._snap_segments(segments, costs, zoom)
+
+        edges = []
+        for cost in np.unique(costs):
+            group = np.round(segments[costs == cost], COORD_PRECISION)
+            edges.append({"cost": int(cost), "segments": group.ravel().tolist()})
+
+        nodes = None
+        if zoom >= self.node_min_zoom:
+            inside = np.flatnonzero((self.lats >= south) & (self.lats <= north)
+                                    & (self.lons >= west) & (self.lons <= east))
+            coords = np.round(np.column_stack([self.lats[inside], self.lons[inside]]), COORD_PRECISION)
+            nodes = {"ids": [self.nodes[i] for i in inside.tolist()], "coords": coords.ravel().tolist()}
+        return {"zoom": zoom, "simplified": simplified, "edges": edges, "nodes": nodes}
+
+    def _snap_segments(self, segments, costs, zoom):
+        """
+        Snap segment endpoints to a pixel grid and merge segments that collapse together.
+
+        Segments shorter than one cell are dropped; merged segments keep the highest cost.
+        """
+        # Degrees of longitude per screen pixel at this zoom (256-pixel tiles).
+        cell = self.snap_pixels * 360.0 / (256 * 2 ** zoom)
+        cells = np.floor(segments / cell).astype(np.int64)
+        # Order endpoints so (a, b) and (b, a) merge.
+        first = (cells[:, 0] < cells[:, 2]) | ((cells[:, 0] == cells[:, 2]) & (cells[:, 1] <= cells[:, 3]))
+        cells = np.where(first[:, None], cells, cells[:, [2, 3, 0, 1]])
+        keep = (cells[:, 0] != cells[:, 2]) | (cells[:, 1] != cells[:, 3])
+        cells, costs = cells[keep], costs[keep]
+        if not len(cells):
+            return np.empty((0, 4)), costs
+        unique_cells, inverse = np.unique(cells, axis=0, return_inverse=True)
+        merged_costs = np.zeros(len(unique_cells), dtype=np.int64)
+        np.maximum.at(merged_costs, inverse.ravel(), costs)
+        return (unique_cells + 0.5) * cell, merged_costs
+
+    def route_coords(self, path):
+        """
+        Return [lat, lon] pairs for a path of node IDs, skipping unknown nodes.
+        """
+        indices = [self.node_index[node] for node in path if node in self.node_index]
+        return [[round(float(self.lats[i]), COORD_PRECISION), round(float(self.lons[i]), COORD_PRECISION)]
+                for i in indices]
@@ -0,0 +1,231 @@
+# metrics.py
+import bisect
+import cProfile
+import math
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000, 100000000)
+
+def _label_key(labels):
+    """
+    Return a hashable, sorted tuple of label pairs.
+    """
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+def _format_labels(label_key, extra=()):
+    """
+    Format label pairs in the Prometheus text format, e.g. {phase="training"}.
+    """
+    pairs = list(label_key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+def _format_value(value):
+    """
+    Format a sample value, using Prometheus spellings for infinities.
+    """
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """
+    Monotonically increasing value per label set.
+    """
+    type_name = "counter"
+
+    def __init__(self, name, help_text):
+        """
+        Args:
+            name: Metric name.
+            help_text: Description shown in the HELP line.
+        """
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value=1, **labels):
+        """
+        Add a non-negative amount to the counter for the given labels.
+        """
+        if value < 0:
+            raise ValueError("Counters can only increase")
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def value(self, **labels):
+        """
+        Return the current value for the given labels.
+        """
+        with self._lock:
+            return self._values.get(_label_key(labels), 0)
+
+    def samples(self):
+        """
+        Yield (name, label text, value) samples for the text exposition format.
+        """
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield self.name, _format_labels(key), value
+
+class Histogram:
+    """
+    Distribution of observed values in cumulative buckets, per label set.
+    """
+    type_name = "histogram"
+
+    def __init__(self, name, help_text, buckets=DURATION_BUCKETS):
+        """
+        Args:
+            name: Metric name.
+            help_text: Description shown in the HELP line.
+            buckets: Upper bounds of the buckets; a +Inf bucket is always added.
+        """
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        """
+        Record one observation for the given labels.
+        """
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0}
+            series["counts"][bisect.bisect_left(self.buckets, value)] += 1
+            series["sum"] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Observe the wall-clock duration of a with-block, in seconds.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels):
+        """
+        Return the number of observations for the given labels.
+        """
+        with self._lock:
+            series = self._series.get(_label_key(labels))
+            return sum(series["counts"]) if series else 0
+
+    def samples(self):
+        """
+        Yield (name, label text, value) samples for the text exposition format.
+        """
+        with self._lock:
+            items = sorted((key, list(s["counts"]), s["sum"]) for key, s in self._series.items())
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield self.name + "_bucket", _format_labels(key, [("le", _format_value(float(bound)))]), cumulative
+            yield self.name + "_sum", _format_labels(key), total
+            yield self.name + "_count", _format_labels(key), cumulative
+
+class MetricsRegistry:
+    """
+    A set of counters and histograms rendered in the Prometheus text exposition format.
+    """
+    def __init__(self, prefix="trafficnav_"):
+        """
+        Args:
+            prefix: String prepended to every metric name.
+        """
+        self.prefix = prefix
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, help_text, **kwargs):
+        """
+        Return the metric with a name, creating it on first use.
+        """
+        full_name = self.prefix + name
+        with self._lock:
+            metric = self._metrics.get(full_name)
+            if metric is None:
+                metric = self._metrics[full_name] = cls(full_name, help_text, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {full_name} is already registered as a {metric.type_name}")
+            return metric
+
+    def counter(self, name, help_text):
+        """
+        Return the counter with a name, creating it on first use.
+        """
+        return self._register(Counter, name, help_text)
+
+    def histogram(self, name, help_text, buckets=DURATION_BUCKETS):
+        """
+        Return the histogram with a name, creating it on first use.
+        """
+        return self._register(Histogram, name, help_text, buckets=buckets)
+
+    def render(self):
+        """
+        Return all metrics in the Prometheus text exposition format.
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+def dump_profile(profiler, profile_dir, name):
+    """
+    Stop a running cProfile profiler and write its stats to `profile_dir`.
+
+    Stats files are named after `name` and the current time and can be read with
+    `python -m pstats` or snakeviz.
+
+    Returns:
+        The path of the written .prof file.
+    """
+    profiler.disable()
+    os.makedirs(profile_dir, exist_ok=True)
+    safe_name = "".join(c if c.isalnum() or c in "-_" else "_" for c in name)
+    path = os.path.join(profile_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{safe_name}-{uuid.uuid4().hex[:8]}.prof")
+    profiler.dump_stats(path)
+    return path
+
+@contextmanager
+def profiled(profile_dir, name):
+    """
+    Profile a with-block with cProfile and dump the stats to `profile_dir`.
+
+    Args:
+        profile_dir: Directory for .prof files, or None to disable profiling.
+        name: Label included in the file name (e.g. the endpoint or job ID).
+    """
+    if profile_dir is None:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        dump_profile(profiler, profile_dir, name)
@@ -0,0 +1,170 @@
+# multi_goal.py
+import numpy as np
+
+from agent import QLearningAgent
+from heuristics import GOAL_REWARD
+
+class MultiGoalAgent:
+    """
+    Q-learning toward several goals at once from the same transitions.
+
+    The Q store has a goal axis: `Q[g]` is a dense `num_states x max_degree` table for goal
+    `goal_nodes[g]`. Every transition (s, a, s') updates all goals with the reward it would
+    have earned under each one (GOAL_REWARD if s' is that goal, the environment's step reward
+    otherwise), so one episode toward any goal also teaches the routes to the others. This
+    works because Q-learning is off-policy and the graph and costs are the same for every goal.
+    """
+    def __init__(self, compiled_graph, goal_nodes, alpha=0.1, gamma=0.9, epsilon=0.5, epsilon_decay=0.995,
+                 min_epsilon=0.05, q_dtype=None, max_bytes=None):
+        """
+        Initialize the agent.
+
+        Args:
+            compiled_graph: The CompiledGraph training runs on.
+            goal_nodes: Goal node IDs, one Q-table each.
+            alpha: Learning rate.
+            gamma: Discount factor.
+            epsilon: Initial exploration rate.
+            epsilon_decay: Factor by which epsilon decays after each episode.
+            min_epsilon: Minimum exploration rate.
+            q_dtype: Q-value dtype; defaults to float64.
+            max_bytes: Optional limit on the size of the Q store. One goal is always allowed,
+                since its table is no larger than a single-goal agent's.
+
+        Raises:
+            ValueError: If the Q store of several goals would exceed max_bytes.
+        """
+        size = self.table_bytes(compiled_graph, len(goal_nodes), q_dtype)
+        if max_bytes is not None and len(goal_nodes) > 1 and size > max_bytes:
+            raise ValueError(f"Q store for {len(goal_nodes)} goals needs {size} bytes, more than {max_bytes}")
+        self.compiled_graph = compiled_graph
+        self.goal_nodes = list(goal_nodes)
+        self.goal_indices = np.array([compiled_graph.node_index[n] for n in self.goal_nodes], dtype=np.int64)
+        self.alpha = alpha
+        self.gamma = gamma
+        self.epsilon = epsilon
+        self.epsilon_decay = epsilon_decay
+        self.min_epsilon = min_epsilon
+
+        self.num_states = compiled_graph.num_nodes
+        self.num_actions = max(compiled_graph.max_degree, 1)
+        self.action_degrees = compiled_graph.degrees
+        self._invalid_actions = np.arange(self.num_actions) >= self.action_degrees[:, None]
+        self.Q = np.zeros((len(self.goal_nodes), self.num_states, self.num_actions), dtype=q_dtype or np.float64)
+        # Position of each goal node index on the goal axis.
+        self._goal_position = np.full(self.num_states, -1, dtype=np.int64)
+        self._goal_position[self.goal_indices] = np.arange(len(self.goal_indices))
+
+    @staticmethod
+    def table_bytes(compiled_graph, num_goals, q_dtype=None):
+        """
+        Return the size in bytes of the Q store for a number of goals on a compiled graph.
+        """
+        itemsize = np.dtype(q_dtype or np.float64).itemsize
+        return num_goals * compiled_graph.num_nodes * max(compiled_graph.max_degree, 1) * itemsize
+
+    def goal_positions(self, goal_indices):
+        """
+        Return the positions on the goal axis of an array of goal node indices.
+        """
+        return self._goal_position[goal_indices]
+
+    def greedy_actions(self, goals, states):
+        """
+        Return the best valid action of each state toward its goal position.
+        """
+        return np.argmax(np.where(self._invalid_actions[states], -np.inf, self.Q[goals, states, :]), axis=1)
+
+    def choose_actions(self, goals, states):
+        """
+        Choose one action per (goal position, state) pair with an ε-greedy policy over valid actions.
+        """
+        actions = self.greedy_actions(goals, states)
+        explore = np.random.rand(len(states)) < self.epsilon
+        if explore.any():
+            degrees = self.action_degrees[states[explore]]
+            actions[explore] = (np.random.rand(explore.sum()) * degrees).astype(np.int64)
+        return actions
+
+    def goal_rewards(self, rewards, next_states, step_rewards):
+        """
+        Relabel a batch of environment rewards for every goal.
+
+        Only the goal-reaching term changes, so the revisit penalty applies to every goal as
+        the environment would apply it.
+
+        Returns:
+            A tuple (goal_rewards, arrived) of (goals, batch) arrays: each transition's reward
+            toward each goal, and whether it arrives at that goal (ending the episode only
+            for that goal).
+        """
+        arrived = next_states[None, :] == self.goal_indices[:, None]
+        base_rewards = np.where(rewards == GOAL_REWARD, step_rewards, rewards)
+        return np.where(arrived, GOAL_REWARD, base_rewards[None, :]), arrived
+
+    def update_batch(self, states, actions, rewards, next_states, step_rewards):
+        """
+        Apply the temporal difference update for every goal to a batch of transitions.
+
+        Args:
+            states: Int array of current states.
+            actions: Int array of actions taken.
+            rewards: Float array of the rewards the environment gave (toward each episode's
+                own goal).
+            next_states: Int array of next states.
+            step_rewards: Float array of the rewards without the goal reward (edge cost and
+                revisit penalty), as in the VecCityTrafficEnv's info["step_rewards"].
+        """
+        goal_rewards, arrived = self.goal_rewards(rewards, next_states, step_rewards)
+        best_next = np.max(np.where(self._invalid_actions[next_states], -np.inf, self.Q[:, next_states, :]), axis=2)
+        td_target = goal_rewards + np.where(arrived, 0.0, self.gamma * best_next)
+        td_error = td_target - self.Q[:, states, actions]
+        # Scatter-add so duplicate (state, action) pairs are not dropped.
+        np.add.at(self.Q, (slice(None), states, actions), self.alpha * td_error)
+
+    def update_exploration(self, episodes=1):
+        """
+        Decay the exploration rate epsilon after finished episodes.
+        """
+        self.epsilon = max(self.min_epsilon, self.epsilon * self.epsilon_decay ** episodes)
+
+    def goal_agent(self, env):
+        """
+        Return a QLearningAgent for an environment heading to one of the goals, sharing that
+        goal's Q-table (no copy), e.g. for `get_shortest_path` or a ConvergenceMonitor.
+        """
+        agent = QLearningAgent(env, alpha=self.alpha, gamma=self.gamma, epsilon=self.min_epsilon,
+                               mask_actions=True)
+        agent.use_q_values(self.Q[self.goal_nodes.index(env.goal_node)])
+        return agent
+
+def train_multi_goal(vec_env, agent, episodes, monitor=None):
+    """
+    Train a MultiGoalAgent on a VecCityTrafficEnv whose episodes draw their goal from the
+    agent's goals.
+
+    Args:
+        vec_env: A VecCityTrafficEnv built with `goal_nodes` (and usually `start_nodes`).
+        agent: A MultiGoalAgent for the same compiled graph.
+        episodes: Number of episodes to finish (hard cap when a monitor is given).
+        monitor: Optional monitor with `update(agent, episodes_done)` that can stop training.
+
+    Returns:
+        The number of episodes finished.
+    """
+    states, _ = vec_env.reset()
+    finished = 0
+    while finished < episodes:
+        # Each episode acts greedily toward its own goal.
+        actions = agent.choose_actions(agent.goal_positions(vec_env.goals), states)
+        next_states, rewards, dones, _, info = vec_env.step(actions)
+        # Every goal learns from the whole batch of transitions.
+        agent.update_batch(states, actions, rewards, info["final_observation"], info["step_rewards"])
+        states = next_states
+        num_done = int(np.count_nonzero(dones))
+        if num_done:
+            agent.update_exploration(num_done)
+            finished += num_done
+            if monitor is not None and monitor.update(agent, finished):
+                break
+    return finished
@@ -0,0 +1,158 @@
+# policy_cache.py
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import numpy as np
+
+from q_store import CompactQTable
+
+class PolicyCache:
+    """
+    On-disk cache of trained Q-tables, keyed by graph, goal, traffic snapshot and hyperparameters.
+
+    A Q-table learned for a goal gives a route from any start node, so an exact hit answers a
+    new query without training. Tables are stored as .npy files and loaded memory-mapped; a
+    JSON sidecar holds the key fields so near misses (same graph and goal, different traffic
+    or hyperparameters) can be found for warm starts. Entries are evicted least-recently-used
+    first once the cache exceeds `max_bytes`.
+    """
+    def __init__(self, cache_dir="policy_cache", max_bytes=512 * 1024 * 1024):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir: Directory where cache entries are stored.
+            max_bytes: Maximum total size of the stored Q-tables.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(graph_hash, goal, traffic_hash, params):
+        """
+        Return the cache key for a graph, goal node, traffic snapshot and hyperparameters.
+
+        Args:
+            graph_hash: CompiledGraph.topology_hash() of the city graph.
+            goal: The goal node ID.
+            traffic_hash: CompiledGraph.cost_hash() of the traffic snapshot.
+            params: Dictionary of JSON-serializable hyperparameters.
+        """
+        payload = json.dumps([graph_hash, str(goal), traffic_hash, params], sort_keys=True)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def _paths(self, key):
+        """
+        Return the (Q-table, metadata) file paths of an entry.
+        """
+        base = os.path.join(self.cache_dir, key)
+        return base + ".npy", base + ".json"
+
+    def get(self, graph_hash, goal, traffic_hash, params):
+        """
+        Look up an exact match.
+
+        Returns:
+            A tuple (values, metadata) with the read-only memory-mapped Q-values (a 2-D dense
+            table or a flat compact table, see metadata["layout"]), or None if there is no entry.
+        """
+        return self._load(self.make_key(graph_hash, goal, traffic_hash, params))
+
+    def find_near(self, graph_hash, goal, params):
+        """
+        Find the most recently used entry for the same graph and goal with a compatible table layout.
+
+        Traffic and the remaining hyperparameters may differ, so the table is only suitable as
+        a warm start.
+
+        Returns:
+            A tuple (values, metadata), or None.
+        """
+        best = None
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                with open(path) as f:
+                    meta = json.load(f)
+                mtime = os.stat(path).st_mtime
+            except (OSError, ValueError):
+                continue
+            if meta["graph"] != graph_hash or meta["goal"] != str(goal):
+                continue
+            if meta["params"].get("q_storage") != params.get("q_storage"):
+                continue
+            if best is None or mtime > best[0]:
+                best = (mtime, name[:-len(".json")])
+        return self._load(best[1]) if best else None
+
+    def put(self, graph_hash, goal, traffic_hash, params, Q):
+        """
+        Store a trained Q-table and evict old entries if the cache is too large.
+
+        Args:
+            graph_hash: CompiledGraph.topology_hash() of the city graph.
+            goal: The goal node ID.
+            traffic_hash: CompiledGraph.cost_hash() of the traffic snapshot.
+            params: Dictionary of JSON-serializable hyperparameters.
+            Q: A dense Q array or a CompactQTable.
+        """
+        key = self.make_key(graph_hash, goal, traffic_hash, params)
+        npy_path, meta_path = self._paths(key)
+        values = Q.values if isinstance(Q, CompactQTable) else np.asarray(Q)
+        meta = {"graph": graph_hash, "goal": str(goal), "traffic": traffic_hash, "params": params,
+                "layout": "compact" if isinstance(Q, CompactQTable) else "dense"}
+
+        with self._lock:
+            # Write to temporary files first so readers never see a partial entry.
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, values)
+            os.replace(tmp_path, npy_path)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(meta, f)
+            os.replace(tmp_path, meta_path)
+            self._evict()
+
+    def _load(self, key):
+        """
+        Load an entry by key, memory-mapped, and mark it as recently used.
+        """
+        npy_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            values = np.load(npy_path, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        os.utime(npy_path)
+        os.utime(meta_path)
+        return values, meta
+
+    def _evict(self):
+        """
+        Remove least-recently-used entries until the stored tables fit in max_bytes.
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".npy"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            meta_path = path[:-len(".npy")] + ".json"
+            if os.path.exists(meta_path):
+                os.remove(meta_path)
+            total -= size
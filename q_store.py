@@ -0,0 +1,162 @@
+# q_store.py
+import numpy as np
+
+class CompactQTable:
+    """
+    Q-table that stores only the valid actions of each state in one flat array.
+
+    The values of state `s` are `values[offsets[s]:offsets[s + 1]]`, one per neighbor, using
+    the same degree offsets as the CSR neighbor arrays of a CompiledGraph. Unlike the dense
+    `num_states x max_degree` table there is no padding for low-degree nodes.
+    """
+    def __init__(self, offsets, dtype=np.float32, values=None):
+        """
+        Initialize the table.
+
+        Args:
+            offsets: int64 array of length num_states + 1 with row offsets.
+            dtype: Storage dtype of the Q-values (e.g. np.float32 or np.float16).
+            values: Optional initial flat values; zeros if omitted.
+        """
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.degrees = np.diff(self.offsets)
+        self.num_states = len(self.degrees)
+        self.dtype = np.dtype(dtype)
+        if values is None:
+            self.values = np.zeros(self.offsets[-1], dtype=self.dtype)
+        else:
+            self.values = np.asarray(values, dtype=self.dtype)
+
+    @classmethod
+    def from_compiled_graph(cls, compiled_graph, dtype=np.float32):
+        """
+        Create a zero-initialized table sized to a CompiledGraph's node degrees.
+        """
+        return cls(compiled_graph.offsets, dtype=dtype)
+
+    @property
+    def nbytes(self):
+        """
+        Memory used by the Q-values.
+
+        The row offsets are the CompiledGraph's CSR offsets and are shared, not counted.
+        """
+        return self.values.nbytes
+
+    def copy(self):
+        """
+        Return a copy of the table (offsets are shared, values are copied).
+        """
+        return CompactQTable(self.offsets, dtype=self.dtype, values=self.values.copy())
+
+    def row(self, state):
+        """
+        Return the Q-values of a state's valid actions (a view into the table).
+        """
+        return self.values[self.offsets[state]:self.offsets[state + 1]]
+
+    def get(self, states, actions):
+        """
+        Return Q-values for arrays (or scalars) of states and actions.
+        """
+        return self.values[self.offsets[states] + actions].astype(np.float64)
+
+    def add(self, states, actions, deltas):
+        """
+        Add deltas to Q-values; repeated (state, action) pairs accumulate.
+        """
+        slots = self.offsets[np.atleast_1d(states)] + np.atleast_1d(actions)
+        np.add.at(self.values, slots, np.atleast_1d(deltas).astype(self.dtype))
+
+    def argmax(self, state):
+        """
+        Return the best valid action of a state (0 for states without actions).
+        """
+        row = self.row(state)
+        return int(np.argmax(row)) if len(row) else 0
+
+    def max(self, state):
+        """
+        Return the best Q-value of a state (0 for states without actions).
+        """
+        row = self.row(state)
+        return float(row.max()) if len(row) else 0.0
+
+    def _gather(self, states):
+        """
+        Gather the rows of several states into one flat array.
+
+        Returns:
+            A tuple (values, row_starts, degrees) where row i of the result starts at
+            row_starts[i] and has degrees[i] entries.
+        """
+        degrees = self.degrees[states]
+        row_starts = np.cumsum(degrees) - degrees
+        index = np.repeat(self.offsets[states] - row_starts, degrees) + np.arange(degrees.sum())
+        return self.values[index].astype(np.float64), row_starts, degrees
+
+    def max_batch(self, states):
+        """
+        Return the best Q-value of each state in an array (0 for states without actions).
+        """
+        states = np.asarray(states, dtype=np.int64)
+        values, row_starts, degrees = self._gather(states)
+        best = np.zeros(len(states))
+        # reduceat needs non-empty rows: an empty row's start would cut the previous row short.
+        has_actions = degrees > 0
+        if has_actions.any():
+            best[has_actions] = np.maximum.reduceat(values, row_starts[has_actions])
+        return best
+
+    def argmax_batch(self, states):
+        """
+        Return the best valid action of each state in an array (first one on ties, 0 for
+        states without actions).
+        """
+        states = np.asarray(states, dtype=np.int64)
+        values, row_starts, degrees = self._gather(states)
+        first = np.zeros(len(states), dtype=np.int64)
+        has_actions = degrees > 0
+        if has_actions.any():
+            starts = row_starts[has_actions]
+            best = np.maximum.reduceat(values, starts)
+            # Position of the first maximum within each row.
+            position = np.arange(len(values))
+            candidates = np.where(values == np.repeat(best, degrees[has_actions]), position, len(values))
+            first[has_actions] = np.minimum.reduceat(candidates, starts) - starts
+        return first
+
+def merge_q_tables(tables):
+    """
+    Average several Q-tables of the same shape (dense arrays or CompactQTables).
+    """
+    if isinstance(tables[0], CompactQTable):
+        merged = tables[0].copy()
+        merged.values = np.mean([table.values.astype(np.float64) for table in tables], axis=0).astype(merged.dtype)
+        return merged
+    return np.mean(tables, axis=0)
+
+def q_memory_report(compiled_graph, dtypes=(np.float64, np.float32, np.float16)):
+    """
+    Compare the memory of a dense Q-table with compact tables for a graph.
+
+    Args:
+        compiled_graph: A CompiledGraph.
+        dtypes: Compact storage dtypes to report.
+
+    Returns:
+        A dictionary with the dense size, per-dtype compact sizes and savings ratios.
+    """
+    dense_bytes = compiled_graph.num_nodes * compiled_graph.max_degree * np.dtype(np.float64).itemsize
+    report = {
+        "num_states": compiled_graph.num_nodes,
+        "max_degree": compiled_graph.max_degree,
+        "valid_actions": int(compiled_graph.offsets[-1]),
+        "dense_float64_bytes": dense_bytes,
+    }
+    for dtype in dtypes:
+        name = np.dtype(dtype).name
+        compact_bytes = CompactQTable(compiled_graph.offsets, dtype=dtype).nbytes
+        report[f"compact_{name}_bytes"] = compact_bytes
+        report[f"compact_{name}_saving"] = round(1 - compact_bytes / dense_bytes, 3) if dense_bytes else 0.0
+    return report
@@ -0,0 +1,98 @@
+# replanning.py
+import random
+
+from utils import get_shortest_path
+
+def nearby_states(compiled_graph, changed_edges, radius=3):
+    """
+    Return the node indices within `radius` hops of any changed edge, sorted.
+
+    Args:
+        compiled_graph: A CompiledGraph.
+        changed_edges: Iterable of (u_index, v_index) pairs.
+        radius: Maximum number of hops from an endpoint of a changed edge.
+    """
+    region = {index for edge in changed_edges for index in edge}
+    frontier = set(region)
+    for _ in range(radius):
+        frontier = {n for index in frontier for n in compiled_graph.neighbor_indices(index)} - region
+        region |= frontier
+    return sorted(region)
+
+def retrain_near_changes(agent, changed_edges, episodes=300, radius=3, epsilon=0.3, route_fraction=0.5,
+                         monitor=None):
+    """
+    Repair a trained agent's Q-values with short Q-learning episodes around changed edges.
+
+    Episodes start either on the agent's current greedy route (so states upstream of a change
+    learn to avoid it) or within `radius` hops of a changed edge (so the detours around it are
+    explored), and run in the agent's environment, which must already have the new costs. The
+    rest of the Q-table is only touched where these episodes pass.
+
+    Model-based sweeping over the graph is not used: with the discounted goal reward, cheap
+    cycles look better than distant goals to an exact Bellman backup, and only the
+    environment's history-dependent loop prevention keeps trained routes from taking them.
+
+    Args:
+        agent: A trained QLearningAgent; its Q-values are updated in place.
+        changed_edges: Iterable of (u_index, v_index) pairs whose cost changed.
+        episodes: Number of repair episodes (hard cap when a monitor is given).
+        radius: Hop radius around changed edges where episodes may start.
+        epsilon: Exploration rate during the repair; the agent's own rate is restored afterwards.
+        route_fraction: Share of episodes that start on the current greedy route.
+        monitor: Optional ConvergenceMonitor that can stop the repair early.
+
+    Returns:
+        The number of episodes run.
+    """
+    env = agent.env
+    route = [env.compiled_graph.node_index[node] for node in get_shortest_path(agent, env)]
+    route = [index for index in route if index != env.goal_index]
+    region = [index for index in nearby_states(env.compiled_graph, changed_edges, radius)
+              if index != env.goal_index]
+    if not route and not region:
+        return 0
+
+    saved_epsilon, agent.epsilon = agent.epsilon, epsilon
+    try:
+        for ep in range(episodes):
+            if route and (not region or random.random() < route_fraction):
+                start = random.choice(route)
+            else:
+                start = random.choice(region)
+            state, _ = env.reset(options={"start_node": env.nodes[start]})
+            done = False
+            while not done:
+                action = agent.choose_action(state)
+                next_state, reward, done, _, _ = env.step(action)
+                agent.update(state, action, reward, next_state, done)
+                state = next_state
+            if monitor is not None and monitor.update(agent, ep + 1):
+                return ep + 1
+        return episodes
+    finally:
+        agent.epsilon = saved_epsilon
+
+def replan(agent, changes, **kwargs):
+    """
+    Apply traffic changes to a trained agent's environment and repair its Q-values in place.
+
+    Args:
+        agent: A trained QLearningAgent whose environment has a compiled graph.
+        changes: A dictionary mapping (u, v) node-ID tuples to their new traffic cost.
+        **kwargs: Passed on to `retrain_near_changes`.
+
+    Returns:
+        The number of repair episodes run.
+    """
+    env = agent.env
+    if env.compiled_graph is None:
+        raise ValueError("Re-planning requires an environment with a compiled graph")
+    env.compiled_graph, changed = env.compiled_graph.with_updated_costs(changes)
+    if hasattr(env.traffic_dict, "with_updated_costs"):
+        env.traffic_dict = env.traffic_dict.with_updated_costs(changes)
+    else:
+        env.traffic_dict = dict(env.traffic_dict)
+        for (u, v), cost in changes.items():
+            env.traffic_dict[(u, v)] = env.traffic_dict[(v, u)] = cost
+    return retrain_near_changes(agent, changed, **kwargs)
@@ -0,0 +1,135 @@
+# replay.py
+import numpy as np
+
+class ReplayBuffer:
+    """
+    Fixed-capacity ring buffer of transitions in preallocated NumPy arrays.
+
+    States, actions, rewards, next states and done flags each live in one array of length
+    `capacity`; new transitions overwrite the oldest once the buffer is full. Minibatches are
+    drawn uniformly, or with `prioritized` in proportion to (|TD error| + priority_epsilon) **
+    priority_exponent, with importance-sampling weights that correct for the skewed sampling.
+    """
+    def __init__(self, capacity, prioritized=False, priority_exponent=0.6, importance_exponent=0.4,
+                 priority_epsilon=1e-3, seed=None):
+        """
+        Initialize an empty buffer.
+
+        Args:
+            capacity: Maximum number of transitions kept.
+            prioritized: Sample transitions in proportion to their last TD error.
+            priority_exponent: How strongly priorities skew sampling (0 is uniform).
+            importance_exponent: How strongly importance-sampling weights correct for it
+                (1 corrects fully).
+            priority_epsilon: Added to |TD error| so no transition gets zero probability.
+            seed: Optional seed for the buffer's random number generator.
+        """
+        self.capacity = int(capacity)
+        self.prioritized = prioritized
+        self.priority_exponent = priority_exponent
+        self.importance_exponent = importance_exponent
+        self.priority_epsilon = priority_epsilon
+        self.rng = np.random.default_rng(seed)
+
+        self.states = np.zeros(self.capacity, dtype=np.int64)
+        self.actions = np.zeros(self.capacity, dtype=np.int64)
+        self.rewards = np.zeros(self.capacity, dtype=np.float64)
+        self.next_states = np.zeros(self.capacity, dtype=np.int64)
+        self.dones = np.zeros(self.capacity, dtype=bool)
+        self.priorities = np.zeros(self.capacity, dtype=np.float64) if prioritized else None
+        # Priority given to new transitions, so each is sampled at least about as often as the
+        # most surprising one seen so far.
+        self._max_priority = 1.0
+        # Next slot to write and number of filled slots.
+        self.position = 0
+        self.size = 0
+
+    def __len__(self):
+        """
+        Return the number of stored transitions.
+        """
+        return self.size
+
+    def add_batch(self, states, actions, rewards, next_states, dones):
+        """
+        Store a batch of transitions, overwriting the oldest ones once full.
+        """
+        count = len(states)
+        if count > self.capacity:
+            # Only the newest `capacity` transitions would survive anyway.
+            states, actions, rewards, next_states, dones = (
+                np.asarray(a)[-self.capacity:] for a in (states, actions, rewards, next_states, dones))
+            count = self.capacity
+        slots = (self.position + np.arange(count)) % self.capacity
+        self.states[slots] = states
+        self.actions[slots] = actions
+        self.rewards[slots] = rewards
+        self.next_states[slots] = next_states
+        self.dones[slots] = dones
+        if self.prioritized:
+            self.priorities[slots] = self._max_priority
+        self.position = (self.position + count) % self.capacity
+        self.size = min(self.size + count, self.capacity)
+
+    def sample(self, batch_size):
+        """
+        Draw a minibatch of stored transitions (with replacement).
+
+        Returns:
+            A tuple (slots, states, actions, rewards, next_states, dones, weights): `slots`
+            identifies the transitions for `update_priorities`, and `weights` holds the
+            importance-sampling weights (None for uniform sampling).
+        """
+        if not self.prioritized:
+            slots = self.rng.integers(self.size, size=batch_size)
+            weights = None
+        else:
+            cumulative = np.cumsum(self.priorities[:self.size])
+            slots = np.searchsorted(cumulative, self.rng.random(batch_size) * cumulative[-1], side="right")
+            slots = np.minimum(slots, self.size - 1)
+            probabilities = self.priorities[slots] / cumulative[-1]
+            weights = (self.size * probabilities) ** -self.importance_exponent
+            weights /= weights.max()
+        return (slots, self.states[slots], self.actions[slots], self.rewards[slots], self.next_states[slots],
+                self.dones[slots], weights)
+
+    def update_priorities(self, slots, td_errors):
+        """
+        Set the priorities of sampled transitions from their new TD errors.
+        """
+        if not self.prioritized:
+            return
+        priorities = (np.abs(td_errors) + self.priority_epsilon) ** self.priority_exponent
+        self.priorities[slots] = priorities
+        self._max_priority = max(self._max_priority, float(priorities.max()))
+
+def replay_updates(agent, buffer, transitions, replay_ratio=1.0, batch_size=64, owed=0.0):
+    """
+    Run the minibatch updates a number of new transitions pays for.
+
+    Every new transition adds `replay_ratio` replayed transitions to the budget; as many
+    full minibatches of `batch_size` as the budget allows are sampled from the buffer.
+
+    Args:
+        agent: An agent with `update_batch(..., weights=...)` returning TD errors.
+        buffer: The ReplayBuffer to sample from.
+        transitions: Number of new transitions since the last call.
+        replay_ratio: Replayed transitions per new transition.
+        batch_size: Transitions per minibatch.
+        owed: Budget carried over from the last call.
+
+    Returns:
+        The budget to carry over to the next call.
+    """
+    owed += replay_ratio * transitions
+    num_batches = int(owed // batch_size) if len(buffer) else 0
+    if not num_batches:
+        return owed
+    # Sample every minibatch in one pass; priorities they update apply from the next call.
+    slots, states, actions, rewards, next_states, dones, weights = buffer.sample(num_batches * batch_size)
+    for begin in range(0, num_batches * batch_size, batch_size):
+        batch = slice(begin, begin + batch_size)
+        td_errors = agent.update_batch(states[batch], actions[batch], rewards[batch], next_states[batch],
+                                       dones[batch], weights=None if weights is None else weights[batch])
+        buffer.update_priorities(slots[batch], td_errors)
+    return owed - num_batches * batch_size
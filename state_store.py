@@ -0,0 +1,182 @@
+# state_store.py
+import threading
+from collections import OrderedDict
+
+from graph_cache import normalize_place
+
+# Rough per-object memory costs used to estimate the size of a loaded city.
+# NetworkX keeps a dict per node and per adjacency entry; the compiled graph keeps
+# per-node Python lists. Traffic is counted separately from its arrays.
+_BYTES_PER_NODE = 600
+_BYTES_PER_EDGE = 250
+
+class CityData:
+    """
+    Read-only data for one loaded city, shared by every session that uses it.
+    """
+    def __init__(self, key, place, graph, traffic, compiled_graph, map_index=None):
+        """
+        Args:
+            key: Normalized place key.
+            place: The place string as first requested.
+            graph: The undirected NetworkX road graph.
+            traffic: A TrafficStore with the city's edge costs.
+            compiled_graph: The CompiledGraph for graph and traffic.
+            map_index: Optional MapIndex serving viewport queries for the map pages.
+        """
+        self.key = key
+        self.place = place
+        self.graph = graph
+        self.traffic = traffic
+        self.compiled_graph = compiled_graph
+        self.map_index = map_index
+        # (cost_hash, changed_edges) of earlier traffic snapshots, oldest first.
+        self.traffic_history = []
+        self._version = None
+
+    def with_traffic_changes(self, changes, max_history=8):
+        """
+        Return a new CityData with some edge costs changed, sharing the graph and node data.
+
+        The previous cost snapshot and the edges changed since it are remembered (for up to
+        max_history updates), so Q-tables trained under earlier traffic can be repaired
+        instead of retrained.
+
+        Args:
+            changes: A dictionary mapping (u, v) node-ID tuples to their new traffic cost.
+            max_history: Number of earlier snapshots to remember.
+
+        Raises:
+            KeyError: If a pair is not an edge of the graph.
+        """
+        compiled, changed = self.compiled_graph.with_updated_costs(changes)
+        traffic = self.traffic.with_updated_costs(changes)
+        map_index = self.map_index.with_costs(compiled) if self.map_index is not None else None
+        city = CityData(self.key, self.place, self.graph, traffic, compiled, map_index=map_index)
+        city.traffic_history = (self.traffic_history + [(self.compiled_graph.cost_hash(), changed)])[-max_history:]
+        return city
+
+    def traffic_updates(self):
+        """
+        Yield (cost_hash, changed_edges) for each remembered earlier traffic snapshot, newest
+        first, where changed_edges lists every (u_index, v_index) edge changed since then.
+        """
+        changed = []
+        for cost_hash, edges in reversed(self.traffic_history):
+            changed = edges + changed
+            yield cost_hash, changed
+
+    def version(self):
+        """
+        Return a hash identifying this city's graph and traffic snapshot (used in ETags).
+        """
+        if self._version is None:
+            self._version = f"{self.compiled_graph.topology_hash()}-{self.compiled_graph.cost_hash()}"
+        return self._version
+
+    def estimated_bytes(self):
+        """
+        Estimate the memory held by this city.
+        """
+        compiled = self.compiled_graph
+        array_bytes = compiled.offsets.nbytes + compiled.neighbors.nbytes + compiled.costs.nbytes
+        if self.map_index is not None:
+            array_bytes += self.map_index.nbytes
+        array_bytes += self.traffic.nbytes
+        return (self.graph.number_of_nodes() * _BYTES_PER_NODE
+                + self.graph.number_of_edges() * _BYTES_PER_EDGE
+                + array_bytes)
+
+class CityStore:
+    """
+    Bounded in-memory LRU of loaded cities, keyed by normalized place.
+
+    Cities are evicted least-recently-used first when either the number of cities or their
+    estimated total size exceeds the configured limits. Evicted cities stay alive for as long
+    as a running job still references them and are reloaded on the next request.
+    """
+    def __init__(self, max_cities=4, max_bytes=1024 * 1024 * 1024):
+        """
+        Args:
+            max_cities: Maximum number of cities kept loaded.
+            max_bytes: Maximum estimated total size of loaded cities.
+        """
+        self.max_cities = max_cities
+        self.max_bytes = max_bytes
+        self._cities = OrderedDict()
+        self._lock = threading.Lock()
+        self._update_lock = threading.Lock()
+        self._load_locks = {}
+
+    def get(self, key):
+        """
+        Return a loaded city and mark it as recently used, or None if it is not loaded.
+        """
+        with self._lock:
+            city = self._cities.get(key)
+            if city is not None:
+                self._cities.move_to_end(key)
+            return city
+
+    def get_or_load(self, place, loader):
+        """
+        Return the city for a place, loading it at most once even under concurrent requests.
+
+        Args:
+            place: Place string, e.g. "Los Alamitos, CA, USA".
+            loader: Callable loader(key, place) returning a CityData.
+
+        Returns:
+            The shared CityData.
+        """
+        key = normalize_place(place)
+        city = self.get(key)
+        if city is not None:
+            return city
+
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        with load_lock:
+            # Another request may have loaded the city while we waited.
+            city = self.get(key)
+            if city is None:
+                city = loader(key, place)
+                with self._lock:
+                    self._cities[key] = city
+                    self._evict()
+        with self._lock:
+            self._load_locks.pop(key, None)
+        return city
+
+    def update(self, key, updater):
+        """
+        Replace a loaded city with an updated copy, serialized with other updates.
+
+        Jobs already running keep the CityData they started with.
+
+        Args:
+            key: Normalized place key.
+            updater: Callable updater(city) returning the new CityData.
+
+        Returns:
+            The new CityData, or None if the city is not loaded.
+        """
+        with self._update_lock:
+            city = self.get(key)
+            if city is None:
+                return None
+            city = updater(city)
+            with self._lock:
+                self._cities[key] = city
+                self._cities.move_to_end(key)
+            return city
+
+    def _evict(self):
+        """
+        Drop least-recently-used cities until the store fits its limits (keeps at least one).
+        """
+        total = sum(city.estimated_bytes() for city in self._cities.values())
+        while len(self._cities) > 1 and (len(self._cities) > self.max_cities or total > self.max_bytes):
+            _, city = self._cities.popitem(last=False)
+            total -= city.estimated_bytes()
+            print(f"[CityStore] Evicted {city.place}")
@@ -0,0 +1,168 @@
+# synthetic_graphs.py
+import math
+import numpy as np
+import networkx as nx
+
+GRAPH_KINDS = ("grid", "geometric", "perturbed-grid")
+
+def make_grid_graph(rows, cols, spacing=0.001, origin=(33.80, -118.07)):
+    """
+    Build a synthetic grid road graph with integer node IDs and `x`/`y` coordinates.
+
+    Args:
+        rows: Number of grid rows.
+        cols: Number of grid columns.
+        spacing: Distance between neighboring intersections in degrees.
+        origin: (lat, lon) of the bottom-left intersection.
+
+    Returns:
+        A NetworkX graph.
+    """
+    grid = nx.grid_2d_graph(rows, cols)
+    graph = nx.convert_node_labels_to_integers(grid, label_attribute="pos")
+    for n, data in graph.nodes(data=True):
+        r, c = data.pop("pos")
+        data['y'] = origin[0] + r * spacing
+        data['x'] = origin[1] + c * spacing
+    return graph
+
+def make_perturbed_grid_graph(rows, cols, drop_fraction=0.1, jitter=0.3, seed=0,
+                              spacing=0.001, origin=(33.80, -118.07)):
+    """
+    Build a grid road graph with jittered intersections and randomly removed streets.
+
+    Only the largest connected component is kept, relabeled to integers 0..n-1.
+
+    Args:
+        rows: Number of grid rows.
+        cols: Number of grid columns.
+        drop_fraction: Fraction of edges removed.
+        jitter: Maximum coordinate offset as a fraction of `spacing`.
+        seed: Seed for the perturbations.
+        spacing: Distance between neighboring intersections in degrees.
+        origin: (lat, lon) of the bottom-left intersection.
+
+    Returns:
+        A NetworkX graph.
+    """
+    rng = np.random.default_rng(seed)
+    graph = make_grid_graph(rows, cols, spacing, origin)
+    offsets = rng.uniform(-jitter, jitter, size=(graph.number_of_nodes(), 2)) * spacing
+    for n, data in graph.nodes(data=True):
+        data['y'] += offsets[n, 0]
+        data['x'] += offsets[n, 1]
+    edges = list(graph.edges())
+    drop = rng.random(len(edges)) < drop_fraction
+    graph.remove_edges_from(edge for edge, dropped in zip(edges, drop) if dropped)
+    return _largest_component(graph)
+
+def make_random_geometric_graph(num_nodes, mean_degree=6.0, seed=0, spacing=0.001, origin=(33.80, -118.07)):
+    """
+    Build a random geometric road graph: uniform random intersections joined when close.
+
+    Neighbor pairs are found by bucketing points into cells of the connection radius, so
+    construction is linear in the number of nodes. Only the largest connected component is
+    kept, relabeled to integers 0..n-1.
+
+    Args:
+        num_nodes: Number of random points (the result may have slightly fewer nodes).
+        mean_degree: Expected node degree, which sets the connection radius.
+        seed: Seed for the point positions.
+        spacing: Mean distance between points in degrees, as for grids of the same size.
+        origin: (lat, lon) of the bottom-left corner.
+
+    Returns:
+        A NetworkX graph.
+    """
+    rng = np.random.default_rng(seed)
+    points = rng.random((num_nodes, 2))
+    radius = math.sqrt(mean_degree / (math.pi * num_nodes))
+
+    cells_per_side = max(1, int(1 / radius))
+    cells = np.minimum((points * cells_per_side).astype(np.int64), cells_per_side - 1)
+    cell_ids = cells[:, 0] * cells_per_side + cells[:, 1]
+    order = np.argsort(cell_ids, kind="stable")
+    sorted_ids = cell_ids[order]
+
+    sources, targets = [], []
+    # Each unordered pair of neighboring cells is visited once.
+    for dx, dy in ((0, 0), (1, 0), (0, 1), (1, 1), (1, -1)):
+        cx, cy = cells[:, 0] + dx, cells[:, 1] + dy
+        valid = (cx < cells_per_side) & (cy >= 0) & (cy < cells_per_side)
+        target_ids = np.where(valid, cx * cells_per_side + cy, -1)
+        begin = np.searchsorted(sorted_ids, target_ids, side="left")
+        counts = np.where(valid, np.searchsorted(sorted_ids, target_ids, side="right") - begin, 0)
+        i = np.repeat(np.arange(num_nodes), counts)
+        within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        j = order[np.repeat(begin, counts) + within]
+        keep = np.sum((points[i] - points[j]) ** 2, axis=1) <= radius ** 2
+        if dx == 0 and dy == 0:
+            keep &= i < j
+        sources.append(i[keep])
+        targets.append(j[keep])
+
+    extent = math.sqrt(num_nodes) * spacing
+    graph = nx.Graph()
+    graph.add_nodes_from(
+        (n, {'y': origin[0] + y * extent, 'x': origin[1] + x * extent})
+        for n, (x, y) in enumerate(points.tolist())
+    )
+    graph.add_edges_from(zip(np.concatenate(sources).tolist(), np.concatenate(targets).tolist()))
+    return _largest_component(graph)
+
+def subdivide_edges(graph, segments):
+    """
+    Split every edge into `segments` pieces joined by degree-2 nodes, like the shape points
+    OSM places along curved roads.
+
+    New nodes get consecutive integer IDs after the existing ones and coordinates evenly
+    spaced along the edge.
+
+    Args:
+        graph: A NetworkX graph with integer node IDs and `x`/`y` attributes.
+        segments: Number of pieces per edge (1 returns an unchanged copy).
+
+    Returns:
+        A new NetworkX graph.
+    """
+    subdivided = nx.Graph()
+    subdivided.add_nodes_from(graph.nodes(data=True))
+    next_id = max(graph.nodes()) + 1 if graph.number_of_nodes() else 0
+    for u, v in graph.edges():
+        previous = u
+        for step in range(1, segments):
+            t = step / segments
+            subdivided.add_node(next_id, y=graph.nodes[u]['y'] + t * (graph.nodes[v]['y'] - graph.nodes[u]['y']),
+                                x=graph.nodes[u]['x'] + t * (graph.nodes[v]['x'] - graph.nodes[u]['x']))
+            subdivided.add_edge(previous, next_id)
+            previous, next_id = next_id, next_id + 1
+        subdivided.add_edge(previous, v)
+    return subdivided
+
+def make_synthetic_graph(kind, num_nodes, seed=0):
+    """
+    Build a deterministic synthetic road graph of roughly `num_nodes` intersections.
+
+    Args:
+        kind: One of GRAPH_KINDS.
+        num_nodes: Target number of nodes (grids are rounded to a square).
+        seed: Seed for randomized kinds.
+
+    Returns:
+        A NetworkX graph with integer node IDs and `x`/`y` attributes.
+    """
+    side = max(2, round(math.sqrt(num_nodes)))
+    if kind == "grid":
+        return make_grid_graph(side, side)
+    if kind == "perturbed-grid":
+        return make_perturbed_grid_graph(side, side, seed=seed)
+    if kind == "geometric":
+        return make_random_geometric_graph(num_nodes, seed=seed)
+    raise ValueError(f"Unknown synthetic graph kind: {kind}")
+
+def _largest_component(graph):
+    """
+    Return the largest connected component relabeled to consecutive integers.
+    """
+    component = max(nx.connected_components(graph), key=len)
+    return nx.convert_node_labels_to_integers(graph.subgraph(component).copy())
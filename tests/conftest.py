@@ -0,0 +1,54 @@
+# tests/conftest.py
+import os
+import random
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+from graph_core import CompiledGraph
+from map_data import MapIndex
+from policy_cache import PolicyCache
+from state_store import CityData
+from synthetic_graphs import make_grid_graph, subdivide_edges
+from utils import generate_random_traffic
+
+def make_grid_city(rows, cols, seed=0, segments=1):
+    """
+    Return a CityData for a synthetic grid with seeded traffic, optionally with every edge
+    split into `segments` pieces by degree-2 nodes.
+    """
+    graph = subdivide_edges(make_grid_graph(rows, cols), segments)
+    traffic = generate_random_traffic(graph, seed=seed)
+    compiled = CompiledGraph.from_networkx(graph, traffic)
+    return CityData(f"grid {rows}x{cols}", f"grid {rows}x{cols}", graph, traffic, compiled,
+                    map_index=MapIndex(graph, compiled))
+
+@pytest.fixture
+def app_config(monkeypatch):
+    """
+    Return a setter for main.app.config entries that are restored after the test.
+    """
+    def set_config(**values):
+        for key, value in values.items():
+            monkeypatch.setitem(main.app.config, key, value)
+    return set_config
+
+@pytest.fixture
+def policy_cache(tmp_path, monkeypatch):
+    """
+    Give main an empty policy cache in a temporary directory.
+    """
+    cache = PolicyCache(cache_dir=str(tmp_path / "policy_cache"))
+    monkeypatch.setattr(main, "policy_cache", cache)
+    return cache
+
+@pytest.fixture(autouse=True)
+def seeded():
+    """
+    Seed the random generators training draws from.
+    """
+    random.seed(0)
+    np.random.seed(0)
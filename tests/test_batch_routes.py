@@ -0,0 +1,44 @@
+# tests/test_batch_routes.py
+import pytest
+
+from batch_routes import route_batch
+from multi_goal import MultiGoalAgent
+
+from conftest import make_grid_city
+
+AGENT_PARAMS = dict(alpha=0.1, gamma=0.9, epsilon=0.5, epsilon_decay=0.995, min_epsilon=0.05, mask_actions=True)
+
+def test_multi_goal_agent_refuses_an_oversized_q_store():
+    compiled = make_grid_city(10, 10).compiled_graph
+    one_goal = MultiGoalAgent.table_bytes(compiled, 1)
+    assert MultiGoalAgent(compiled, [0], max_bytes=one_goal // 2).Q.nbytes == one_goal
+    with pytest.raises(ValueError):
+        MultiGoalAgent(compiled, [0, 99, 55], max_bytes=2 * one_goal)
+
+def test_multi_goal_batch_splits_goals_to_fit_the_memory_limit(monkeypatch):
+    city = make_grid_city(8, 8)
+    pairs = [(0, 63), (7, 56), (56, 7), (63, 0), (9, 63)]
+    sizes = []
+    init = MultiGoalAgent.__init__
+
+    def record_size(self, compiled_graph, goal_nodes, **kwargs):
+        init(self, compiled_graph, goal_nodes, **kwargs)
+        sizes.append(self.Q.nbytes)
+    monkeypatch.setattr(MultiGoalAgent, "__init__", record_size)
+
+    one_goal = MultiGoalAgent.table_bytes(city.compiled_graph, 1)
+    routes, episodes = route_batch(city.graph, city.compiled_graph, city.traffic, pairs, seed=0,
+                                   multi_goal=True, multi_goal_episodes=2000, multi_goal_max_bytes=2 * one_goal,
+                                   agent_params=AGENT_PARAMS, contract=False)
+    assert sizes == [2 * one_goal, 2 * one_goal]
+    assert episodes >= 4000
+    assert set(routes) == set(pairs)
+    assert all(path[0] == start and path[-1] == end for (start, end), path in routes.items())
+
+def test_parallel_batch_matches_serial_value_iteration():
+    city = make_grid_city(6, 6)
+    pairs = [(0, 35), (5, 35), (30, 0), (35, 0), (7, 20)]
+    options = dict(agent_params=dict(AGENT_PARAMS, gamma=1.0, q_init="euclidean"), solver="value_iteration")
+    serial, _ = route_batch(city.graph, city.compiled_graph, city.traffic, pairs, **options)
+    parallel, _ = route_batch(city.graph, city.compiled_graph, city.traffic, pairs, num_workers=2, seed=0, **options)
+    assert parallel == serial
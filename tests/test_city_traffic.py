@@ -0,0 +1,65 @@
+# tests/test_city_traffic.py
+import pytest
+
+import main
+from graph_cache import GraphCache
+from state_store import CityStore
+from synthetic_graphs import make_grid_graph
+
+PLACE = "Gridville, CA, USA"
+
+@pytest.fixture
+def city_loader(tmp_path, monkeypatch):
+    """
+    Load a synthetic grid for every place, with an empty graph cache and city store.
+    """
+    monkeypatch.setattr(main, "graph_cache", GraphCache(cache_dir=str(tmp_path / "graph_cache")))
+    monkeypatch.setattr(main, "load_place_graph", lambda place, network_type, cache: make_grid_graph(8, 8))
+    monkeypatch.setattr(main, "city_store", CityStore())
+
+def evict_all(monkeypatch):
+    """
+    Replace the city store with an empty one, as if every city had been evicted.
+    """
+    monkeypatch.setattr(main, "city_store", CityStore())
+
+def test_reloaded_city_has_the_same_traffic(city_loader, monkeypatch):
+    first = main.city_store.get_or_load(PLACE, main.load_city)
+    evict_all(monkeypatch)
+    second = main.city_store.get_or_load(PLACE, main.load_city)
+    assert second is not first
+    assert dict(second.traffic) == dict(first.traffic)
+
+def test_traffic_updates_survive_eviction(city_loader, monkeypatch):
+    client = main.app.test_client()
+    client.post('/initialize', data={"city": "Gridville", "state": "CA", "country": "USA"})
+    old_cost = main.city_store.get_or_load(PLACE, main.load_city).traffic[(0, 1)]
+    response = client.post('/traffic', json={"changes": [{"u": 0, "v": 1, "cost": old_cost + 50}]})
+    assert response.status_code == 200
+
+    evict_all(monkeypatch)
+    city = main.city_store.get_or_load(PLACE, main.load_city)
+    assert city.traffic[(0, 1)] == city.traffic[(1, 0)] == old_cost + 50
+    assert city.compiled_graph.edge_cost(city.compiled_graph.node_index[0],
+                                         city.compiled_graph.node_index[1]) == old_cost + 50
+
+def test_session_state_survives_a_process_restart(city_loader, monkeypatch):
+    client = main.app.test_client()
+    client.post('/initialize', data={"city": "Gridville", "state": "CA", "country": "USA"})
+    # A fresh city store stands in for another worker process, or this one after a restart.
+    evict_all(monkeypatch)
+    with client.session_transaction() as session:
+        assert session["city_key"] == main.city_store.get_or_load(PLACE, main.load_city).key
+        assert session["place"] == PLACE
+    response = client.post('/traffic', json={"changes": [{"u": 0, "v": 1, "cost": 3}]})
+    assert response.status_code == 200
+
+def test_graph_cache_eviction_counts_orphaned_traffic(tmp_path):
+    cache = GraphCache(cache_dir=str(tmp_path / "graph_cache"), max_bytes=10 ** 9)
+    graph = make_grid_graph(8, 8)
+    cache.store(PLACE, graph)
+    cache.store_traffic("Elsewhere, CA, USA", main.generate_place_traffic(graph, "elsewhere"))
+    cache.max_bytes = 0
+    cache.store("Gridville, NV, USA", graph)
+    assert cache.load(PLACE) is None
+    assert cache.load_traffic("Elsewhere, CA, USA", graph) is None
@@ -0,0 +1,50 @@
+# tests/test_contraction.py
+import networkx as nx
+import pytest
+
+import main
+from contraction import contract_chains
+from graph_core import CompiledGraph
+from jobs import RouteNotFound, TrainingJob
+from map_data import MapIndex
+from state_store import CityData
+from utils import generate_random_traffic
+
+from conftest import make_grid_city
+
+def test_chain_exits_lead_to_both_ends_of_the_chain():
+    city = make_grid_city(4, 4, segments=4)
+    compiled = city.compiled_graph
+    contracted = contract_chains(compiled, [compiled.node_index[0]])
+    # Intersections 5 and 6 are joined by a chain of three degree-2 nodes.
+    chain = nx.shortest_path(city.graph, 5, 6)[1:-1]
+    exits = contracted.chain_exits(chain[1])
+    assert sorted(node for node, _ in exits) == [5, 6]
+    for node, lead_in in exits:
+        assert lead_in[0] == chain[1] and lead_in[-1] == node
+        assert all(city.graph.has_edge(u, v) for u, v in zip(lead_in, lead_in[1:]))
+    assert contracted.chain_exits(5) == [(5, [5])]
+
+def ring_city():
+    """
+    Return a 4x4 grid city with a separate ring of four degree-2 nodes (100-103).
+    """
+    city = make_grid_city(4, 4)
+    graph = city.graph.copy()
+    graph.add_nodes_from((node, {'x': 1.0, 'y': 1.0}) for node in range(100, 104))
+    graph.add_edges_from([(100, 101), (101, 102), (102, 103), (103, 100)])
+    traffic = generate_random_traffic(graph, seed=0)
+    compiled = CompiledGraph.from_networkx(graph, traffic)
+    return CityData(city.key, city.place, graph, traffic, compiled, map_index=MapIndex(graph, compiled))
+
+def test_node_on_a_dropped_ring_has_no_exits():
+    compiled = ring_city().compiled_graph
+    contracted = contract_chains(compiled, [compiled.node_index[15]])
+    assert 100 not in contracted.compiled.node_index
+    assert contracted.chain_exits(100) == []
+
+def test_job_starting_on_a_dropped_ring_fails(policy_cache, app_config):
+    app_config(GRAPH_CONTRACTION=True, TRAINING_SOLVER='value_iteration')
+    job = TrainingJob("ring", 100, 15, 1)
+    with pytest.raises(RouteNotFound):
+        main.run_training_job(job, ring_city())
@@ -0,0 +1,22 @@
+# tests/test_http_cache.py
+from flask import Flask
+
+from http_cache import ResponseCache, make_etag
+
+app = Flask(__name__)
+
+def respond(cache, headers):
+    with app.test_request_context(headers=headers):
+        return cache.respond(make_etag("body"), lambda: b"x" * 4096, mimetype="text/plain")
+
+def test_encodings_share_a_weak_etag_and_revalidate():
+    cache = ResponseCache()
+    identity = respond(cache, {})
+    gzipped = respond(cache, {"Accept-Encoding": "gzip"})
+    assert gzipped.headers["Content-Encoding"] == "gzip"
+    assert identity.get_data() != gzipped.get_data()
+    assert identity.headers["ETag"] == gzipped.headers["ETag"] == f'W/"{make_etag("body")}"'
+    assert "Accept-Encoding" in gzipped.vary
+
+    revalidated = respond(cache, {"If-None-Match": gzipped.headers["ETag"], "Accept-Encoding": "gzip"})
+    assert revalidated.status_code == 304
@@ -0,0 +1,38 @@
+# tests/test_multi_goal.py
+import numpy as np
+
+from environment import VecCityTrafficEnv
+from multi_goal import MultiGoalAgent
+
+from conftest import make_grid_city
+
+def walk(compiled, start, goal, nodes):
+    """
+    Walk a single-episode VecCityTrafficEnv along a sequence of nodes.
+
+    Returns:
+        Arrays of (states, rewards, next_states, step_rewards), one entry per step.
+    """
+    env = VecCityTrafficEnv(compiled, start, goal, 1, seed=0)
+    states, _ = env.reset()
+    steps = []
+    for node in nodes:
+        action = compiled.neighbor_indices(int(states[0])).index(compiled.node_index[node])
+        next_states, rewards, _, _, info = env.step([action])
+        steps.append((states[0], rewards[0], info["final_observation"][0], info["step_rewards"][0]))
+        states = next_states
+    return [np.array(column) for column in zip(*steps)]
+
+def test_relabeled_rewards_match_the_environment_of_each_goal():
+    # On the line 0 - 1 - 2, going 1 -> 0 -> 1 revisits node 1, which is also the goal of the
+    # walk: the environment pays the goal reward, but toward node 2 the step is penalized.
+    compiled = make_grid_city(1, 3).compiled_graph
+    agent = MultiGoalAgent(compiled, [1, 2])
+    _, rewards, next_states, step_rewards = walk(compiled, 1, 1, [0, 1])
+    goal_rewards, arrived = agent.goal_rewards(rewards, next_states, step_rewards)
+
+    for position, goal in enumerate(agent.goal_nodes):
+        _, expected, _, _ = walk(compiled, 1, goal, [0, 1])
+        assert goal_rewards[position].tolist() == expected.tolist()
+    assert arrived.tolist() == [[False, True], [False, False]]
+    assert goal_rewards[1, 1] == -compiled.edge_cost(0, 1) - 2
@@ -0,0 +1,28 @@
+# tests/test_q_store.py
+import numpy as np
+import pytest
+
+from q_store import CompactQTable
+
+@pytest.mark.parametrize("offsets, values, max_expected, argmax_expected", [
+    # Zero-degree state at the end, after the state it used to cut short.
+    ([0, 2, 2], [1, 5], [5, 0], [1, 0]),
+    # At the start.
+    ([0, 0, 3], [2, 7, 7], [0, 7], [0, 1]),
+    # In the middle.
+    ([0, 2, 2, 4], [4, -1, 3, 9], [4, 0, 9], [0, 0, 1]),
+])
+def test_batch_lookups_skip_states_without_actions(offsets, values, max_expected, argmax_expected):
+    table = CompactQTable(offsets, dtype=np.float64, values=values)
+    states = np.arange(len(offsets) - 1)
+    assert table.max_batch(states).tolist() == max_expected
+    assert table.argmax_batch(states).tolist() == argmax_expected
+    assert [table.max(s) for s in states] == max_expected
+    assert [table.argmax(s) for s in states] == argmax_expected
+
+def test_batch_lookups_repeat_and_reorder_states():
+    table = CompactQTable([0, 2, 2, 5], dtype=np.float64, values=[1, 5, -3, 8, 8])
+    states = [2, 1, 0, 2, 1]
+    assert table.max_batch(states).tolist() == [8, 0, 5, 8, 0]
+    assert table.argmax_batch(states).tolist() == [1, 0, 1, 1, 0]
+    assert table.max_batch([1, 1]).tolist() == [0, 0]
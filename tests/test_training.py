@@ -0,0 +1,20 @@
+# tests/test_training.py
+from agent import QLearningAgent
+from environment import CityTrafficEnv
+from training import train_agent_parallel, training_pool
+
+from conftest import make_grid_city
+
+def test_parallel_training_reuses_one_pool():
+    city = make_grid_city(6, 6)
+    env = CityTrafficEnv(city.graph, 0, 35, city.traffic, max_steps=100, compiled_graph=city.compiled_graph)
+    agent = QLearningAgent(env, mask_actions=True)
+    pool = training_pool(2)
+    assert train_agent_parallel(env, agent, 40, num_workers=2, sync_every=10, seed=0) == 40
+    assert train_agent_parallel(env, agent, 40, num_workers=2, sync_every=10, seed=1) == 40
+    assert training_pool(2) is pool
+    # Asking for more workers must not replace a pool other jobs may be using.
+    assert training_pool(4) is pool
+    assert train_agent_parallel(env, agent, 40, num_workers=4, sync_every=10, seed=2) == 40
+    assert env.total_steps > 0
+    assert agent.Q.any()
@@ -0,0 +1,78 @@
+# tests/test_training_jobs.py
+import networkx as nx
+import pytest
+
+import main
+from agent import QLearningAgent
+from environment import CityTrafficEnv
+from jobs import RouteNotFound, TrainingJob
+from utils import get_shortest_path, path_cost
+
+from conftest import make_grid_city
+
+def run_job(city, start, end):
+    """
+    Run a training job synchronously and return it.
+    """
+    job = TrainingJob(f"{start}-{end}", start, end, main.app.config['TRAINING_MAX_EPISODES'])
+    main.run_training_job(job, city)
+    return job
+
+def optimum(city, start, end):
+    """
+    Return the cheapest route cost between two nodes.
+    """
+    return nx.dijkstra_path_length(city.graph, start, end, weight=lambda u, v, d: city.traffic[(u, v)])
+
+def test_cache_hit_from_another_start_keeps_training(policy_cache, app_config):
+    app_config(GRAPH_CONTRACTION=False, TRAINING_SOLVER='q_learning', TRAINING_NUM_ENVS=1)
+    city = make_grid_city(30, 30)
+    goal = 465
+    first = run_job(city, 100, goal)
+    assert first.policy_cache == "miss"
+
+    # The table trained from the first start does not lead to the goal from this one.
+    cached, _ = policy_cache.get(city.compiled_graph.topology_hash(), goal, city.compiled_graph.cost_hash(),
+                                 dict(main.agent_params(), max_steps=300, solver='q_learning'))
+    env = CityTrafficEnv(city.graph, 899, goal, city.traffic, max_steps=300, compiled_graph=city.compiled_graph)
+    agent = QLearningAgent(env, **main.agent_params())
+    agent.use_q_values(cached)
+    assert get_shortest_path(agent, env)[-1] != goal
+
+    second = run_job(city, 899, goal)
+    assert second.policy_cache == "warm_start"
+    assert second.episodes_done > 0
+    assert second.path[0] == 899 and second.path[-1] == goal
+    assert second.best_cost >= optimum(city, 899, goal)
+
+def test_cache_hit_that_reaches_the_goal_skips_training(policy_cache, app_config):
+    app_config(GRAPH_CONTRACTION=False, TRAINING_SOLVER='q_learning', TRAINING_NUM_ENVS=1)
+    city = make_grid_city(10, 10)
+    run_job(city, 0, 55)
+    job = run_job(city, 99, 55)
+    assert job.policy_cache == "hit"
+    assert job.episodes_done == 0
+    assert job.path[-1] == 55
+
+def test_job_without_a_route_to_the_goal_fails(policy_cache, app_config):
+    app_config(GRAPH_CONTRACTION=False, TRAINING_SOLVER='q_learning', TRAINING_MAX_EPISODES=1,
+               TRAINING_NUM_ENVS=1)
+    city = make_grid_city(30, 30)
+    job = TrainingJob("untrained", 0, 899, 1)
+    with pytest.raises(RouteNotFound):
+        main.run_training_job(job, city)
+    assert job.best_cost is None
+
+def test_contracted_cache_key_does_not_depend_on_the_start(policy_cache, app_config):
+    app_config(GRAPH_CONTRACTION=True, TRAINING_SOLVER='q_learning', TRAINING_NUM_ENVS=1)
+    city = make_grid_city(10, 10, segments=3)
+    goal = 55
+    # Nodes added by the subdivision lie inside degree-2 chains.
+    inside_chains = [node for node in city.graph if node >= 100]
+    jobs = [run_job(city, start, goal) for start in (0, inside_chains[0], inside_chains[-1])]
+    assert jobs[0].policy_cache == "miss"
+    assert all(job.policy_cache in ("hit", "warm_start") for job in jobs[1:])
+    for job in jobs:
+        assert job.path[0] == job.start and job.path[-1] == goal
+        assert all(city.graph.has_edge(u, v) for u, v in zip(job.path, job.path[1:]))
+        assert job.best_cost == path_cost(job.path, city.traffic)
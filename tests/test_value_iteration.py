@@ -0,0 +1,45 @@
+# tests/test_value_iteration.py
+import networkx as nx
+
+import main
+from agent import QLearningAgent
+from environment import CityTrafficEnv
+from graph_core import CompiledGraph
+from utils import generate_random_traffic, get_shortest_path, path_cost
+
+from conftest import make_grid_city
+
+def dijkstra_cost(graph, traffic, start, goal):
+    """
+    Return the cheapest route cost between two nodes.
+    """
+    return nx.dijkstra_path_length(graph, start, goal, weight=lambda u, v, d: traffic[(u, v)])
+
+def test_value_iteration_routes_cost_the_dijkstra_optimum():
+    city = make_grid_city(15, 15)
+    for start, goal in [(0, 224), (14, 210), (3, 170), (200, 22), (112, 0)]:
+        env = CityTrafficEnv(city.graph, start, goal, city.traffic, max_steps=300,
+                             compiled_graph=city.compiled_graph)
+        agent = QLearningAgent(env, gamma=1.0, mask_actions=True)
+        agent.solve_value_iteration()
+        path = get_shortest_path(agent, env)
+        assert path[-1] == goal
+        assert path_cost(path, city.traffic) == dijkstra_cost(city.graph, city.traffic, start, goal)
+
+def test_value_iteration_converges_with_unreachable_states():
+    graph = nx.disjoint_union(make_grid_city(5, 5).graph, make_grid_city(3, 3).graph)
+    traffic = generate_random_traffic(graph, seed=0)
+    env = CityTrafficEnv(graph, 0, 24, traffic, max_steps=300,
+                         compiled_graph=CompiledGraph.from_networkx(graph, traffic))
+    agent = QLearningAgent(env, gamma=1.0, mask_actions=True)
+    assert agent.solve_value_iteration(max_iterations=1000) < 1000
+    path = get_shortest_path(agent, env)
+    assert path_cost(path, traffic) == dijkstra_cost(graph, traffic, 0, 24)
+
+def test_value_iteration_jobs_use_their_own_discount(policy_cache, app_config):
+    app_config(TRAINING_SOLVER='value_iteration', GRAPH_CONTRACTION=False)
+    assert main.agent_params()["gamma"] == main.app.config['VALUE_ITERATION_GAMMA'] == 1.0
+    city = make_grid_city(15, 15)
+    agent, env, _ = main.train_route(city.graph, city.compiled_graph, city.traffic, 0, 224)
+    path = get_shortest_path(agent, env)
+    assert path_cost(path, city.traffic) == dijkstra_cost(city.graph, city.traffic, 0, 224)
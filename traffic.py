@@ -0,0 +1,178 @@
+# traffic.py
+from collections.abc import Mapping
+import random
+import numpy as np
+
+class TrafficStore(Mapping):
+    """
+    Traffic costs of an undirected graph stored in a NumPy array indexed by edge ID.
+
+    Edge IDs follow `graph.edges()` order and node indices follow `graph.nodes()` order, as in
+    CompiledGraph. A CSR adjacency (`offsets`, `neighbors`) with the edge ID of every directed
+    slot (`slot_edges`) gives constant-time lookup by node-index pair, since a node only has a
+    handful of neighbors, and lets CompiledGraph take its costs without a per-edge loop.
+
+    The store is also a read-only Mapping from node-ID tuples to costs in both directions, so
+    code written for the old `{(u, v): cost, (v, u): cost}` dictionary keeps working.
+    """
+    def __init__(self, nodes, edge_u, edge_v, costs, offsets, neighbors, slot_edges):
+        """
+        Initialize from prebuilt arrays. Use `from_graph`, `from_dict` or `random` instead.
+
+        Args:
+            nodes: Sequence of node IDs; position is the node index.
+            edge_u, edge_v: Node indices of each edge's endpoints.
+            costs: Cost of each edge.
+            offsets: CSR row offsets (length num_nodes + 1).
+            neighbors: CSR neighbor node indices, in `graph.neighbors(node)` order.
+            slot_edges: Edge ID of each CSR slot.
+        """
+        self.nodes = list(nodes)
+        self.node_index = {node: i for i, node in enumerate(self.nodes)}
+        self.edge_u = np.asarray(edge_u, dtype=np.int64)
+        self.edge_v = np.asarray(edge_v, dtype=np.int64)
+        self.costs = np.asarray(costs)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.neighbors = np.asarray(neighbors, dtype=np.int64)
+        self.slot_edges = np.asarray(slot_edges, dtype=np.int64)
+        self.num_edges = len(self.edge_u)
+
+    @classmethod
+    def from_graph(cls, graph, costs=None, default_cost=1.0):
+        """
+        Build the edge index of a NetworkX graph.
+
+        Args:
+            graph: An undirected NetworkX graph.
+            costs: Optional array of per-edge costs in `graph.edges()` order.
+            default_cost: Cost of every edge when `costs` is omitted.
+
+        Returns:
+            A TrafficStore.
+        """
+        nodes = list(graph.nodes())
+        node_index = {node: i for i, node in enumerate(nodes)}
+        edges = np.array([(node_index[u], node_index[v]) for u, v in graph.edges()], dtype=np.int64).reshape(-1, 2)
+
+        offsets = np.zeros(len(nodes) + 1, dtype=np.int64)
+        neighbors = []
+        for i, u in enumerate(nodes):
+            neighbors.extend(node_index[v] for v in graph.neighbors(u))
+            offsets[i + 1] = len(neighbors)
+        neighbors = np.array(neighbors, dtype=np.int64)
+
+        # Match each directed slot to its undirected edge through a sorted (min, max) key.
+        num_nodes = max(len(nodes), 1)
+        edge_keys = np.minimum(edges[:, 0], edges[:, 1]) * num_nodes + np.maximum(edges[:, 0], edges[:, 1])
+        order = np.argsort(edge_keys, kind="stable")
+        sources = np.repeat(np.arange(len(nodes)), np.diff(offsets))
+        slot_keys = np.minimum(sources, neighbors) * num_nodes + np.maximum(sources, neighbors)
+        slot_edges = order[np.searchsorted(edge_keys[order], slot_keys)] if len(order) else slot_keys
+
+        if costs is None:
+            costs = np.full(len(edges), default_cost, dtype=np.float64)
+        return cls(nodes, edges[:, 0], edges[:, 1], costs, offsets, neighbors, slot_edges)
+
+    @classmethod
+    def from_dict(cls, graph, traffic_dict, default_cost=1.0):
+        """
+        Convert a `{(u, v): cost}` dictionary (either direction) into a TrafficStore.
+        """
+        costs = [traffic_dict.get((u, v), traffic_dict.get((v, u), default_cost)) for u, v in graph.edges()]
+        return cls.from_graph(graph, costs=np.array(costs))
+
+    @classmethod
+    def random(cls, graph, low=1, high=10, seed=None):
+        """
+        Build a store with uniformly random integer costs in [low, high].
+
+        Args:
+            graph: An undirected NetworkX graph.
+            low: Minimum traffic cost.
+            high: Maximum traffic cost.
+            seed: Seed for NumPy's generator; by default one is drawn from the `random`
+                module, so `random.seed()` still makes the result reproducible.
+        """
+        store = cls.from_graph(graph)
+        rng = np.random.default_rng(random.getrandbits(64) if seed is None else seed)
+        store.costs = rng.integers(low, high + 1, size=store.num_edges)
+        return store
+
+    def with_costs(self, costs):
+        """
+        Return a store sharing this one's graph structure with different per-edge costs.
+        """
+        store = TrafficStore.__new__(TrafficStore)
+        store.__dict__.update(self.__dict__)
+        store.costs = np.asarray(costs)
+        return store
+
+    def with_updated_costs(self, changes):
+        """
+        Return a store with some edge costs changed.
+
+        Args:
+            changes: A dictionary mapping (u, v) node-ID tuples (either direction) to new costs.
+
+        Raises:
+            KeyError: If a pair is not an edge of the graph.
+        """
+        costs = self.costs.astype(np.result_type(self.costs, *changes.values()))
+        for (u, v), cost in changes.items():
+            if u not in self.node_index or v not in self.node_index:
+                raise KeyError((u, v))
+            edge = self.edge_id(self.node_index[u], self.node_index[v])
+            if edge < 0:
+                raise KeyError((u, v))
+            costs[edge] = cost
+        return self.with_costs(costs)
+
+    @property
+    def nbytes(self):
+        """
+        Memory used by the arrays.
+        """
+        return sum(a.nbytes for a in (self.edge_u, self.edge_v, self.costs, self.offsets,
+                                      self.neighbors, self.slot_edges))
+
+    def slot_costs(self):
+        """
+        Return the cost of every CSR slot, aligned with `neighbors`.
+        """
+        return self.costs[self.slot_edges]
+
+    def edge_id(self, u_index, v_index):
+        """
+        Return the ID of the edge between two node indices, or -1 if they are not adjacent.
+        """
+        start, end = self.offsets[u_index], self.offsets[u_index + 1]
+        row = self.neighbors[start:end].tolist()
+        if v_index in row:
+            return int(self.slot_edges[start + row.index(v_index)])
+        return -1
+
+    def cost(self, u_index, v_index, default=None):
+        """
+        Return the cost of the edge between two node indices, or default if there is none.
+        """
+        edge = self.edge_id(u_index, v_index)
+        return default if edge < 0 else self.costs[edge].item()
+
+    def __getitem__(self, key):
+        u, v = key
+        if u not in self.node_index or v not in self.node_index:
+            raise KeyError(key)
+        cost = self.cost(self.node_index[u], self.node_index[v])
+        if cost is None:
+            raise KeyError(key)
+        return cost
+
+    def __iter__(self):
+        nodes = self.nodes
+        for u, v in zip(self.edge_u.tolist(), self.edge_v.tolist()):
+            yield nodes[u], nodes[v]
+            if u != v:
+                yield nodes[v], nodes[u]
+
+    def __len__(self):
+        return 2 * self.num_edges - int(np.count_nonzero(self.edge_u == self.edge_v))
@@ -0,0 +1,336 @@
+# training.py
+import multiprocessing
+import random
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from agent import QLearningAgent
+from environment import CityTrafficEnv, VecCityTrafficEnv
+from graph_core import CompiledGraph
+from q_store import merge_q_tables
+from replay import replay_updates
+from utils import get_shortest_path, path_cost
+
+class ConvergenceMonitor:
+    """
+    Early-stopping policy that watches the greedy route while an agent trains.
+
+    Every `check_every` episodes the monitor extracts the greedy route with
+    `get_shortest_path`, its traffic cost, and the largest change since the previous check
+    of the greedy Q-values along that route (rarely visited state-actions elsewhere keep
+    changing under exploration and would never settle). Training is considered converged
+    once the route reaches the goal and route, cost and Q-values have stayed stable for
+    `patience` consecutive checks.
+    """
+    def __init__(self, env, check_every=50, patience=4, tolerance=0.5, cost_tolerance=0.0, min_episodes=100):
+        """
+        Initialize the monitor.
+
+        Args:
+            env: A CityTrafficEnv used to extract greedy routes.
+            check_every: Episodes between convergence checks.
+            patience: Consecutive stable checks required to stop, or None to only track progress.
+            tolerance: Largest allowed max |ΔQ| between checks.
+            cost_tolerance: Largest allowed change in route cost between checks.
+            min_episodes: Episodes to run before stopping is allowed.
+        """
+        self.env = env
+        self._node_index = {node: i for i, node in enumerate(env.nodes)}
+        self.check_every = check_every
+        self.patience = patience
+        self.tolerance = tolerance
+        self.cost_tolerance = cost_tolerance
+        self.min_episodes = min_episodes
+
+        self.next_check = check_every
+        self.stable_checks = 0
+        self.best_path = None
+        self.best_cost = None
+        self.history = []
+        self._last_path = None
+        self._last_cost = None
+        self._last_values = None
+
+    def update(self, agent, episodes_done):
+        """
+        Record training progress and decide whether to stop.
+
+        Args:
+            agent: The agent being trained.
+            episodes_done: Total episodes finished so far.
+
+        Returns:
+            True if training has converged and should stop.
+        """
+        if episodes_done < self.next_check:
+            return False
+        self.next_check = episodes_done + self.check_every
+
+        path = get_shortest_path(agent, self.env)
+        reached = path[-1] == self.env.goal_node
+        cost = path_cost(path, self.env.traffic_dict)
+        states = np.array([self._node_index[node] for node in path])
+        values = agent.q_values(states, agent.greedy_actions(states))
+        if path != self._last_path:
+            max_delta = np.inf
+        else:
+            max_delta = float(np.max(np.abs(values - self._last_values)))
+        self.history.append({"episode": episodes_done, "reached_goal": reached, "cost": cost,
+                             "max_q_delta": max_delta})
+        if reached and (self.best_cost is None or cost < self.best_cost):
+            self.best_path, self.best_cost = path, cost
+
+        stable = (
+            reached
+            and path == self._last_path
+            and abs(cost - self._last_cost) <= self.cost_tolerance
+            and max_delta <= self.tolerance
+        )
+        self.stable_checks = self.stable_checks + 1 if stable else 0
+        self._last_path, self._last_cost, self._last_values = path, cost, values
+        if self.patience is None:
+            return False
+        return self.stable_checks >= self.patience and episodes_done >= self.min_episodes
+
+class MultiRouteMonitor:
+    """
+    Early-stopping policy for an agent trained toward one goal from several starts.
+
+    Wraps one ConvergenceMonitor per start and stops once every one of them has converged at
+    some check. With many routes, waiting until all are stable at the same check rarely
+    happens while exploration keeps nudging one of them.
+    """
+    def __init__(self, monitors):
+        """
+        Args:
+            monitors: ConvergenceMonitors whose environments differ only in their start node.
+        """
+        self.monitors = list(monitors)
+        self.converged = [False] * len(self.monitors)
+
+    def update(self, agent, episodes_done):
+        """
+        Update the monitors of routes that have not converged yet and return True once all
+        of them have.
+        """
+        for i, monitor in enumerate(self.monitors):
+            if not self.converged[i]:
+                self.converged[i] = monitor.update(agent, episodes_done)
+        return all(self.converged)
+
+def train_agent(env, agent, episodes, monitor=None):
+    """
+    Train a Q-learning agent one episode at a time.
+
+    Args:
+        env: A CityTrafficEnv instance.
+        agent: A QLearningAgent instance built for env.
+        episodes: Number of episodes to run (hard cap when a monitor is given).
+        monitor: Optional ConvergenceMonitor that can stop training early.
+
+    Returns:
+        The number of episodes run.
+    """
+    for ep in range(episodes):
+        state, _ = env.reset()
+        done = False
+        while not done:
+            # Agent chooses an action.
+            action = agent.choose_action(state)
+            # Environment returns next state and reward.
+            next_state, reward, done, _, _ = env.step(action)
+            # Update Q-table based on experience.
+            agent.update(state, action, reward, next_state, done)
+            state = next_state
+        # Decay exploration rate after each episode.
+        agent.update_exploration()
+        if monitor is not None and monitor.update(agent, ep + 1):
+            return ep + 1
+    return episodes
+
+def train_agent_vectorized(vec_env, agent, episodes, monitor=None, replay=None, replay_ratio=1.0,
+                           replay_batch_size=64):
+    """
+    Train a Q-learning agent on a VecCityTrafficEnv, running many episodes per step.
+
+    Episodes that are still running once training stops are discarded.
+
+    Args:
+        vec_env: A VecCityTrafficEnv instance.
+        agent: A QLearningAgent whose Q-table matches vec_env's spaces.
+        episodes: Number of episodes to finish (hard cap when a monitor is given).
+        monitor: Optional ConvergenceMonitor that can stop training early.
+        replay: Optional ReplayBuffer. Every transition is stored in it after its online
+            update, and `replay_ratio` stored transitions per new one are replayed in
+            minibatches of `replay_batch_size`.
+        replay_ratio: Replayed transitions per environment transition.
+        replay_batch_size: Transitions per replay minibatch.
+
+    Returns:
+        The number of episodes finished.
+    """
+    states, _ = vec_env.reset()
+    finished = 0
+    owed = 0.0
+    while finished < episodes:
+        # Agent chooses one action per running episode.
+        actions = agent.choose_actions(states)
+        # Environment advances every episode and resets the finished ones.
+        next_states, rewards, dones, _, info = vec_env.step(actions)
+        # Update Q-table from the whole batch of transitions.
+        agent.update_batch(states, actions, rewards, info["final_observation"], dones)
+        if replay is not None:
+            replay.add_batch(states, actions, rewards, info["final_observation"], dones)
+            owed = replay_updates(agent, replay, len(states), replay_ratio=replay_ratio,
+                                  batch_size=replay_batch_size, owed=owed)
+        states = next_states
+        # Decay exploration rate once per finished episode.
+        num_done = int(np.count_nonzero(dones))
+        if num_done:
+            agent.update_exploration(num_done)
+            finished += num_done
+            if monitor is not None and monitor.update(agent, finished):
+                break
+    return finished
+
+# Process pool shared by every train_agent_parallel call, created on first use and never
+# replaced, since other job threads may be submitting to it.
+_pool = None
+_pool_workers = None
+_pool_lock = threading.Lock()
+
+def configure_training_pool(num_workers):
+    """
+    Set the number of workers of the shared training pool, e.g. to the largest worker count
+    any caller uses. Has no effect once the pool has been created.
+    """
+    global _pool_workers
+    with _pool_lock:
+        if _pool is None:
+            _pool_workers = num_workers
+
+def training_pool(num_workers):
+    """
+    Return the process pool used for parallel training.
+
+    The pool is created on first use with the configured number of workers (see
+    `configure_training_pool`), or `num_workers` if none was configured, and lives for the
+    whole process, so its start-up cost is paid once rather than per training run. It is
+    never shut down or resized: tasks beyond its size wait for a free worker. Workers are
+    started with the "spawn" method: training runs on job threads, and forking a
+    multi-threaded process can copy locks held by other threads.
+    """
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None:
+            _pool_workers = _pool_workers or num_workers
+            _pool = ProcessPoolExecutor(max_workers=_pool_workers, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+# Per-process training state for train_agent_parallel: the environment and agent of the
+# most recent run, rebuilt when a task from another run arrives.
+_worker_state = {}
+
+def _worker_agent(run_id, graph_arrays, start, goal, max_steps, agent_params):
+    """
+    Return the worker's environment and agent for a training run, building them on first use.
+    """
+    if _worker_state.get('run_id') != run_id:
+        compiled = CompiledGraph(*graph_arrays)
+        env = CityTrafficEnv(None, start, goal, None, max_steps=max_steps, compiled_graph=compiled)
+        _worker_state.update(run_id=run_id, env=env, agent=QLearningAgent(env, **agent_params))
+    return _worker_state['env'], _worker_state['agent']
+
+def _train_chunk(run, Q, epsilon, episodes, seed):
+    """
+    Train the worker's agent for a run from a given Q-table for a number of episodes.
+
+    Args:
+        run: Tuple (run_id, graph_arrays, start, goal, max_steps, agent_params, num_envs).
+
+    Returns:
+        A tuple of (Q, epsilon, env_steps) after training.
+    """
+    *env_args, num_envs = run
+    env, agent = _worker_agent(*env_args)
+    random.seed(seed)
+    np.random.seed(seed)
+    agent.Q = Q
+    agent.epsilon = epsilon
+
+    if num_envs > 1:
+        vec_env = VecCityTrafficEnv(env.compiled_graph, env.start_node, env.goal_node, num_envs,
+                                    max_steps=env.max_steps, seed=seed)
+        train_agent_vectorized(vec_env, agent, episodes)
+        steps = vec_env.total_steps
+    else:
+        steps_before = env.total_steps
+        train_agent(env, agent, episodes)
+        steps = env.total_steps - steps_before
+    return agent.Q, agent.epsilon, steps
+
+def train_agent_parallel(env, agent, episodes, num_workers=4, sync_every=100, num_envs=1, seed=None,
+                         monitor=None):
+    """
+    Train a Q-learning agent with several worker processes and periodic Q-table averaging.
+
+    Training runs in rounds. In each round every worker starts from the shared Q-table and
+    its own seed, trains `sync_every` episodes, and the resulting tables are averaged.
+    Workers come from the process-wide `training_pool` and step on the compiled graph.
+
+    Only worth it when rounds are long compared with shipping the Q-table to the workers and
+    back: large graphs, long episodes and a large `sync_every`. On small graphs the serial or
+    vectorized loop is faster, and averaged tables can give slightly costlier routes (see
+    `python benchmark.py parallel`).
+
+    Args:
+        env: A CityTrafficEnv instance (compiled on the fly if it has no compiled graph).
+        agent: A QLearningAgent built for env; its Q-table and epsilon are updated in place.
+        episodes: Total number of episodes across all workers.
+        num_workers: Number of worker processes.
+        sync_every: Episodes each worker runs between Q-table merges.
+        num_envs: Episodes advanced together inside each worker.
+        seed: Optional base seed; worker seeds are derived from it.
+        monitor: Optional ConvergenceMonitor, checked after every merge.
+
+    Returns:
+        The number of episodes run.
+    """
+    base_seed = seed if seed is not None else np.random.randint(2**31 - num_workers * episodes)
+    compiled = env.compiled_graph
+    if compiled is None:
+        compiled = CompiledGraph.from_networkx(env.graph, env.traffic_dict)
+    agent_params = {
+        "alpha": agent.alpha, "gamma": agent.gamma, "epsilon_decay": agent.epsilon_decay,
+        "min_epsilon": agent.min_epsilon, "q_storage": agent.q_storage,
+        "q_dtype": agent._q_values_array().dtype.str, "mask_actions": agent.mask_actions,
+    }
+    run = (uuid.uuid4().hex, (compiled.nodes, compiled.offsets, compiled.neighbors, compiled.costs),
+           env.start_node, env.goal_node, env.max_steps, agent_params, num_envs)
+    pool = training_pool(num_workers)
+    done = 0
+    round_index = 0
+    while done < episodes:
+        # Split the remaining episodes of this round across the workers.
+        round_episodes = min(num_workers * sync_every, episodes - done)
+        chunks = [round_episodes // num_workers + (1 if i < round_episodes % num_workers else 0)
+                  for i in range(num_workers)]
+        futures = [
+            pool.submit(_train_chunk, run, agent.Q, agent.epsilon, chunk,
+                        base_seed + round_index * num_workers + i)
+            for i, chunk in enumerate(chunks) if chunk > 0
+        ]
+        results = [future.result() for future in futures]
+
+        # Merge the workers' tables by averaging.
+        agent.Q = merge_q_tables([Q for Q, _, _ in results])
+        agent.epsilon = float(np.mean([epsilon for _, epsilon, _ in results]))
+        # Count the workers' steps on the caller's environment.
+        env.total_steps += sum(steps for _, _, steps in results)
+        done += round_episodes
+        round_index += 1
+        if monitor is not None and monitor.update(agent, done):
+            break
+    return done
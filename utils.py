@@ -1,26 +1,46 @@
 # utils.py
-import random
+import hashlib
 import numpy as np
+from traffic import TrafficStore
 
-def generate_random_traffic(graph, low=1, high=10):
+def generate_random_traffic(graph, low=1, high=10, seed=None):
     """
     Generate random traffic costs for each edge in the graph.
 
+    Costs are drawn in one vectorized call rather than one `random.randint` per edge.
+
     Args:
         graph: A NetworkX graph.
         low: Minimum traffic cost.
         high: Maximum traffic cost.
+        seed: Optional seed; without one the costs still follow `random.seed()`.
 
     Returns:
-        A dictionary mapping edge tuples to a traffic cost.
+        A TrafficStore, which can be used as a dictionary mapping edge tuples (in either
+        direction) to a traffic cost.
+    """
+    return TrafficStore.random(graph, low=low, high=high, seed=seed)
+
+def generate_place_traffic(graph, place_key, low=1, high=10):
     """
-    traffic_dict = {}
-    for u, v in graph.edges():
-        traffic_cost = random.randint(low, high)
-        # Assign cost to both directions for undirected graph.
-        traffic_dict[(u, v)] = traffic_cost
-        traffic_dict[(v, u)] = traffic_cost
-    return traffic_dict
+    Generate random traffic costs seeded by a place, the same in every process.
+
+    Costs are drawn in sorted edge order, so they do not depend on the order in which the
+    graph's edges happen to be stored.
+
+    Args:
+        graph: A NetworkX graph.
+        place_key: Normalized place key used as the seed.
+        low: Minimum traffic cost.
+        high: Maximum traffic cost.
+
+    Returns:
+        A TrafficStore.
+    """
+    edges = sorted((min(u, v), max(u, v)) for u, v in graph.edges())
+    seed = int(hashlib.sha1(place_key.encode("utf-8")).hexdigest()[:16], 16)
+    costs = np.random.default_rng(seed).integers(low, high + 1, size=len(edges))
+    return TrafficStore.from_dict(graph, dict(zip(edges, costs.tolist())))
 
 def get_shortest_path(agent, env):
     """
@@ -44,10 +64,23 @@ def get_shortest_path(agent, env):
     step_count = 0
     while not done and step_count < env.max_steps:
         # Choose the best action based on the Q-table.
-        action = np.argmax(agent.Q[state, :])
+        action = agent.greedy_action(state)
         next_state, _, done, _, _ = env.step(action)
         # Append the next node to the path.
         path.append(env.nodes[next_state])
         state = next_state
         step_count += 1
     return path
+
+def path_cost(path, traffic_dict):
+    """
+    Compute the total traffic cost of a path.
+
+    Args:
+        path: A list of node IDs.
+        traffic_dict: A dictionary mapping edge tuples to traffic cost.
+
+    Returns:
+        The sum of edge costs along the path (missing edges cost 1).
+    """
+    return sum(traffic_dict.get((u, v), traffic_dict.get((v, u), 1)) for u, v in zip(path, path[1:]))
@@ -0,0 +1,73 @@
+# value_iteration.py
+import numpy as np
+
+from graph_core import CompiledGraph
+from heuristics import GOAL_REWARD, _value_floor
+
+def value_iteration(compiled_graph, goal_index, gamma, tolerance=1e-6, max_iterations=10000):
+    """
+    Solve for the optimal Q-values of the routing MDP with vectorized Bellman sweeps.
+
+    Transitions are deterministic: action `a` in state `s` moves to the a-th neighbor `n`,
+    with reward -cost(s, n), plus GOAL_REWARD for the step onto the goal, which ends the
+    episode. Unlike the environment, the step onto the goal also pays its edge cost, so with
+    gamma=1 a state's value is GOAL_REWARD minus the cost of its cheapest route and greedy
+    routes are shortest paths. Each sweep updates every (state, action) pair at once over the
+    CSR edge arrays:
+
+        Q(s, a) = r(s, n) + gamma * V(n),   V(s) = max_a Q(s, a)
+
+    Values start from, and are clipped at, the lower bound of any return, so they rise
+    monotonically; states that cannot reach the goal stay at that bound instead of drifting
+    down forever when gamma=1.
+
+    Args:
+        compiled_graph: A CompiledGraph.
+        goal_index: Index of the goal node.
+        gamma: Discount factor (1 for undiscounted route costs).
+        tolerance: Stop once no state value changes by more than this in a sweep.
+        max_iterations: Maximum number of sweeps.
+
+    Returns:
+        A tuple (q_flat, iterations): Q-values aligned with the CSR neighbor slots and the
+        number of sweeps run.
+    """
+    neighbors = compiled_graph.neighbors
+    into_goal = neighbors == goal_index
+    rewards = np.where(into_goal, GOAL_REWARD, 0.0) - compiled_graph.costs
+    # Rows are contiguous slices of the edge arrays, so the per-state max is one reduceat
+    # over the rows that have at least one action.
+    has_actions = compiled_graph.degrees > 0
+    row_starts = compiled_graph.offsets[:-1][has_actions]
+    floor = _value_floor(compiled_graph, gamma)
+
+    values = np.full(compiled_graph.num_nodes, floor)
+    values[goal_index] = 0.0
+    q_flat = rewards.copy()
+    for iteration in range(1, max_iterations + 1):
+        q_flat = np.where(into_goal, rewards, rewards + gamma * values[neighbors])
+        new_values = np.full(compiled_graph.num_nodes, floor)
+        if len(q_flat):
+            new_values[has_actions] = np.maximum(np.maximum.reduceat(q_flat, row_starts), floor)
+        # The goal is terminal.
+        new_values[goal_index] = 0.0
+        delta = float(np.max(np.abs(new_values - values))) if len(values) else 0.0
+        values = new_values
+        if delta <= tolerance:
+            break
+    return q_flat, iteration
+
+def value_iteration_q_values(env, gamma, tolerance=1e-6, max_iterations=10000):
+    """
+    Run value iteration for an environment's goal.
+
+    Returns:
+        A tuple (q_flat, compiled_graph, floor, iterations), like `heuristic_q_values` plus
+        the number of sweeps.
+    """
+    compiled = env.compiled_graph
+    if compiled is None:
+        compiled = CompiledGraph.from_networkx(env.graph, env.traffic_dict)
+    q_flat, iterations = value_iteration(compiled, compiled.node_index[env.goal_node], gamma,
+                                         tolerance=tolerance, max_iterations=max_iterations)
+    return q_flat, compiled, _value_floor(compiled, gamma), iterations